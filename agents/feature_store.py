@@ -0,0 +1,227 @@
+"""
+Rolling feature store for per-user ML features
+Maintains 7/14/30-day windows of sleep, stress and missed workouts that are
+updated on each write, so feature vectors can be read without rescanning logs
+"""
+from collections import deque
+from datetime import date
+import threading
+
+WINDOWS = (7, 14, 30)
+RECENT_LOGS = 14  # raw logs kept per user for AI analysis
+
+STRESS_MAP = {"low": 0, "medium": 1, "high": 2}
+
+
+def _day(value):
+    """Convert an ISO date string (or date) to an ordinal day number"""
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return date.today().toordinal()
+
+
+def _position(items, day, key):
+    """Index after the last of `items` (in date order) whose key(item) is <= `day`"""
+    position = len(items)
+    while position and key(items[position - 1]) > day:
+        position -= 1
+    return position
+
+
+class RollingWindow:
+    """Running sums and counts over the last `days` calendar days"""
+
+    def __init__(self, days):
+        self.days = days
+        self.entries = deque()
+        self.count = 0
+        self.sleep_sum = 0.0
+        self.stress_sum = 0
+        self.missed = 0
+
+    def add(self, day, sleep, stress, missed):
+        """Add an entry, kept in date order so a backdated one is evicted on time"""
+        entry = (day, sleep, stress, missed)
+        if not self.entries or self.entries[-1][0] <= day:
+            self.entries.append(entry)
+        else:
+            self.entries.insert(_position(self.entries, day, key=lambda e: e[0]), entry)
+        self.count += 1
+        self.sleep_sum += sleep
+        self.stress_sum += stress
+        self.missed += missed
+        self.evict(self.entries[-1][0])
+
+    def evict(self, today):
+        """Drop entries that fell out of the window as of `today`"""
+        cutoff = today - self.days
+        while self.entries and self.entries[0][0] <= cutoff:
+            _, sleep, stress, missed = self.entries.popleft()
+            self.count -= 1
+            self.sleep_sum -= sleep
+            self.stress_sum -= stress
+            self.missed -= missed
+
+
+class UserFeatures:
+    """All rolling windows plus the most recent raw logs for one user"""
+
+    def __init__(self):
+        self.windows = {days: RollingWindow(days) for days in WINDOWS}
+        self.recent = deque(maxlen=RECENT_LOGS)
+        self.total = 0
+        self.last = None
+
+    def add(self, log):
+        day = _day(log.get("date"))
+        sleep = float(log.get("sleep_hours") or 0)
+        stress = STRESS_MAP.get(log.get("stress_level"), 1)
+        missed = 1 if log.get("missed_workout") else 0
+        for window in self.windows.values():
+            window.add(day, sleep, stress, missed)
+        # a plain copy, so a row view of the store is not kept alive
+        self.last = dict(log)
+        position = _position(self.recent, day, key=lambda l: _day(l.get("date")))
+        if len(self.recent) == self.recent.maxlen:
+            if position == 0:
+                position = None  # older than every log kept
+            else:
+                self.recent.popleft()
+                position -= 1
+        if position is not None:
+            self.recent.insert(position, self.last)
+        self.total += 1
+
+    def extended_by(self, logs):
+        """Whether `logs` starts with the logs applied so far (checked on the last one)"""
+        return len(logs) >= self.total and (self.total == 0 or dict(logs[self.total - 1]) == self.last)
+
+
+def _set_last(users, logs):
+    """Point each user's `last` at their last log in write order (they were added in date order)"""
+    last = {}
+    for log in logs:
+        last[log.get("user_id")] = log
+    for user_id, log in last.items():
+        users[user_id].last = dict(log)
+
+
+class FeatureStore:
+    """Per-user rolling windows kept in sync with the daily_logs collection"""
+
+    def __init__(self):
+        self._users = {}
+        self._total = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def load(self, logs):
+        """Rebuild every user's windows from the full list of daily logs"""
+        with self._lock:
+            self._users = {}
+            for log in sorted(logs, key=lambda l: l.get("date") or ""):
+                self._add(log)
+            self._total = len(logs)
+            self._last = dict(logs[-1]) if logs else None
+            _set_last(self._users, logs)
+
+    def sync(self, logs):
+        """
+        Bring the store up to date with the daily_logs collection
+
+        Logs are append-only, so only entries past the last seen count are
+        applied; a list that does not extend the one applied (shorter, or
+        reordered, e.g. data replaced on disk) triggers a reload.
+        """
+        if len(logs) < self._total or (self._total == 0 and logs) or \
+                (self._total and dict(logs[self._total - 1]) != self._last):
+            self.load(logs)
+            return
+        with self._lock:
+            for log in logs[self._total:]:
+                self._add(log)
+            self._total = len(logs)
+            if logs:
+                self._last = dict(logs[-1])
+
+    def sync_user(self, user_id, logs):
+        """
+        Bring one user's windows up to date with their logs, in write order
+
+        Used when the caller only holds that user's logs (sharded store);
+        a list that does not extend the one applied rebuilds the user.
+        """
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None or not user.extended_by(logs):
+                user = self._users[user_id] = UserFeatures()
+                for log in sorted(logs, key=lambda l: l.get("date") or ""):
+                    user.add(log)
+                if logs:
+                    user.last = dict(logs[-1])
+                return
+            for log in logs[user.total:]:
+                user.add(log)
+
+    def record(self, log):
+        """Apply a single newly written log"""
+        with self._lock:
+            self._add(log)
+            self._total += 1
+            self._last = dict(log)
+
+    def _add(self, log):
+        user_id = log.get("user_id")
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = UserFeatures()
+        user.add(log)
+
+    def features(self, user_id, as_of=None):
+        """
+        Rolling feature vector for a user
+
+        Returns:
+            dict with count_N, sleep_avg_N, stress_avg_N, missed_N and
+            workout_rate_N for each window size N
+        """
+        today = _day(as_of or date.today())
+        features = {}
+        with self._lock:
+            user = self._users.get(user_id)
+            for days in WINDOWS:
+                window = user.windows[days] if user else None
+                if window:
+                    window.evict(today)
+                count = window.count if window else 0
+                features[f"count_{days}"] = count
+                features[f"missed_{days}"] = window.missed if window else 0
+                if count:
+                    features[f"sleep_avg_{days}"] = window.sleep_sum / count
+                    features[f"stress_avg_{days}"] = window.stress_sum / count
+                    features[f"workout_rate_{days}"] = (count - window.missed) / count
+                else:
+                    features[f"sleep_avg_{days}"] = None
+                    features[f"stress_avg_{days}"] = None
+                    features[f"workout_rate_{days}"] = None
+        return features
+
+    def recent_logs(self, user_id):
+        """The user's most recent logs, oldest first"""
+        with self._lock:
+            user = self._users.get(user_id)
+            return list(user.recent) if user else []
+
+
+# Global instance
+_store = None
+
+def get_feature_store():
+    """Get singleton feature store instance"""
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    return _store
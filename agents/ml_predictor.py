@@ -4,20 +4,40 @@ Uses scikit-learn to predict user behavior and outcomes
 """
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
 import joblib
+import logging
 import os
+import queue
+import threading
+
+# Online learning: each check-in outcome is fed to an SGD model in the background
+ONLINE_LEARNING = os.getenv("ML_ONLINE_LEARNING", "true").lower() in ("1", "true", "yes")
+ONLINE_BATCH_SIZE = 32      # max outcomes applied per partial_fit call
+ONLINE_QUEUE_SIZE = 1000    # pending outcomes kept before new ones are dropped
+ONLINE_MIN_SAMPLES = 20     # outcomes seen before the online model is trusted
+CHECKPOINT_EVERY = 50       # outcomes between checkpoints to agents/models
+
+logger = logging.getLogger(__name__)
 
 class FitnessPredictor:
     """ML model to predict workout completion, energy levels, and health outcomes"""
     
-    def __init__(self):
-        self.model_path = os.path.join(os.path.dirname(__file__), "models")
+    def __init__(self, model_path=None):
+        self.model_path = model_path or os.getenv("ML_MODEL_DIR") or os.path.join(os.path.dirname(__file__), "models")
         os.makedirs(self.model_path, exist_ok=True)
         self.scaler = StandardScaler()
         self.workout_predictor = None
         self.energy_predictor = None
+        self.online_predictor = None
+        self.online_samples = 0
+        self._online_lock = threading.Lock()
+        self._online_queue = queue.Queue(maxsize=ONLINE_QUEUE_SIZE)
+        self._online_worker = None
+        self._since_checkpoint = 0
         self.load_or_train_models()
+        self.load_online_model()
     
     def load_or_train_models(self):
         """Load existing models or create new ones"""
@@ -40,8 +60,32 @@ class FitnessPredictor:
         else:
             self.energy_predictor = RandomForestRegressor(n_estimators=100, random_state=42)
     
-    def extract_features(self, user_state, recent_logs, user_profile=None):
-        """Extract features for ML prediction"""
+    def load_online_model(self):
+        """Load the online workout model checkpoint or start a fresh one"""
+        online_model_path = os.path.join(self.model_path, "online_workout_predictor.joblib")
+        
+        if os.path.exists(online_model_path):
+            try:
+                checkpoint = joblib.load(online_model_path)
+                self.online_predictor = checkpoint["model"]
+                self.scaler = checkpoint["scaler"]
+                self.online_samples = checkpoint.get("samples", 0)
+                return
+            except Exception:
+                pass
+        
+        self.online_predictor = SGDClassifier(loss="log_loss", alpha=1e-3, random_state=42)
+        self.scaler = StandardScaler()
+        self.online_samples = 0
+    
+    def extract_features(self, user_state, recent_logs, user_profile=None, rolling_features=None):
+        """
+        Extract features for ML prediction
+        
+        rolling_features is an optional feature-store snapshot; when it has
+        14-day data the historical features are read from it instead of being
+        recomputed from recent_logs.
+        """
         features = []
         
         # Current state features
@@ -53,8 +97,14 @@ class FitnessPredictor:
         features.append(energy_map.get(user_state.get("energy", "medium"), 1))
         features.append(user_state.get("missed_days", 0))
         
-        # Historical features from recent logs
-        if recent_logs:
+        # Historical features from the feature store or recent logs
+        if rolling_features and rolling_features.get("count_14"):
+            features.extend([
+                rolling_features["sleep_avg_14"],
+                rolling_features["stress_avg_14"],
+                rolling_features["workout_rate_14"]
+            ])
+        elif recent_logs:
             avg_sleep = np.mean([log.get("sleep_hours", 7) for log in recent_logs])
             avg_stress = np.mean([stress_map.get(log.get("stress_level", "medium"), 1) for log in recent_logs])
             workout_rate = sum(1 for log in recent_logs if not log.get("missed_workout")) / len(recent_logs)
@@ -73,25 +123,131 @@ class FitnessPredictor:
         
         return np.array(features).reshape(1, -1)
     
-    def predict_workout_completion(self, user_state, recent_logs, user_profile=None):
+    def predict_workout_completion(self, user_state, recent_logs, user_profile=None, rolling_features=None):
         """Predict probability of completing next workout"""
-        features = self.extract_features(user_state, recent_logs, user_profile)
+        features = self.extract_features(user_state, recent_logs, user_profile, rolling_features)
         
-        # For demo: use rule-based prediction with ML model structure
-        # In production, train on historical data
-        if self.workout_predictor:
+        # Prefer an offline-trained model, then the online model once it has
+        # seen enough check-ins, and fall back to rules otherwise
+        prob = None
+        if self.workout_predictor is not None:
             try:
                 # Try to use the model - if it's trained, this will work
                 prob = self.workout_predictor.predict_proba(features)[0][1]
             except (AttributeError, ValueError, Exception):
-                # Model not trained yet or error, use rule-based
-                prob = self._rule_based_workout_prob(user_state)
-        else:
+                # Model not trained yet or error
+                prob = None
+        
+        if prob is None:
+            prob = self._online_workout_prob(features)
+        
+        if prob is None:
             # Fallback: rule-based prediction
             prob = self._rule_based_workout_prob(user_state)
         
         return prob
     
+    def _online_workout_prob(self, features):
+        """Workout probability from the online model, or None while it is warming up"""
+        if self.online_samples < ONLINE_MIN_SAMPLES:
+            return None
+        try:
+            with self._online_lock:
+                scaled = self.scaler.transform(features)
+                return self.online_predictor.predict_proba(scaled)[0][1]
+        except Exception:
+            return None
+    
+    def record_outcome(self, features, completed):
+        """
+        Queue a prediction outcome for the online model
+        
+        Args:
+            features: Feature vector that was used for the prediction
+            completed: True if the user completed the workout afterwards
+        
+        Returns:
+            True if the outcome was queued, False if online learning is off
+            or the queue is full (the outcome is dropped to bound cost)
+        """
+        if not ONLINE_LEARNING:
+            return False
+        
+        sample = (np.asarray(features, dtype=float).reshape(-1), 1 if completed else 0)
+        try:
+            self._online_queue.put_nowait(sample)
+        except queue.Full:
+            return False
+        
+        if self._online_worker is None or not self._online_worker.is_alive():
+            self._online_worker = threading.Thread(target=self._run_online_updates, daemon=True)
+            self._online_worker.start()
+        return True
+    
+    def learn_outcomes(self, samples):
+        """
+        Apply (features, completed) outcomes synchronously, in online-sized batches
+        
+        Used for warm-starting the online model (e.g. from benchmarks or a
+        backfill) without going through the background queue.
+        """
+        batch = []
+        for features, completed in samples:
+            batch.append((np.asarray(features, dtype=float).reshape(-1), 1 if completed else 0))
+            if len(batch) == ONLINE_BATCH_SIZE:
+                self._apply_online_batch(batch)
+                batch = []
+        if batch:
+            self._apply_online_batch(batch)
+    
+    def _run_online_updates(self):
+        """Background loop applying queued outcomes in small batches"""
+        while True:
+            batch = [self._online_queue.get()]
+            while len(batch) < ONLINE_BATCH_SIZE:
+                try:
+                    batch.append(self._online_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self._apply_online_batch(batch)
+            except Exception as e:
+                logger.warning("Online learning error: %s", e, exc_info=True)
+            finally:
+                for _ in batch:
+                    self._online_queue.task_done()
+    
+    def _apply_online_batch(self, batch):
+        """Update the scaler and online model with one batch of outcomes"""
+        X = np.vstack([features for features, _ in batch])
+        y = np.array([label for _, label in batch])
+        
+        with self._online_lock:
+            self.scaler.partial_fit(X)
+            self.online_predictor.partial_fit(self.scaler.transform(X), y, classes=[0, 1])
+            self.online_samples += len(batch)
+            self._since_checkpoint += len(batch)
+            should_checkpoint = self._since_checkpoint >= CHECKPOINT_EVERY
+        
+        if should_checkpoint:
+            self.checkpoint_online_model()
+    
+    def checkpoint_online_model(self):
+        """Persist the online model to agents/models"""
+        online_model_path = os.path.join(self.model_path, "online_workout_predictor.joblib")
+        tmp_path = online_model_path + ".tmp"
+        
+        with self._online_lock:
+            checkpoint = {
+                "model": self.online_predictor,
+                "scaler": self.scaler,
+                "samples": self.online_samples
+            }
+            joblib.dump(checkpoint, tmp_path)
+            self._since_checkpoint = 0
+        os.replace(tmp_path, online_model_path)
+    
     def _rule_based_workout_prob(self, user_state):
         """Rule-based fallback for workout probability"""
         sleep = user_state.get("sleep_hours", 7)
@@ -107,11 +263,11 @@ class FitnessPredictor:
             prob += 0.1
         return min(1.0, prob)
     
-    def predict_energy_level(self, user_state, recent_logs, user_profile=None):
+    def predict_energy_level(self, user_state, recent_logs, user_profile=None, rolling_features=None):
         """Predict next day's energy level (0-10 scale)"""
-        features = self.extract_features(user_state, recent_logs, user_profile)
+        features = self.extract_features(user_state, recent_logs, user_profile, rolling_features)
         
-        if self.energy_predictor:
+        if self.energy_predictor is not None:
             try:
                 # Try to use the model - if it's trained, this will work
                 energy_score = self.energy_predictor.predict(features)[0]
@@ -149,3 +305,7 @@ def get_predictor():
         _predictor = FitnessPredictor()
     return _predictor
 
+def record_workout_outcome(features, completed):
+    """Feed a check-in outcome to the shared predictor's online model"""
+    return get_predictor().record_outcome(features, completed)
+
@@ -2,8 +2,9 @@ from agents.goal_agent import evaluate_goal
 from agents.wellness_agent import check_wellness
 from agents.fitness_agent import plan_workout
 from agents.recommendation_agent import generate_ai_recommendation
+from agents.telemetry import span
 
-def decide_plan(user_state, recent_logs=None, user_profile=None):
+def decide_plan(user_state, recent_logs=None, user_profile=None, rolling_features=None):
     """
     Enhanced plan decision with AI recommendations
     
@@ -11,26 +12,36 @@ def decide_plan(user_state, recent_logs=None, user_profile=None):
         user_state: Dictionary with missed_days, stress, sleep_hours, energy
         recent_logs: List of recent daily logs (optional, for AI analysis)
         user_profile: User profile dictionary (optional, for personalized recommendations)
+        rolling_features: Feature-store snapshot (optional); fills in missed_days
+            when user_state omits it and is passed on to the ML predictor
     
     Returns:
         Dictionary with goal, wellness, plan, and ai_recommendation
     """
-    goal_status = evaluate_goal(user_state["missed_days"])
-    wellness_state = check_wellness(
-        user_state["stress"],
-        user_state["sleep_hours"]
-    )
+    with span("decide_plan"):
+        if "missed_days" not in user_state and rolling_features:
+            user_state = dict(user_state, missed_days=rolling_features["missed_30"])
 
-    if wellness_state == "recovery":
-        workout_plan = ["breathing", "light walk"]
-    else:
-        workout = plan_workout(goal_status, user_state["energy"])
-        workout_plan = workout
-    
-    # Generate AI recommendation if we have recent logs
-    ai_recommendation = None
-    if recent_logs:
-        ai_recommendation = generate_ai_recommendation(user_state, recent_logs, user_profile)
+        with span("goal"):
+            goal_status = evaluate_goal(user_state["missed_days"])
+        with span("wellness"):
+            wellness_state = check_wellness(
+                user_state["stress"],
+                user_state["sleep_hours"]
+            )
+
+        with span("workout_plan"):
+            if wellness_state == "recovery":
+                workout_plan = ["breathing", "light walk"]
+            else:
+                workout = plan_workout(goal_status, user_state["energy"])
+                workout_plan = workout
+
+        # Generate AI recommendation if we have recent logs
+        ai_recommendation = None
+        if recent_logs:
+            with span("recommendation"):
+                ai_recommendation = generate_ai_recommendation(user_state, recent_logs, user_profile, rolling_features=rolling_features)
     
     return {
         "goal": goal_status,
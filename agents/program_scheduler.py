@@ -0,0 +1,242 @@
+"""
+Program Scheduler Agent
+Builds multi-week periodized plans from the catalog tier templates and
+generates them for every user in one batch run. Schedules are kept out of
+the data store, one JSON file per user, so only a program page reads them
+and only for its own user.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+
+from agents.workout_catalog import load_catalog, level_tier
+
+WEEKS = 4
+DELOAD_EVERY = 4                 # every 4th week is a deload week
+TRAINING_DAYS = (0, 2, 4)        # day offsets within a week (Mon/Wed/Fri from the start date)
+REDUCED_TRAINING_DAYS = (0, 3)   # used when adherence is low
+ADHERENCE_WINDOW = 28            # recent logs considered for adaptation
+DELOAD_VOLUME = 0.6
+SAFE_FILE_NAME = re.compile(r"[A-Za-z0-9-][A-Za-z0-9_.-]{0,127}\Z")
+
+
+def adherence_rate(missed_flags):
+    """Share of recent check-ins with a completed workout (None without history)"""
+    recent = list(missed_flags)[-ADHERENCE_WINDOW:]
+    if not recent:
+        return None
+    return sum(1 for missed in recent if not missed) / len(recent)
+
+
+def progression_rate(adherence):
+    """
+    How fast to progress given recent adherence
+
+    Returns:
+        1.0 for consistent users (or no history), 0.5 when some workouts are
+        missed, 0.0 (hold the base template) when most are missed
+    """
+    if adherence is None or adherence >= 0.8:
+        return 1.0
+    if adherence >= 0.5:
+        return 0.5
+    return 0.0
+
+
+def progress_block(block, step, deload=False):
+    """
+    Scale one template block for a point in the cycle
+
+    Args:
+        block: Catalog block
+        step: Progression steps applied so far (week index x progression rate)
+        deload: Reduce volume instead of progressing
+
+    Returns:
+        New mutable block dict
+    """
+    out = {k: list(v) if isinstance(v, tuple) else v for k, v in block.items()}
+
+    if deload:
+        if out.get("sets"):
+            out["sets"] = max(1, round(out["sets"] * DELOAD_VOLUME))
+        if out.get("rounds"):
+            out["rounds"] = max(1, round(out["rounds"] * DELOAD_VOLUME))
+        if out.get("category") in ("cardio", "hiit") and out.get("duration"):
+            out["duration"] = max(5, round(out["duration"] * DELOAD_VOLUME))
+        out["deload"] = True
+        return out
+
+    if out.get("reps"):
+        out["reps"] = out["reps"] + round(2 * step)
+    if out.get("sets") and step >= 2:
+        out["sets"] = out["sets"] + min(2, int(step // 2))
+    if out.get("duration_sec"):
+        out["duration_sec"] = int(round(out["duration_sec"] * (1 + 0.1 * step)))
+    if out.get("rounds"):
+        out["rounds"] = out["rounds"] + int(step // 2)
+    if out.get("category") == "cardio" and out.get("duration"):
+        out["duration"] = int(math.ceil(out["duration"] * (1 + 0.1 * step)))
+    return out
+
+
+def build_schedule(user_id, user_level, program_type, missed_flags=(), weeks=WEEKS, start=None):
+    """
+    Periodized multi-week schedule for one user and program
+
+    Args:
+        user_id: User the schedule belongs to
+        user_level: User's current level (1-10)
+        program_type: Program key from the catalog
+        missed_flags: missed_workout flags of the user's logs, oldest first
+        weeks: Number of weeks to plan
+        start: First day of the schedule (defaults to today)
+
+    Returns:
+        dict with the schedule metadata and a list of weeks, each holding its training days
+    """
+    catalog = load_catalog()
+    program_key = catalog.resolve(program_type)
+    program_data = catalog.program(program_key)
+    tier = level_tier(user_level)
+    template = catalog.blocks(program_key, tier)
+    start = start or date.today()
+
+    adherence = adherence_rate(missed_flags)
+    rate = progression_rate(adherence)
+    day_offsets = REDUCED_TRAINING_DAYS if adherence is not None and adherence < 0.5 else TRAINING_DAYS
+
+    plan_weeks = []
+    step = 0.0
+    for week in range(weeks):
+        deload = (week + 1) % DELOAD_EVERY == 0
+        days = []
+        for offset in day_offsets:
+            workouts = [progress_block(block, step, deload) for block in template]
+            days.append({
+                "date": (start + timedelta(days=week * 7 + offset)).isoformat(),
+                "workouts": workouts,
+                "total_duration": sum(w.get("duration", 0) for w in workouts),
+            })
+        plan_weeks.append({"week": week + 1, "deload": deload, "days": days})
+        if not deload:
+            step += rate
+
+    return {
+        "user_id": user_id,
+        "program_type": program_key,
+        "program_name": program_data["name"],
+        "description": program_data["description"],
+        "user_level": user_level,
+        "level_tier": tier,
+        "adherence": adherence,
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=weeks * 7 - 1)).isoformat(),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "weeks": plan_weeks,
+    }
+
+
+def _schedule_user(job):
+    """Worker entry point: every requested program for one user"""
+    user_id, user_level, missed_flags, program_types, weeks, start = job
+    return user_id, {
+        program_type: build_schedule(user_id, user_level, program_type, missed_flags, weeks, start)
+        for program_type in program_types
+    }
+
+
+def schedule_all_users(user_profiles, daily_logs, program_types=None, weeks=WEEKS, workers=None, start=None):
+    """
+    Build schedules for every user in one batch using a process pool
+
+    Args:
+        user_profiles: All user profiles
+        daily_logs: All daily logs (used for missed-workout adaptation)
+        program_types: Programs to schedule (defaults to every catalog program)
+        weeks: Weeks per schedule
+        workers: Process count (defaults to the CPU count; 1 runs inline)
+        start: First day of every schedule (defaults to today)
+
+    Returns:
+        dict of user_id -> {program_type: schedule}
+    """
+    program_types = tuple(program_types or load_catalog().program_types())
+    start = start or date.today()
+
+    missed_by_user = {}
+    for log in daily_logs:
+        missed_by_user.setdefault(log.get("user_id"), []).append((log.get("date") or "", bool(log.get("missed_workout"))))
+
+    jobs = []
+    for profile in user_profiles:
+        user_id = profile.get("user_id")
+        history = sorted(missed_by_user.get(user_id, []))[-ADHERENCE_WINDOW:]
+        jobs.append((user_id, profile.get("level", 1), [missed for _, missed in history], program_types, weeks, start))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) < 2:
+        return dict(_schedule_user(job) for job in jobs)
+
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(_schedule_user, jobs, chunksize=chunksize))
+
+
+def scheduled_day(schedule, on=None):
+    """The schedule's training day on `on` (or the next one), None once the schedule has ended"""
+    on = (on or date.today()).isoformat()
+    for week in schedule.get("weeks", []):
+        for day in week["days"]:
+            if day["date"] >= on:
+                return dict(day, week=week["week"], deload=week["deload"])
+    return None
+
+
+def schedule_path(directory, user_id):
+    """File holding a user's schedules; ids that are not safe file names are hashed"""
+    if isinstance(user_id, str) and SAFE_FILE_NAME.match(user_id):
+        name = user_id
+    else:
+        name = "_" + hashlib.sha1(json.dumps(user_id, default=str).encode()).hexdigest()
+    return os.path.join(directory, name + ".json")
+
+
+def save_schedules(schedules, directory):
+    """
+    Write every user's schedules to their own file, replacing the previous batch
+
+    Args:
+        schedules: dict of user_id -> {program_type: schedule}, as returned by schedule_all_users()
+        directory: Schedule directory (created if missing)
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = set()
+    for user_id, programs in schedules.items():
+        path = schedule_path(directory, user_id)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".schedule.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(programs, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        written.add(os.path.basename(path))
+    for name in os.listdir(directory):
+        if name.endswith(".json") and name not in written:
+            os.remove(os.path.join(directory, name))
+
+
+def load_schedules(directory, user_id):
+    """A user's schedules by program type ({} when none were built or the file is unreadable)"""
+    try:
+        with open(schedule_path(directory, user_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -2,9 +2,14 @@
 AI Recommendation Agent with LLM integration
 Analyzes user's overall health data and provides personalized next-day recommendations
 """
+from contextlib import contextmanager
+import contextvars
+import logging
 import os
 from dotenv import load_dotenv
 
+from agents.telemetry import span
+
 # Try to import LLM libraries
 try:
     from openai import OpenAI
@@ -30,7 +35,32 @@ except ImportError:
 
 load_dotenv()
 
-def generate_llm_recommendation(user_state, recent_logs, user_profile=None, use_openai=True):
+logger = logging.getLogger(__name__)
+
+# Optional in-process LLM backend (prompt -> text), used by benchmarks to stub the vendor APIs
+_llm_backend = None
+_scoped_backend = contextvars.ContextVar("llm_backend", default=None)
+
+def set_llm_backend(backend):
+    """Route LLM calls through backend(prompt) instead of OpenAI/Anthropic; None restores the APIs"""
+    global _llm_backend
+    _llm_backend = backend
+
+@contextmanager
+def llm_backend(backend):
+    """Route the enclosed block's LLM calls through backend(prompt) without touching other threads or requests"""
+    token = _scoped_backend.set(backend)
+    try:
+        yield
+    finally:
+        _scoped_backend.reset(token)
+
+def current_llm_backend():
+    """The backend of the enclosing llm_backend() block, else the process-wide one (None: vendor APIs)"""
+    backend = _scoped_backend.get()
+    return backend if backend is not None else _llm_backend
+
+def generate_llm_recommendation(user_state, recent_logs, user_profile=None, use_openai=True, rolling_features=None):
     """
     Generate recommendation using LLM API (OpenAI or Anthropic)
     
@@ -39,6 +69,7 @@ def generate_llm_recommendation(user_state, recent_logs, user_profile=None, use_
         recent_logs: Recent daily logs
         user_profile: User profile
         use_openai: If True, use OpenAI; if False, use Anthropic
+        rolling_features: Optional feature-store snapshot for the ML predictor
     
     Returns:
         dict with LLM-generated recommendation
@@ -55,8 +86,9 @@ def generate_llm_recommendation(user_state, recent_logs, user_profile=None, use_
     if ML_AVAILABLE:
         try:
             predictor = get_predictor()
-            workout_prob = predictor.predict_workout_completion(user_state, recent_logs, user_profile)
-            predicted_energy = predictor.predict_energy_level(user_state, recent_logs, user_profile)
+            with span("ml_predict"):
+                workout_prob = predictor.predict_workout_completion(user_state, recent_logs, user_profile, rolling_features)
+                predicted_energy = predictor.predict_energy_level(user_state, recent_logs, user_profile, rolling_features)
         except Exception:
             pass
     
@@ -96,22 +128,28 @@ Include:
 
 Format your response as a brief, actionable recommendation."""
 
+    backend = current_llm_backend()
     try:
-        if use_openai and OPENAI_AVAILABLE:
+        if backend is not None:
+            with span("llm_call"):
+                llm_text = backend(prompt)
+        
+        elif use_openai and OPENAI_AVAILABLE:
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 return None
             
             client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",  # or "gpt-3.5-turbo" for cheaper option
-                messages=[
-                    {"role": "system", "content": "You are a fitness and wellness coach providing personalized recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=300
-            )
+            with span("llm_call"):
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",  # or "gpt-3.5-turbo" for cheaper option
+                    messages=[
+                        {"role": "system", "content": "You are a fitness and wellness coach providing personalized recommendations."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=300
+                )
             
             llm_text = response.choices[0].message.content
             
@@ -121,13 +159,14 @@ Format your response as a brief, actionable recommendation."""
                 return None
             
             client = Anthropic(api_key=api_key)
-            response = client.messages.create(
-                model="claude-3-haiku-20240307",  # or "claude-3-sonnet-20240229"
-                max_tokens=300,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            with span("llm_call"):
+                response = client.messages.create(
+                    model="claude-3-haiku-20240307",  # or "claude-3-sonnet-20240229"
+                    max_tokens=300,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
             
             llm_text = response.content[0].text
         
@@ -143,10 +182,10 @@ Format your response as a brief, actionable recommendation."""
         }
     
     except Exception as e:
-        print(f"LLM API error: {e}")
+        logger.warning("LLM API error: %s", e, exc_info=True)
         return None
 
-def generate_ai_recommendation(user_state, recent_logs, user_profile=None, use_llm=True):
+def generate_ai_recommendation(user_state, recent_logs, user_profile=None, use_llm=True, rolling_features=None):
     """
     Generate comprehensive AI-powered recommendations
     Now with ML predictions and optional LLM integration
@@ -156,6 +195,7 @@ def generate_ai_recommendation(user_state, recent_logs, user_profile=None, use_l
         recent_logs: Recent daily logs (last 7-14 days)
         user_profile: User profile with goals, activity level, etc.
         use_llm: Whether to use LLM API (requires API key)
+        rolling_features: Optional feature-store snapshot for the ML predictor
     
     Returns:
         dict with recommendation details including title, description, actions, and priority
@@ -164,7 +204,7 @@ def generate_ai_recommendation(user_state, recent_logs, user_profile=None, use_l
     # Try to get LLM recommendation first
     llm_rec = None
     if use_llm:
-        llm_rec = generate_llm_recommendation(user_state, recent_logs, user_profile)
+        llm_rec = generate_llm_recommendation(user_state, recent_logs, user_profile, rolling_features=rolling_features)
     
     # Get ML predictions
     workout_prob = 0.7
@@ -172,10 +212,11 @@ def generate_ai_recommendation(user_state, recent_logs, user_profile=None, use_l
     if ML_AVAILABLE:
         try:
             predictor = get_predictor()
-            workout_prob = predictor.predict_workout_completion(user_state, recent_logs, user_profile)
-            predicted_energy = predictor.predict_energy_level(user_state, recent_logs, user_profile)
+            with span("ml_predict"):
+                workout_prob = predictor.predict_workout_completion(user_state, recent_logs, user_profile, rolling_features)
+                predicted_energy = predictor.predict_energy_level(user_state, recent_logs, user_profile, rolling_features)
         except Exception as e:
-            print(f"ML prediction error: {e}")
+            logger.warning("ML prediction error: %s", e, exc_info=True)
     
     stress = user_state.get("stress", "medium")
     sleep_hours = user_state.get("sleep_hours", 7)
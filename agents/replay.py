@@ -0,0 +1,158 @@
+"""
+Replay signal histories through decide_plan
+Used by the agent console to load-test agent changes: parses CSV/NDJSON
+signal files, runs every signal through the orchestrator in a worker pool and
+returns per-decision outcomes with per-stage timings
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import csv
+import functools
+import io
+import json
+import time
+
+from agents.orchestrator import decide_plan
+from agents.recommendation_agent import llm_backend, set_llm_backend
+from agents.telemetry import collect
+
+HISTORY_WINDOW = 30   # previous signals counted for missed_days
+RECENT_WINDOW = 14    # previous signals passed as recent_logs
+
+STUB_LLM_TEXT = (
+    "Tomorrow, take a 30 minute brisk walk after lunch. Tips: go to bed by 10:30, "
+    "drink water before coffee, stretch for 5 minutes. Priority: medium. You've got this!"
+)
+
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+
+class StubLLM:
+    """Stand-in for the LLM APIs with a fixed response latency"""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return STUB_LLM_TEXT
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def normalize_signal(row):
+    """Accept console-style (stress/energy/missed) or log-style (stress_level/...) fields"""
+    sleep = row.get("sleep_hours", row.get("sleep", 7))
+    return {
+        "history": str(row.get("user_id") or row.get("history") or "default"),
+        "date": row.get("date", ""),
+        "stress_level": row.get("stress_level") or row.get("stress") or "medium",
+        "energy_level": row.get("energy_level") or row.get("energy") or "medium",
+        "sleep_hours": float(sleep) if sleep not in (None, "") else 7.0,
+        "missed_workout": _flag(row.get("missed_workout", row.get("missed", False))),
+    }
+
+
+def load_signals(content, filename=""):
+    """
+    Parse an uploaded signal file
+
+    Args:
+        content: File contents (bytes or str)
+        filename: Used to pick the format; .csv is CSV, anything else NDJSON
+
+    Returns:
+        List of normalized signal dicts in file order
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    if filename.lower().endswith(".csv"):
+        rows = csv.DictReader(io.StringIO(content))
+    else:
+        rows = (json.loads(line) for line in content.splitlines() if line.strip())
+    return [normalize_signal(row) for row in rows]
+
+
+def build_tasks(signals, with_recent_logs=True):
+    """One decide_plan task per signal, with history taken from earlier signals of the same history id"""
+    histories = {}
+    tasks = []
+    for signal in signals:
+        previous = histories.setdefault(signal["history"], [])
+        user_state = {
+            "missed_days": sum(1 for s in previous[-HISTORY_WINDOW:] if s["missed_workout"]),
+            "stress": signal["stress_level"],
+            "sleep_hours": signal["sleep_hours"],
+            "energy": signal["energy_level"],
+        }
+        recent = previous[-RECENT_WINDOW:] if with_recent_logs else None
+        tasks.append({"history": signal["history"], "date": signal["date"], "user_state": user_state, "recent_logs": recent})
+        previous.append(signal)
+    return tasks
+
+
+def run_task(task, backend=None):
+    """Run one decision and time its stages, with LLM calls going to `backend` when given"""
+    start = time.perf_counter()
+    error = None
+    plan = None
+    with collect() as spans, llm_backend(backend):
+        try:
+            plan = decide_plan(task["user_state"], recent_logs=task["recent_logs"])
+        except Exception as e:
+            error = str(e)
+    total = time.perf_counter() - start
+
+    stages = {}
+    for name, seconds in spans:
+        stages[name] = stages.get(name, 0.0) + seconds * 1000
+
+    rec = (plan or {}).get("ai_recommendation") or {}
+    return {
+        "history": task["history"],
+        "date": task["date"],
+        "goal": (plan or {}).get("goal"),
+        "wellness": (plan or {}).get("wellness"),
+        "plan": ", ".join((plan or {}).get("plan") or []),
+        "recommendation": rec.get("title"),
+        "error": error,
+        "total_ms": total * 1000,
+        "stages": stages,
+    }
+
+
+def _init_worker(stub_latency_ms):
+    if stub_latency_ms is not None:
+        set_llm_backend(StubLLM(stub_latency_ms))
+
+
+def replay(tasks, workers=4, mode="threads", stub_latency_ms=0):
+    """
+    Run tasks through decide_plan in a worker pool
+
+    Args:
+        tasks: Tasks from build_tasks
+        workers: Pool size
+        mode: "threads" or "processes"
+        stub_latency_ms: Stub LLM latency, or None to call the real LLM APIs
+
+    Returns:
+        (results, wall_seconds)
+    """
+    start = time.perf_counter()
+    if mode == "processes":
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stub_latency_ms,)) as pool:
+            results = list(pool.map(run_task, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    else:
+        # the stub is scoped to the replay's own calls; other sessions of the
+        # server keep whatever backend they use
+        stub = StubLLM(stub_latency_ms) if stub_latency_ms is not None else None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(functools.partial(run_task, backend=stub), tasks))
+    return results, time.perf_counter() - start
@@ -0,0 +1,74 @@
+"""
+Timing spans for the agent pipeline
+A span costs one context-variable lookup when nothing is listening. Callers
+can collect the spans of a block of code, or register observers that see
+every span in the process.
+"""
+from contextlib import contextmanager
+import contextvars
+import functools
+import time
+
+_observers = []
+_collector = contextvars.ContextVar("telemetry_collector", default=None)
+
+
+def add_observer(observer):
+    """Call observer(name, seconds) for every finished span"""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def active():
+    """True when a finished span would be seen by anyone"""
+    return bool(_observers) or _collector.get() is not None
+
+
+def record(name, seconds):
+    """Report an already-measured stage"""
+    collector = _collector.get()
+    if collector is not None:
+        collector.append((name, seconds))
+    for observer in list(_observers):
+        observer(name, seconds)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as stage `name`"""
+    if not active():
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect():
+    """Collect (name, seconds) for every span finished in this context"""
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
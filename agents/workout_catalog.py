@@ -0,0 +1,121 @@
+"""
+Workout Catalog
+Loads the program/tier workout templates from agents/data/workout_catalog.json
+once into an immutable structure indexed by program, tier, exercise category
+and equipment
+"""
+from collections import namedtuple
+from types import MappingProxyType
+import functools
+import json
+import os
+
+CATALOG_FILE = os.path.join(os.path.dirname(__file__), "data", "workout_catalog.json")
+
+DEFAULT_PROGRAM = "beginner"
+
+# A block together with where it lives in the catalog
+CatalogEntry = namedtuple("CatalogEntry", ["program", "tier", "position", "block"])
+
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Plain dicts and lists for a frozen catalog value, e.g. to serialise a block"""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def level_tier(user_level):
+    """Map a user level (1-10) to a program tier (1-3)"""
+    if user_level <= 3:
+        return 1
+    elif user_level <= 6:
+        return 2
+    return 3
+
+
+class WorkoutCatalog:
+    """Read-only workout templates with lookup indexes"""
+
+    def __init__(self, programs):
+        self._programs = {}
+        self._tiers = {}
+        self._durations = {}
+        by_category = {}
+        by_equipment = {}
+
+        for key, program in programs.items():
+            tiers = {int(tier): _freeze(blocks) for tier, blocks in program["tiers"].items()}
+            self._programs[key] = MappingProxyType({
+                "name": program["name"],
+                "description": program["description"],
+                "tiers": MappingProxyType(tiers),
+            })
+            for tier, blocks in tiers.items():
+                self._tiers[(key, tier)] = blocks
+                self._durations[(key, tier)] = sum(b.get("duration", 0) for b in blocks)
+                for position, block in enumerate(blocks):
+                    entry = CatalogEntry(key, tier, position, block)
+                    by_category.setdefault(block.get("category"), []).append(entry)
+                    for item in block.get("equipment", ()) or ("none",):
+                        by_equipment.setdefault(item, []).append(entry)
+
+        self._by_category = {k: tuple(v) for k, v in by_category.items()}
+        self._by_equipment = {k: tuple(v) for k, v in by_equipment.items()}
+
+    def program_types(self):
+        return tuple(self._programs)
+
+    def program(self, program_type):
+        """Program metadata and tiers, falling back to the beginner program"""
+        return self._programs.get((program_type or "").lower(), self._programs[DEFAULT_PROGRAM])
+
+    def resolve(self, program_type):
+        """Catalog key for a program type (unknown types resolve to beginner)"""
+        key = (program_type or "").lower()
+        return key if key in self._programs else DEFAULT_PROGRAM
+
+    def blocks(self, program_type, tier):
+        """Workout blocks for a program tier (tier 1 when the tier is unknown)"""
+        key = self.resolve(program_type)
+        return self._tiers.get((key, tier), self._tiers[(key, 1)])
+
+    def total_duration(self, program_type, tier):
+        key = self.resolve(program_type)
+        return self._durations.get((key, tier), self._durations[(key, 1)])
+
+    def by_category(self, category):
+        """All catalog entries of an exercise category (strength, cardio, mobility, ...)"""
+        return self._by_category.get(category, ())
+
+    def by_equipment(self, equipment):
+        """All catalog entries needing a piece of equipment ("none" for bodyweight)"""
+        return self._by_equipment.get(equipment, ())
+
+    def entries(self, program_type):
+        """Every block of a program across tiers, as catalog entries"""
+        key = self.resolve(program_type)
+        return tuple(
+            CatalogEntry(key, tier, position, block)
+            for tier in sorted(self._programs[key]["tiers"])
+            for position, block in enumerate(self._tiers[(key, tier)])
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def load_catalog(path=CATALOG_FILE):
+    """Load the catalog once per process"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return WorkoutCatalog(raw["programs"])
@@ -2,6 +2,17 @@
 Workout Generator Agent
 Generates workout plans based on program type and user level
 """
+from collections import OrderedDict
+import functools
+
+from agents.workout_catalog import load_catalog, level_tier, thaw
+
+# Target block effort (1-5) for each requested intensity
+INTENSITY_EFFORT = {"low": 2, "moderate": 3, "high": 4}
+
+# Blocks whose minutes are reserved before the main exercises are chosen
+RESERVED_ROLES = ("warmup", "cooldown")
+
 
 def get_workouts_for_program(program_type, user_level):
     """
@@ -15,200 +26,152 @@ def get_workouts_for_program(program_type, user_level):
         List of workout suggestions with details
     """
     
-    # Define workout templates for each program type
-    workouts = {
-        "beginner": {
-            "name": "Beginner Program",
-            "description": "Perfect for starting your fitness journey. Focus on building foundational strength and mobility.",
-            "workouts": {
-                1: [
-                    {"name": "Full Body Warm-up", "duration": 10, "exercises": ["Arm circles", "Leg swings", "Neck rolls", "Torso twists"], "rest": 30},
-                    {"name": "Bodyweight Squats", "duration": 5, "sets": 2, "reps": 10, "rest": 60},
-                    {"name": "Wall Push-ups", "duration": 5, "sets": 2, "reps": 8, "rest": 60},
-                    {"name": "Plank Hold", "duration": 5, "sets": 2, "duration_sec": 20, "rest": 60},
-                    {"name": "Light Walking", "duration": 10, "type": "cardio"},
-                    {"name": "Stretching", "duration": 5, "exercises": ["Hamstring stretch", "Quad stretch", "Shoulder stretch"]}
-                ],
-                2: [
-                    {"name": "Dynamic Warm-up", "duration": 10, "exercises": ["Jumping jacks", "High knees", "Butt kicks", "Arm swings"], "rest": 30},
-                    {"name": "Bodyweight Squats", "duration": 8, "sets": 3, "reps": 12, "rest": 45},
-                    {"name": "Incline Push-ups", "duration": 8, "sets": 3, "reps": 10, "rest": 45},
-                    {"name": "Plank Hold", "duration": 8, "sets": 2, "duration_sec": 30, "rest": 60},
-                    {"name": "Bodyweight Lunges", "duration": 8, "sets": 2, "reps": 8, "rest": 45},
-                    {"name": "Brisk Walking", "duration": 15, "type": "cardio"},
-                    {"name": "Full Body Stretch", "duration": 8}
-                ],
-                3: [
-                    {"name": "Dynamic Warm-up", "duration": 10, "exercises": ["Jumping jacks", "High knees", "Mountain climbers", "Leg swings"], "rest": 20},
-                    {"name": "Bodyweight Squats", "duration": 10, "sets": 3, "reps": 15, "rest": 45},
-                    {"name": "Push-ups", "duration": 10, "sets": 3, "reps": 12, "rest": 45},
-                    {"name": "Plank Hold", "duration": 10, "sets": 3, "duration_sec": 40, "rest": 60},
-                    {"name": "Walking Lunges", "duration": 10, "sets": 2, "reps": 12, "rest": 45},
-                    {"name": "Moderate Jogging", "duration": 20, "type": "cardio"},
-                    {"name": "Full Body Stretch", "duration": 10}
-                ]
-            }
-        },
-        "strength": {
-            "name": "Strength Training Program",
-            "description": "Build muscle and strength with progressive resistance training.",
-            "workouts": {
-                1: [
-                    {"name": "Warm-up", "duration": 10, "exercises": ["Light cardio", "Dynamic stretches", "Joint mobility"], "rest": 30},
-                    {"name": "Bodyweight Squats", "duration": 15, "sets": 3, "reps": 12, "rest": 60},
-                    {"name": "Push-ups", "duration": 15, "sets": 3, "reps": 10, "rest": 60},
-                    {"name": "Plank Hold", "duration": 10, "sets": 3, "duration_sec": 30, "rest": 60},
-                    {"name": "Glute Bridges", "duration": 10, "sets": 3, "reps": 12, "rest": 45},
-                    {"name": "Cool-down Stretch", "duration": 10}
-                ],
-                2: [
-                    {"name": "Warm-up", "duration": 10, "exercises": ["Jumping jacks", "Arm circles", "Leg swings"], "rest": 20},
-                    {"name": "Goblet Squats", "duration": 20, "sets": 4, "reps": 12, "rest": 60},
-                    {"name": "Push-ups", "duration": 20, "sets": 4, "reps": 12, "rest": 60},
-                    {"name": "Dumbbell Rows", "duration": 15, "sets": 3, "reps": 10, "rest": 60},
-                    {"name": "Plank Hold", "duration": 15, "sets": 3, "duration_sec": 45, "rest": 60},
-                    {"name": "Cool-down Stretch", "duration": 10}
-                ],
-                3: [
-                    {"name": "Warm-up", "duration": 10, "exercises": ["Light jogging", "Dynamic stretches"], "rest": 20},
-                    {"name": "Barbell Squats", "duration": 25, "sets": 4, "reps": 10, "rest": 90},
-                    {"name": "Bench Press", "duration": 25, "sets": 4, "reps": 8, "rest": 90},
-                    {"name": "Deadlifts", "duration": 20, "sets": 3, "reps": 8, "rest": 120},
-                    {"name": "Overhead Press", "duration": 15, "sets": 3, "reps": 8, "rest": 90},
-                    {"name": "Pull-ups", "duration": 15, "sets": 3, "reps": 6, "rest": 90},
-                    {"name": "Cool-down Stretch", "duration": 10}
-                ]
-            }
-        },
-        "cardio": {
-            "name": "Cardio Program",
-            "description": "Improve cardiovascular health and endurance with varied cardio workouts.",
-            "workouts": {
-                1: [
-                    {"name": "Light Warm-up", "duration": 5, "exercises": ["Walking", "Arm swings", "Leg lifts"], "rest": 30},
-                    {"name": "Brisk Walking", "duration": 20, "type": "cardio", "intensity": "moderate"},
-                    {"name": "Rest", "duration": 2, "type": "rest"},
-                    {"name": "Light Jogging", "duration": 10, "type": "cardio", "intensity": "low"},
-                    {"name": "Cool-down Walk", "duration": 5, "type": "cardio"},
-                    {"name": "Stretching", "duration": 8}
-                ],
-                2: [
-                    {"name": "Dynamic Warm-up", "duration": 10, "exercises": ["Jumping jacks", "High knees", "Butt kicks"], "rest": 20},
-                    {"name": "Interval Running", "duration": 25, "type": "cardio", "intervals": "5 min run, 2 min walk x 3"},
-                    {"name": "Rest", "duration": 2, "type": "rest"},
-                    {"name": "Brisk Walking", "duration": 10, "type": "cardio"},
-                    {"name": "Cool-down & Stretch", "duration": 10}
-                ],
-                3: [
-                    {"name": "Dynamic Warm-up", "duration": 10, "exercises": ["Jumping jacks", "Mountain climbers", "Burpees"], "rest": 20},
-                    {"name": "Running", "duration": 30, "type": "cardio", "intensity": "moderate-high"},
-                    {"name": "HIIT Intervals", "duration": 15, "type": "cardio", "intervals": "30 sec sprint, 60 sec jog x 6"},
-                    {"name": "Cool-down & Stretch", "duration": 10}
-                ]
-            }
-        },
-        "wellness": {
-            "name": "Wellness & Recovery Program",
-            "description": "Focus on recovery, flexibility, and mental wellness through gentle movements.",
-            "workouts": {
-                1: [
-                    {"name": "Gentle Breathing", "duration": 5, "type": "meditation"},
-                    {"name": "Neck & Shoulder Stretches", "duration": 10, "exercises": ["Neck rolls", "Shoulder circles", "Cross-body stretch"]},
-                    {"name": "Gentle Yoga Flow", "duration": 20, "exercises": ["Cat-cow", "Child's pose", "Seated twists"]},
-                    {"name": "Light Walking", "duration": 15, "type": "cardio", "intensity": "low"},
-                    {"name": "Full Body Stretch", "duration": 15},
-                    {"name": "Meditation", "duration": 10, "type": "meditation"}
-                ],
-                2: [
-                    {"name": "Breathing Exercise", "duration": 5, "type": "meditation"},
-                    {"name": "Yoga Flow", "duration": 25, "exercises": ["Sun salutations", "Warrior poses", "Balance poses"]},
-                    {"name": "Mobility Work", "duration": 15, "exercises": ["Hip circles", "Spine waves", "Leg swings"]},
-                    {"name": "Light Cardio", "duration": 20, "type": "cardio", "intensity": "low"},
-                    {"name": "Deep Stretching", "duration": 15},
-                    {"name": "Meditation", "duration": 10, "type": "meditation"}
-                ],
-                3: [
-                    {"name": "Breathing & Warm-up", "duration": 10, "type": "meditation"},
-                    {"name": "Advanced Yoga Flow", "duration": 30, "exercises": ["Vinyasa flow", "Inversions", "Arm balances"]},
-                    {"name": "Mobility & Flexibility", "duration": 20, "exercises": ["Full range movements", "PNF stretching"]},
-                    {"name": "Gentle Cardio", "duration": 25, "type": "cardio", "intensity": "moderate"},
-                    {"name": "Restorative Stretching", "duration": 15},
-                    {"name": "Guided Meditation", "duration": 15, "type": "meditation"}
-                ]
-            }
-        },
-        "hiit": {
-            "name": "HIIT Program",
-            "description": "High-intensity interval training for maximum efficiency and fat burning.",
-            "workouts": {
-                1: [
-                    {"name": "Warm-up", "duration": 10, "exercises": ["Jumping jacks", "High knees", "Butt kicks"], "rest": 20},
-                    {"name": "HIIT Circuit", "duration": 20, "rounds": 4, "work": 30, "rest": 60, "exercises": ["Jumping jacks", "Push-ups", "Squats", "Plank"]},
-                    {"name": "Active Rest", "duration": 3, "type": "rest"},
-                    {"name": "Cool-down & Stretch", "duration": 10}
-                ],
-                2: [
-                    {"name": "Dynamic Warm-up", "duration": 10, "exercises": ["Jumping jacks", "Burpees", "Mountain climbers"], "rest": 15},
-                    {"name": "HIIT Circuit", "duration": 25, "rounds": 5, "work": 45, "rest": 45, "exercises": ["Burpees", "Mountain climbers", "Jump squats", "Push-ups", "Plank"]},
-                    {"name": "Active Rest", "duration": 3, "type": "rest"},
-                    {"name": "Cool-down & Stretch", "duration": 10}
-                ],
-                3: [
-                    {"name": "Dynamic Warm-up", "duration": 10, "exercises": ["Jumping jacks", "Burpees", "High knees"], "rest": 10},
-                    {"name": "Advanced HIIT", "duration": 30, "rounds": 6, "work": 60, "rest": 30, "exercises": ["Burpees", "Mountain climbers", "Jump squats", "Push-ups", "Plank jacks", "High knees"]},
-                    {"name": "Active Rest", "duration": 3, "type": "rest"},
-                    {"name": "Cool-down & Stretch", "duration": 10}
-                ]
-            }
-        },
-        "yoga": {
-            "name": "Yoga Program",
-            "description": "Improve flexibility, strength, and mental clarity through yoga practice.",
-            "workouts": {
-                1: [
-                    {"name": "Breathing Exercise", "duration": 5, "type": "meditation"},
-                    {"name": "Gentle Yoga Flow", "duration": 25, "exercises": ["Cat-cow", "Child's pose", "Downward dog", "Warrior I"]},
-                    {"name": "Seated Poses", "duration": 10, "exercises": ["Seated forward fold", "Seated twists", "Butterfly pose"]},
-                    {"name": "Savasana", "duration": 10, "type": "meditation"}
-                ],
-                2: [
-                    {"name": "Pranayama", "duration": 5, "type": "meditation"},
-                    {"name": "Sun Salutations", "duration": 15, "rounds": 5},
-                    {"name": "Standing Poses", "duration": 20, "exercises": ["Warrior I & II", "Triangle pose", "Tree pose"]},
-                    {"name": "Floor Poses", "duration": 15, "exercises": ["Bridge pose", "Reclined twists", "Hip openers"]},
-                    {"name": "Savasana", "duration": 10, "type": "meditation"}
-                ],
-                3: [
-                    {"name": "Pranayama", "duration": 10, "type": "meditation"},
-                    {"name": "Advanced Sun Salutations", "duration": 20, "rounds": 8},
-                    {"name": "Power Yoga Flow", "duration": 30, "exercises": ["Advanced warrior variations", "Arm balances", "Inversions"]},
-                    {"name": "Deep Stretching", "duration": 15, "exercises": ["Advanced hip openers", "Backbends", "Forward folds"]},
-                    {"name": "Savasana", "duration": 15, "type": "meditation"}
-                ]
-            }
-        }
-    }
-    
-    # Get program data
-    program_data = workouts.get(program_type.lower(), workouts["beginner"])
+    catalog = load_catalog()
+    program_data = catalog.program(program_type)
     
     # Determine level tier (1-3, 4-6, 7-10)
-    if user_level <= 3:
-        level_tier = 1
-    elif user_level <= 6:
-        level_tier = 2
-    else:
-        level_tier = 3
+    tier = level_tier(user_level)
     
     # Get workouts for the level tier
-    workout_list = program_data["workouts"].get(level_tier, program_data["workouts"][1])
+    workout_list = catalog.blocks(program_type, tier)
     
     return {
         "program_name": program_data["name"],
         "description": program_data["description"],
-        "workouts": workout_list,
+        "workouts": thaw(workout_list),
         "user_level": user_level,
-        "level_tier": level_tier,
+        "level_tier": tier,
+        "total_duration": catalog.total_duration(program_type, tier)
+    }
+
+
+def compose_session(program_type, user_level, minutes, intensity="moderate", equipment=None):
+    """
+    Build a session that fits a minute budget
+    
+    Picks at most one variant of each exercise from the user's tier and the
+    neighbouring tiers of the program so the total duration stays within
+    `minutes` while maximising how well each block's effort matches the
+    requested intensity (a multiple-choice knapsack over block durations).
+    
+    Args:
+        program_type: Type of program (beginner, strength, cardio, wellness, hiit, yoga)
+        user_level: User's current level (1-10)
+        minutes: Session length budget in minutes
+        intensity: "low", "moderate", "high" or a target effort from 1 to 5
+        equipment: Iterable of available equipment (None means anything is available)
+    
+    Returns:
+        Workout plan in the same shape as get_workouts_for_program
+    
+    Raises:
+        ValueError: If intensity is neither a known level nor an effort from 1 to 5
+    """
+    catalog = load_catalog()
+    program_key = catalog.resolve(program_type)
+    program_data = catalog.program(program_key)
+    tier = level_tier(user_level)
+    target = _target_effort(intensity)
+    available = frozenset(equipment) if equipment is not None else None
+    
+    workout_list = _compose(program_key, tier, max(0, int(minutes)), target, available)
+    
+    return {
+        "program_name": program_data["name"],
+        "description": program_data["description"],
+        "workouts": thaw(workout_list),
+        "user_level": user_level,
+        "level_tier": tier,
+        "intensity": intensity,
+        "minutes_budget": minutes,
         "total_duration": sum(w.get("duration", 0) for w in workout_list)
     }
 
+
+def compose_sessions(requests):
+    """
+    Compose sessions in bulk
+    
+    Args:
+        requests: Iterable of dicts with compose_session keyword arguments
+    
+    Returns:
+        List of workout plans in request order; identical requests are served
+        from the composition cache
+    """
+    return [compose_session(**req) for req in requests]
+
+
+def _target_effort(intensity):
+    """Target block effort for an intensity level name or a number from 1 to 5"""
+    if isinstance(intensity, str) and intensity.lower() in INTENSITY_EFFORT:
+        return float(INTENSITY_EFFORT[intensity.lower()])
+    try:
+        effort = float(intensity)
+    except (TypeError, ValueError):
+        effort = None
+    if effort is None or not 1 <= effort <= 5:
+        raise ValueError(
+            f"Unknown intensity {intensity!r}: use one of {', '.join(INTENSITY_EFFORT)} or an effort from 1 to 5"
+        )
+    return effort
+
+
+@functools.lru_cache(maxsize=4096)
+def _compose(program_key, tier, minutes, target, equipment):
+    """Optimal block selection for one (program, tier, budget, effort, equipment) combination"""
+    catalog = load_catalog()
+    
+    # Candidate groups: one warm-up, one cool-down, and one variant per exercise
+    groups = OrderedDict()
+    for entry in catalog.entries(program_key):
+        block = entry.block
+        duration = block.get("duration", 0)
+        if abs(entry.tier - tier) > 1 or block.get("category") == "rest":
+            continue
+        if duration <= 0 or duration > minutes:
+            continue
+        if equipment is not None and not set(block.get("equipment", ())) <= equipment:
+            continue
+        
+        role = block.get("role", "main")
+        fit = 1.0 / (1 + abs(block.get("effort", 3) - target))
+        closeness = 1.0 / (1 + abs(entry.tier - tier))
+        value = duration * fit * closeness
+        group_key = role if role != "main" else block["name"]
+        groups.setdefault(group_key, []).append((value, duration, entry))
+    
+    # Reserve the best-fitting warm-up and cool-down that fit what is left
+    chosen = []
+    for role in RESERVED_ROLES:
+        options = [o for o in groups.pop(role, ()) if o[1] <= minutes]
+        if options:
+            _, duration, entry = max(options, key=lambda o: (o[0], -o[1]))
+            chosen.append(entry)
+            minutes -= duration
+    
+    # best[v] = highest value using at most v minutes
+    best = [0.0] * (minutes + 1)
+    picks = []
+    for options in groups.values():
+        new_best = best[:]
+        pick = [-1] * (minutes + 1)
+        for v in range(minutes + 1):
+            for i, (value, duration, _) in enumerate(options):
+                if duration <= v and best[v - duration] + value > new_best[v]:
+                    new_best[v] = best[v - duration] + value
+                    pick[v] = i
+        picks.append(pick)
+        best = new_best
+    
+    v = minutes
+    for options, pick in zip(reversed(list(groups.values())), reversed(picks)):
+        i = pick[v]
+        if i >= 0:
+            _, duration, entry = options[i]
+            chosen.append(entry)
+            v -= duration
+    
+    role_order = {"warmup": 0, "main": 1, "cooldown": 2}
+    chosen.sort(key=lambda e: (role_order.get(e.block.get("role"), 1), e.position, e.tier))
+    return tuple(entry.block for entry in chosen)
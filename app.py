@@ -1,8 +1,10 @@
 import streamlit as st
 from agents.orchestrator import decide_plan
+from supabase_outbox import SupabaseOutbox
 from dotenv import load_dotenv
 import os
 from datetime import date
+import math
 import pandas as pd
 import traceback
 try:
@@ -14,6 +16,14 @@ except Exception:
 
 load_dotenv()
 
+# Seconds a cached Supabase read stays fresh; writes from this app invalidate it immediately
+CACHE_TTL = int(os.getenv("STREAMLIT_CACHE_TTL", "300"))
+
+# Charts switch to weekly/monthly averages beyond this many points
+CHART_MAX_POINTS = 180
+PAGE_SIZES = [25, 50, 100]
+LEVELS = ["low", "medium", "high"]
+
 
 def init_state():
     st.session_state.setdefault("local_logs", [])
@@ -23,29 +33,146 @@ def init_state():
     st.session_state.setdefault("user_id", "11111111-1111-1111-1111-111111111111")
 
 
-def init_supabase():
+@st.cache_resource
+def create_supabase_client():
+    """One Supabase client shared by every session; returns (client, error)"""
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     if SUPABASE_URL and SUPABASE_KEY:
         try:
             from supabase import create_client
 
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            st.session_state.supabase_error = ""
-            return client
+            return create_client(SUPABASE_URL, SUPABASE_KEY), ""
         except Exception as e:
-            st.session_state.supabase_error = str(e)
-            return None
-    else:
-        st.session_state.supabase_error = "Supabase credentials not set."
+            return None, str(e)
+    return None, "Supabase credentials not set."
+
+
+def clear_cached_read(func, user_id):
+    """Drop one user's cached entry, or the whole cache on Streamlit releases whose clear() takes no arguments"""
+    try:
+        func.clear(user_id)
+    except TypeError:
+        func.clear()
+
+
+def invalidate_cached_reads(table, user_ids):
+    """Drop cached reads once queued rows have reached Supabase"""
+    for user_id in user_ids:
+        if table == "daily_logs":
+            clear_cached_read(fetch_logs, user_id)
+            clear_cached_read(fetch_logs_frame, user_id)
+        elif table == "agent_decisions":
+            clear_cached_read(fetch_decisions, user_id)
+
+
+@st.cache_resource
+def get_outbox():
+    """Background Supabase writer shared by every session (None without a client)"""
+    client, _ = create_supabase_client()
+    if client is None:
         return None
+    return SupabaseOutbox(client, on_flush=invalidate_cached_reads)
+
+
+def init_supabase():
+    client, error = create_supabase_client()
+    st.session_state.supabase_error = error
+    return client
+
+
+def pending_rows(table):
+    """This user's rows still waiting in the outbox, newest first"""
+    outbox = get_outbox()
+    if outbox is None:
+        return []
+    return list(reversed(outbox.pending_rows(table, st.session_state.user_id)))
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_logs(user_id):
+    """User's daily logs from Supabase, newest first (cached across sessions)"""
+    client, _ = create_supabase_client()
+    resp = client.table("daily_logs").select("*").eq("user_id", user_id).order("date", desc=True).execute()
+    return resp.data if hasattr(resp, "data") else []
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_decisions(user_id):
+    """User's agent decisions from Supabase, newest first (cached across sessions)"""
+    client, _ = create_supabase_client()
+    resp = client.table("agent_decisions").select("*").eq("user_id", user_id).order("date", desc=True).execute()
+    return resp.data if hasattr(resp, "data") else []
+
+
+def build_logs_frame(logs):
+    """
+    Typed DataFrame of daily logs, oldest first
+
+    Dates are datetime64, stress/energy are ordered categoricals and
+    missed_workout is boolean, so filters and counts stay vectorised.
+    """
+    df = pd.DataFrame.from_records(logs) if logs else pd.DataFrame()
+    for column in ("date", "missed_workout", "stress_level", "sleep_hours", "energy_level"):
+        if column not in df.columns:
+            df[column] = pd.Series(dtype="object")
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+    df["missed_workout"] = df["missed_workout"].fillna(False).astype(bool)
+    df["sleep_hours"] = pd.to_numeric(df["sleep_hours"], errors="coerce").astype("float32")
+    for column in ("stress_level", "energy_level"):
+        df[column] = pd.Categorical(df[column], categories=LEVELS, ordered=True)
+    return df.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_logs_frame(user_id):
+    """Typed frame of the user's Supabase logs (cached across sessions)"""
+    return build_logs_frame(fetch_logs(user_id))
+
+
+def read_logs_frame(supabase):
+    if st.session_state.use_supabase and supabase:
+        try:
+            queued = pending_rows("daily_logs")
+            if queued:
+                return build_logs_frame(fetch_logs(st.session_state.user_id) + queued)
+            return fetch_logs_frame(st.session_state.user_id)
+        except Exception as e:
+            st.session_state.supabase_error = str(e)
+    # Session-only logs: rebuild the frame only when the list changes
+    local_logs = st.session_state.local_logs
+    key = (id(local_logs), len(local_logs))
+    cached = st.session_state.get("local_logs_frame")
+    if cached is None or cached[0] != key:
+        cached = (key, build_logs_frame(local_logs))
+        st.session_state.local_logs_frame = cached
+    return cached[1]
+
+
+def downsample(series, max_points=CHART_MAX_POINTS):
+    """Average a date-indexed series into weekly, then monthly, buckets when it is too long"""
+    for rule in ("W", "MS"):
+        if len(series) <= max_points:
+            break
+        series = series.resample(rule).mean().dropna()
+    return series
+
+
+def page_bounds(total, key):
+    """Page size / page number controls; returns the (start, end) slice for the current page"""
+    cols = st.columns([1, 1, 3])
+    size = cols[0].selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, math.ceil(total / size))
+    page = int(cols[1].number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page"))
+    cols[2].caption(f"{total} entries · page {page} of {pages}")
+    start = (page - 1) * size
+    return start, min(total, start + size)
 
 
 def read_logs(supabase):
     if st.session_state.use_supabase and supabase:
         try:
-            resp = supabase.table("daily_logs").select("*").eq("user_id", st.session_state.user_id).order("date", desc=True).execute()
-            return resp.data if hasattr(resp, "data") else []
+            return pending_rows("daily_logs") + fetch_logs(st.session_state.user_id)
         except Exception as e:
             st.session_state.supabase_error = str(e)
             return list(reversed(st.session_state.local_logs))
@@ -55,8 +182,7 @@ def read_logs(supabase):
 def read_decisions(supabase):
     if st.session_state.use_supabase and supabase:
         try:
-            resp = supabase.table("agent_decisions").select("*").eq("user_id", st.session_state.user_id).order("date", desc=True).execute()
-            return resp.data if hasattr(resp, "data") else []
+            return pending_rows("agent_decisions") + fetch_decisions(st.session_state.user_id)
         except Exception as e:
             st.session_state.supabase_error = str(e)
             return list(reversed(st.session_state.local_decisions))
@@ -66,7 +192,7 @@ def read_decisions(supabase):
 def write_log(supabase, log):
     if st.session_state.use_supabase and supabase:
         try:
-            supabase.table("daily_logs").insert(log).execute()
+            get_outbox().enqueue("daily_logs", log)
             return True
         except Exception as e:
             st.session_state.supabase_error = str(e)
@@ -80,7 +206,7 @@ def write_log(supabase, log):
 def write_decision(supabase, decision):
     if st.session_state.use_supabase and supabase:
         try:
-            supabase.table("agent_decisions").insert(decision).execute()
+            get_outbox().enqueue("agent_decisions", decision)
             return True
         except Exception as e:
             st.session_state.supabase_error = str(e)
@@ -113,7 +239,7 @@ st.markdown(
 
 def dashboard_view():
     st.header("Dashboard")
-    logs = read_logs(supabase)
+    df = read_logs_frame(supabase)
     decisions = read_decisions(supabase)
 
     # timeframe selector
@@ -125,23 +251,17 @@ def dashboard_view():
     else:
         period_days = None
 
-    df = pd.DataFrame(logs) if logs else pd.DataFrame()
-
-    # prepare recent period slice
-    if not df.empty and "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        if period_days:
-            cutoff = pd.to_datetime(date.today()).date() - pd.to_timedelta(period_days, unit="D")
-            period_df = df[df["date"] >= cutoff]
-        else:
-            period_df = df
+    # prepare recent period slice (frame is typed and sorted by date)
+    today = pd.Timestamp(date.today())
+    if period_days:
+        period_df = df[df["date"] >= today - pd.Timedelta(days=period_days)]
     else:
-        period_df = pd.DataFrame()
+        period_df = df
 
     total_logs = len(period_df)
-    missed_days = int(period_df["missed_workout"].sum()) if not period_df.empty else 0
+    missed_days = int(period_df["missed_workout"].sum())
     workouts_done = total_logs - missed_days
-    avg_sleep = period_df["sleep_hours"].mean() if not period_df.empty else None
+    avg_sleep = period_df["sleep_hours"].mean() if total_logs else None
 
     # KPIs (main and sidebar breakdown)
     k1, k2, k3, k4 = st.columns([1,1,1,1])
@@ -164,9 +284,8 @@ def dashboard_view():
 
     # weekly goal progress (assume goal 5 workouts/week)
     st.subheader("Weekly Goal Progress")
-    last7_cutoff = pd.to_datetime(date.today()).date() - pd.to_timedelta(7, unit="D")
-    last7 = df[df["date"] >= last7_cutoff] if not df.empty else pd.DataFrame()
-    last7_done = (len(last7) - int(last7["missed_workout"].sum())) if not last7.empty else 0
+    last7 = df[df["date"] >= today - pd.Timedelta(days=7)]
+    last7_done = len(last7) - int(last7["missed_workout"].sum())
     weekly_goal = 5
     progress = min(1.0, last7_done / weekly_goal) if weekly_goal else 0
     st.progress(int(progress * 100))
@@ -176,21 +295,23 @@ def dashboard_view():
     col_a, col_b = st.columns(2)
     with col_a:
         st.subheader("Sleep Over Time")
-        if not df.empty and "sleep_hours" in df.columns:
-            sleep_ts = df.sort_values("date")["sleep_hours"].reset_index(drop=True)
+        sleep_ts = df.dropna(subset=["date", "sleep_hours"]).set_index("date")["sleep_hours"]
+        if not sleep_ts.empty:
+            chart_ts = downsample(sleep_ts)
+            if len(chart_ts) < len(sleep_ts):
+                st.caption(f"Showing {len(chart_ts)} averaged points for {len(sleep_ts)} entries")
             if PLOTLY_AVAILABLE:
-                fig = px.line(sleep_ts, y="sleep_hours", labels={"index":"Entry","sleep_hours":"Sleep (hrs)"})
+                fig = px.line(chart_ts.reset_index(), x="date", y="sleep_hours", labels={"date":"Date","sleep_hours":"Sleep (hrs)"})
                 st.plotly_chart(fig, use_container_width=True)
             else:
-                st.line_chart(sleep_ts)
+                st.line_chart(chart_ts)
         else:
             st.info("No sleep data yet.")
 
     with col_b:
         st.subheader("Energy Distribution")
-        if not df.empty and "energy_level" in df.columns:
-            energy_counts = df["energy_level"].value_counts().reset_index()
-            energy_counts.columns = ["energy_level","count"]
+        if df["energy_level"].notna().any():
+            energy_counts = df["energy_level"].value_counts(sort=False).rename_axis("energy_level").reset_index(name="count")
             if PLOTLY_AVAILABLE:
                 fig2 = px.bar(energy_counts, x="energy_level", y="count", labels={"count":"Count","energy_level":"Energy"}, color="energy_level")
                 st.plotly_chart(fig2, use_container_width=True)
@@ -201,15 +322,16 @@ def dashboard_view():
 
     st.subheader("Recent Activity")
     if not period_df.empty:
-        recent = period_df.sort_values("date", ascending=False).head(4)
-        for _, row in recent.iterrows():
+        recent = period_df.tail(4).iloc[::-1]
+        for row in recent.itertuples(index=False):
             cols = st.columns([1,4])
             with cols[0]:
-                emoji = "✅" if not row.get("missed_workout") else "⚠️"
+                emoji = "✅" if not row.missed_workout else "⚠️"
                 st.markdown(f"<div style='font-size:28px'>{emoji}</div>", unsafe_allow_html=True)
             with cols[1]:
-                st.markdown(f"**{row.get('date')}** — Stress: **{row.get('stress_level')}**, Sleep: **{row.get('sleep_hours')}h**, Energy: **{row.get('energy_level')}**")
-                if row.get("missed_workout"):
+                day = row.date.date() if pd.notna(row.date) else "—"
+                st.markdown(f"**{day}** — Stress: **{row.stress_level}**, Sleep: **{row.sleep_hours:g}h**, Energy: **{row.energy_level}**")
+                if row.missed_workout:
                     st.markdown("<small style='color:#d9534f'>Missed workout</small>", unsafe_allow_html=True)
     else:
         st.info("No recent activity to display.")
@@ -238,10 +360,12 @@ def log_today_view():
                 "sleep_hours": sleep_hours,
                 "energy_level": energy,
             }
+            # Count missed days from the (cached) history plus the new entry
+            # instead of re-reading everything right after the write
+            logs = read_logs(supabase)
+            missed_days = sum(1 for l in logs if l.get("missed_workout")) + (1 if missed else 0)
             write_log(supabase, new_log)
 
-            logs = read_logs(supabase)
-            missed_days = sum(1 for l in logs if l.get("missed_workout")) if logs else 0
             user_state = {"missed_days": missed_days, "stress": stress, "sleep_hours": sleep_hours, "energy": energy}
             plan = decide_plan(user_state)
 
@@ -273,18 +397,25 @@ def log_today_view():
 
 def history_view():
     st.header("History")
-    logs = read_logs(supabase)
+    df = read_logs_frame(supabase)
     decisions = read_decisions(supabase)
 
     st.subheader("Daily Logs")
-    if logs:
-        st.table(pd.DataFrame(logs))
+    if not df.empty:
+        newest_first = df.iloc[::-1]
+        start, end = page_bounds(len(newest_first), "logs")
+        st.dataframe(
+            newest_first.iloc[start:end],
+            hide_index=True,
+            column_config={"date": st.column_config.DateColumn("date")},
+        )
     else:
         st.info("No logs to show.")
 
     st.subheader("Agent Decisions")
     if decisions:
-        st.table(pd.DataFrame(decisions))
+        start, end = page_bounds(len(decisions), "decisions")
+        st.dataframe(pd.DataFrame(decisions[start:end]), hide_index=True)
     else:
         st.info("No decisions to show.")
 
@@ -297,11 +428,28 @@ def settings_view():
         with st.expander("Supabase status / last error"):
             st.write(st.session_state.supabase_error)
 
+    outbox = get_outbox()
+    if outbox is not None:
+        counts = outbox.counts()
+        col1, col2 = st.columns(2)
+        col1.metric("Pending Supabase writes", counts["pending"])
+        col2.metric("Failed Supabase writes", counts["failed"])
+        if outbox.last_error:
+            st.caption(f"Last write error: {outbox.last_error}")
+        if counts["failed"] and st.button("Retry failed writes"):
+            st.success(f"{outbox.retry_failed()} writes queued again")
+
     if st.button("Clear local logs and decisions"):
         st.session_state.local_logs = []
         st.session_state.local_decisions = []
         st.success("Local data cleared")
 
+    if st.button("Refresh cached Supabase data"):
+        fetch_logs.clear()
+        fetch_logs_frame.clear()
+        fetch_decisions.clear()
+        st.success("Cache cleared; data will be re-read from Supabase")
+
 
 if page == "Dashboard":
     dashboard_view()
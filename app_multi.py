@@ -1,5 +1,6 @@
 import streamlit as st
 from agents.orchestrator import decide_plan
+from supabase_outbox import SupabaseOutbox
 from dotenv import load_dotenv
 import os
 from datetime import date
@@ -15,29 +16,49 @@ def init_state():
     st.session_state.setdefault("user_id", "11111111-1111-1111-1111-111111111111")
 
 
-def init_supabase():
+@st.cache_resource
+def create_supabase_client():
+    """One Supabase client shared by every session; returns (client, error)"""
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     if SUPABASE_URL and SUPABASE_KEY:
         try:
             from supabase import create_client
 
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            st.session_state.supabase_error = ""
-            return client
+            return create_client(SUPABASE_URL, SUPABASE_KEY), ""
         except Exception as e:
-            st.session_state.supabase_error = str(e)
-            return None
-    else:
-        st.session_state.supabase_error = "Supabase credentials not set."
+            return None, str(e)
+    return None, "Supabase credentials not set."
+
+
+@st.cache_resource
+def get_outbox():
+    """Background Supabase writer shared by every session (None without a client)"""
+    client, _ = create_supabase_client()
+    if client is None:
         return None
+    return SupabaseOutbox(client)
+
+
+def init_supabase():
+    client, error = create_supabase_client()
+    st.session_state.supabase_error = error
+    return client
+
+
+def pending_rows(table):
+    """This user's rows still waiting in the outbox, newest first"""
+    outbox = get_outbox()
+    if outbox is None:
+        return []
+    return list(reversed(outbox.pending_rows(table, st.session_state.user_id)))
 
 
 def read_logs(supabase):
     if st.session_state.use_supabase and supabase:
         try:
             resp = supabase.table("daily_logs").select("*").eq("user_id", st.session_state.user_id).order("date", desc=True).execute()
-            return resp.data if hasattr(resp, "data") else []
+            return pending_rows("daily_logs") + (resp.data if hasattr(resp, "data") else [])
         except Exception as e:
             st.session_state.supabase_error = str(e)
             return list(reversed(st.session_state.local_logs))
@@ -48,7 +69,7 @@ def read_decisions(supabase):
     if st.session_state.use_supabase and supabase:
         try:
             resp = supabase.table("agent_decisions").select("*").eq("user_id", st.session_state.user_id).order("date", desc=True).execute()
-            return resp.data if hasattr(resp, "data") else []
+            return pending_rows("agent_decisions") + (resp.data if hasattr(resp, "data") else [])
         except Exception as e:
             st.session_state.supabase_error = str(e)
             return list(reversed(st.session_state.local_decisions))
@@ -58,7 +79,7 @@ def read_decisions(supabase):
 def write_log(supabase, log):
     if st.session_state.use_supabase and supabase:
         try:
-            supabase.table("daily_logs").insert(log).execute()
+            get_outbox().enqueue("daily_logs", log)
             return True
         except Exception as e:
             st.session_state.supabase_error = str(e)
@@ -72,7 +93,7 @@ def write_log(supabase, log):
 def write_decision(supabase, decision):
     if st.session_state.use_supabase and supabase:
         try:
-            supabase.table("agent_decisions").insert(decision).execute()
+            get_outbox().enqueue("agent_decisions", decision)
             return True
         except Exception as e:
             st.session_state.supabase_error = str(e)
@@ -182,6 +203,17 @@ def settings_view():
         with st.expander("Supabase status / last error"):
             st.write(st.session_state.supabase_error)
 
+    outbox = get_outbox()
+    if outbox is not None:
+        counts = outbox.counts()
+        col1, col2 = st.columns(2)
+        col1.metric("Pending Supabase writes", counts["pending"])
+        col2.metric("Failed Supabase writes", counts["failed"])
+        if outbox.last_error:
+            st.caption(f"Last write error: {outbox.last_error}")
+        if counts["failed"] and st.button("Retry failed writes"):
+            st.success(f"{outbox.retry_failed()} writes queued again")
+
     if st.button("Clear local logs and decisions"):
         st.session_state.local_logs = []
         st.session_state.local_decisions = []
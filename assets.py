@@ -0,0 +1,185 @@
+"""
+Fingerprinted static assets for flask_app
+`flask build-assets` copies every CSS, JS and SVG file under static/ to
+ASSETS_DIR with a content hash in its name (style.css -> style.3f2a1b9c.css),
+writes gzip and, when the brotli package is installed, brotli variants next
+to it and records the mapping in manifest.json. Templates link assets with
+asset_url(), which returns the fingerprinted URL from the manifest; those are
+served from /assets/ with a one-year immutable Cache-Control, precompressed
+when the client accepts it. Files missing from the manifest fall back to
+/static/ with a ?v=<content hash> query.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from dotenv import load_dotenv
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+ASSETS_DIR = os.getenv("ASSETS_DIR", os.path.join(STATIC_DIR, "dist"))
+ASSET_EXTENSIONS = (".css", ".js", ".svg")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+HASH_LENGTH = 8
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest = {}
+_fallback_versions = {}
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest}{ext}"
+
+
+def find_assets(static_dir=STATIC_DIR, output_dir=ASSETS_DIR):
+    """Static files to fingerprint, as paths relative to static_dir with forward slashes"""
+    output_dir = os.path.abspath(output_dir)
+    found = []
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != output_dir)
+        for name in sorted(files):
+            if name.endswith(ASSET_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/"))
+    return found
+
+
+def precompress(path):
+    """
+    Write gzip (and brotli when available) variants of a file
+
+    Variants that are not smaller than the original are skipped.
+
+    Returns:
+        List of the encodings written
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    written = []
+    variants = [("gzip", ".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ("br", ".br", lambda b: brotli.compress(b, quality=11)))
+    for encoding, suffix, compress in variants:
+        packed = compress(raw)
+        if len(packed) < len(raw):
+            with open(path + suffix, "wb") as f:
+                f.write(packed)
+            written.append(encoding)
+    return written
+
+
+def build(static_dir=STATIC_DIR, output_dir=ASSETS_DIR):
+    """
+    Fingerprint and precompress the static assets and write the manifest
+
+    The output directory is rebuilt from scratch so stale hashes do not pile up.
+
+    Returns:
+        The manifest: {"style.css": "style.3f2a1b9c.css", ...}
+    """
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+    manifest = {}
+    for filename in find_assets(static_dir, output_dir):
+        source = os.path.join(static_dir, filename)
+        target_name = fingerprinted_name(filename, file_hash(source))
+        target = os.path.join(output_dir, target_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        precompress(target)
+        manifest[filename] = target_name
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(output_dir=ASSETS_DIR):
+    """Read manifest.json from a previous build; empty when assets were never built"""
+    global _manifest
+    try:
+        with open(os.path.join(output_dir, "manifest.json"), encoding="utf-8") as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+
+def asset_url(filename):
+    """
+    URL for a static asset, fingerprinted when it is in the manifest
+
+    Args:
+        filename: Path relative to static/, e.g. "style.css"
+    """
+    built = _manifest.get(filename)
+    if built:
+        return url_for("asset", filename=built)
+
+    version = None if current_app.debug else _fallback_versions.get(filename)
+    if version is None:
+        try:
+            version = file_hash(os.path.join(current_app.static_folder, filename))
+        except OSError:
+            return url_for("static", filename=filename)
+        _fallback_versions[filename] = version
+    return url_for("static", filename=filename, v=version)
+
+
+def serve_asset(filename):
+    """Serve a fingerprinted asset, precompressed when the client accepts it"""
+    if filename not in _manifest.values():
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        if candidate in request.accept_encodings and os.path.exists(os.path.join(ASSETS_DIR, filename + suffix)):
+            encoding = candidate
+            filename += suffix
+            break
+
+    response = send_from_directory(ASSETS_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+
+def init_app(app):
+    """
+    Register asset_url(), the /assets/ route and the build-assets command
+
+    Args:
+        app: Flask application
+    """
+    load_manifest()
+    app.add_template_global(asset_url)
+    app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Fingerprint and precompress static assets into ASSETS_DIR"""
+        manifest = build(app.static_folder)
+        load_manifest()
+        encodings = "gzip and brotli" if brotli is not None else "gzip (install brotli for .br variants)"
+        click.echo(f"Built {len(manifest)} assets into {ASSETS_DIR} with {encodings}")
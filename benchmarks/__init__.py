@@ -0,0 +1,4 @@
+"""
+Benchmarks for the agents and the Flask app
+Run modules from the repository root, e.g. `python -m benchmarks.bench_agents`
+"""
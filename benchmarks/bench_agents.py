@@ -0,0 +1,177 @@
+"""
+Latency and accuracy benchmark for the ML predictor and the agent pipeline
+
+Generates a deterministic synthetic cohort, then reports p50/p95/p99 latency
+and throughput for extract_features, both predictors,
+generate_ai_recommendation and decide_plan (with a stub LLM), plus the
+accuracy of the workout/energy predictions against the cohort's next-day outcomes.
+
+    python -m benchmarks.bench_agents --users 50 --days 90 --output agents.json
+    python -m benchmarks.bench_agents --users 50 --days 90 --compare agents.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import compare_results, run_metadata, summarize, time_calls, write_results
+from benchmarks.synthetic import generate_cohort, public_profile
+
+
+def build_samples(cohort):
+    """
+    One prediction sample per user-day that has a following day
+
+    Each sample holds the inputs the app would pass on that day and the
+    ground truth for the next day (workout completed, energy score).
+    """
+    profiles = {p["user_id"]: public_profile(p) for p in cohort["user_profiles"]}
+    by_user = {}
+    for log in cohort["daily_logs"]:
+        by_user.setdefault(log["user_id"], []).append(log)
+
+    samples = []
+    for user_id, logs in by_user.items():
+        for i in range(1, len(logs) - 1):
+            log = logs[i]
+            user_state = {
+                "missed_days": sum(1 for l in logs[max(0, i - 30):i] if l["missed_workout"]),
+                "stress": log["stress_level"],
+                "sleep_hours": log["sleep_hours"],
+                "energy": log["energy_level"],
+            }
+            samples.append({
+                "date": log["date"],
+                "user_state": user_state,
+                "recent_logs": logs[max(0, i - 14):i],
+                "user_profile": profiles[user_id],
+                "completed_next": not logs[i + 1]["missed_workout"],
+                "energy_next": logs[i + 1]["energy_score"],
+            })
+    return samples
+
+
+def evaluate(predictor, samples):
+    """Brier score / accuracy of workout predictions and MAE of energy predictions"""
+    if not samples:
+        return {}
+    brier = 0.0
+    correct = 0
+    energy_error = 0.0
+    for s in samples:
+        prob = predictor.predict_workout_completion(s["user_state"], s["recent_logs"], s["user_profile"])
+        energy = predictor.predict_energy_level(s["user_state"], s["recent_logs"], s["user_profile"])
+        outcome = 1 if s["completed_next"] else 0
+        brier += (prob - outcome) ** 2
+        correct += 1 if (prob >= 0.5) == bool(outcome) else 0
+        energy_error += abs(energy - s["energy_next"])
+    n = len(samples)
+    return {
+        "samples": n,
+        "completion_base_rate": round(sum(1 for s in samples if s["completed_next"]) / n, 4),
+        "workout_brier": round(brier / n, 4),
+        "workout_accuracy": round(correct / n, 4),
+        "energy_mae": round(energy_error / n, 4),
+    }
+
+
+def run(args):
+    # Isolate the predictor from any checkpoint in agents/models
+    os.environ["ML_MODEL_DIR"] = tempfile.mkdtemp(prefix="bench_models_")
+    os.environ["ML_ONLINE_LEARNING"] = "true"
+
+    from agents.ml_predictor import get_predictor
+    from agents.orchestrator import decide_plan
+    from agents.recommendation_agent import generate_ai_recommendation, set_llm_backend
+    from agents.replay import StubLLM
+
+    cohort = generate_cohort(args.users, args.days, seed=args.seed)
+    samples = build_samples(cohort)
+
+    # Train on the earlier part of the timeline, evaluate on the rest
+    dates = sorted({s["date"] for s in samples})
+    split_date = dates[int(len(dates) * args.train_fraction)] if dates else ""
+    train = [s for s in samples if s["date"] < split_date]
+    test = [s for s in samples if s["date"] >= split_date]
+
+    predictor = get_predictor()
+    accuracy = {"rules": evaluate(predictor, test)}
+    train_start = time.perf_counter()
+    predictor.learn_outcomes(
+        (predictor.extract_features(s["user_state"], s["recent_logs"], s["user_profile"]), s["completed_next"])
+        for s in train
+    )
+    train_seconds = time.perf_counter() - train_start
+    accuracy["online"] = evaluate(predictor, test)
+    accuracy["online"]["train_samples"] = len(train)
+    accuracy["online"]["train_seconds"] = round(train_seconds, 4)
+
+    stub = StubLLM(args.llm_latency_ms)
+    set_llm_backend(stub)
+
+    rng = random.Random(args.seed)
+    timed = rng.sample(samples, min(args.samples, len(samples)))
+    calls = [(s["user_state"], s["recent_logs"], s["user_profile"]) for s in timed]
+
+    # Warm up imports, model paths and caches before timing
+    for fn in (predictor.extract_features, predictor.predict_workout_completion, predictor.predict_energy_level):
+        fn(*calls[0])
+
+    benchmarks = {
+        "extract_features": predictor.extract_features,
+        "predict_workout_completion": predictor.predict_workout_completion,
+        "predict_energy_level": predictor.predict_energy_level,
+        "generate_ai_recommendation": generate_ai_recommendation,
+        "decide_plan": lambda state, logs, profile: decide_plan(state, recent_logs=logs, user_profile=profile),
+    }
+    latency = {}
+    for name, fn in benchmarks.items():
+        samples_s, elapsed, _ = time_calls(fn, calls)
+        latency[name] = summarize(samples_s, elapsed)
+    set_llm_backend(None)
+
+    return {
+        "meta": run_metadata(
+            benchmark="agents",
+            users=args.users,
+            days=args.days,
+            seed=args.seed,
+            timed_calls=len(calls),
+            llm_latency_ms=args.llm_latency_ms,
+            llm_calls=stub.calls,
+        ),
+        "latency": latency,
+        "accuracy": accuracy,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ML predictor and decide_plan on synthetic cohorts")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--samples", type=int, default=1000, help="calls timed per benchmark")
+    parser.add_argument("--train-fraction", type=float, default=0.7)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated LLM response time")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 latency against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p95 ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    write_results(results, args.output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare_results(results, baseline, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+End-to-end latency and allocation benchmark for the flask_app routes
+
+Generates a synthetic data.json (users, days of check-ins, meals, hydration,
+medical records, profile photo sizes), points flask_app at it through
+DATA_FILE and drives the Flask test client through the main routes. Reports
+p50/p95/p99 latency per route plus read_data/write_data on their own, and
+per-request allocations measured with tracemalloc in a separate pass.
+
+    python -m benchmarks.bench_routes --users 200 --days 90 --output routes.json
+    python -m benchmarks.bench_routes --users 200 --days 90 --compare routes.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.harness import compare_results, run_metadata, summarize, write_results
+from benchmarks.synthetic import generate_store
+
+CHECK_IN = {
+    "stress": "medium",
+    "sleep_hours": "7",
+    "energy": "high",
+    "mood": "calm",
+    "water_intake": "6",
+    "steps": "8000",
+    "workout_type": "cardio",
+    "workout_duration": "30",
+}
+
+
+def route_requests(store):
+    """name -> (method, path, payload) for every benchmarked route"""
+    age_group = store["user_profiles"][0]["age_group"] if store["user_profiles"] else "18-30"
+    return {
+        "dashboard": ("GET", "/dashboard", None),
+        "analytics": ("GET", "/analytics", None),
+        "log": ("POST", "/log", CHECK_IN),
+        "history": ("GET", "/history", None),
+        "nutrition": ("GET", "/nutrition", None),
+        "api_logs_get": ("GET", "/api/logs", None),
+        "api_logs_post": ("POST", "/api/logs", "json"),
+        "leaderboard": ("GET", f"/api/leaderboard/{age_group}", None),
+    }
+
+
+def send_request(client, method, path, payload, user_id):
+    if payload == "json":
+        return client.post(path, json={"user_id": user_id, "date": "2099-01-01", "missed_workout": False,
+                                       "stress_level": "low", "sleep_hours": 8, "energy_level": "high"})
+    if method == "POST":
+        return client.post(path, data=payload)
+    return client.get(path)
+
+
+def login_as(client, user_id):
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+
+
+def bench_route(client, request_spec, user_ids, iterations, reset):
+    """
+    Time one route for `iterations` requests, rotating through users
+
+    Returns:
+        (latency summary, error count)
+    """
+    method, path, payload = request_spec
+    reset()
+    samples = []
+    errors = 0
+    for i in range(iterations):
+        login_as(client, user_ids[i % len(user_ids)])
+        t0 = time.perf_counter()
+        response = send_request(client, method, path, payload, user_ids[i % len(user_ids)])
+        samples.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            errors += 1
+    # Throughput counts request time only, not the session setup between requests
+    return summarize(samples), errors
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def measure_allocations(fn, iterations):
+    """
+    Per-call allocations of fn() with tracemalloc
+
+    Returns:
+        dict with mean/max peak KB allocated during a call and mean KB retained after it
+    """
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "samples": iterations,
+        "peak_kb_mean": round(sum(peaks) / len(peaks) / 1024, 1) if peaks else None,
+        "peak_kb_max": round(max(peaks) / 1024, 1) if peaks else None,
+        "retained_kb_mean": round(sum(retained) / len(retained) / 1024, 1) if retained else None,
+    }
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench_routes_")
+    data_file = os.path.join(workdir, "data.json")
+    pristine = os.path.join(workdir, "pristine.json")
+
+    store = generate_store(
+        args.users, args.days, seed=args.seed, meals_per_day=args.meals_per_day,
+        water_per_day=args.water_per_day, medical_per_user=args.medical_per_user,
+        photo_kb=args.photo_kb, photo_share=args.photo_share,
+    )
+    with open(pristine, "w", encoding="utf-8") as f:
+        json.dump(store, f, indent=2)
+    data_file_bytes = os.path.getsize(pristine)
+    shutil.copyfile(pristine, data_file)
+
+    # flask_app and its middleware read their configuration at import time
+    os.environ["DATA_FILE"] = data_file
+    os.environ["ML_MODEL_DIR"] = os.path.join(workdir, "models")
+    os.environ["TRACE_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["PROFILE_TOKEN"] = ""
+
+    import flask_app
+    from agents.recommendation_agent import set_llm_backend
+    from agents.replay import StubLLM
+
+    flask_app.DATA_FILE = data_file
+    set_llm_backend(StubLLM(args.llm_latency_ms))
+
+    def reset():
+        shutil.copyfile(pristine, data_file)
+
+    client = flask_app.app.test_client()
+    user_ids = [p["user_id"] for p in store["user_profiles"]]
+    requests_by_route = route_requests(store)
+    if args.routes:
+        requests_by_route = {k: v for k, v in requests_by_route.items() if k in args.routes}
+
+    # Warm up templates, the feature store and the predictor
+    reset()
+    for spec in requests_by_route.values():
+        login_as(client, user_ids[0])
+        send_request(client, *spec, user_ids[0])
+
+    latency = {}
+    errors = {}
+    reset()
+    data = flask_app.read_data()
+    latency["read_data"] = summarize([_timed(flask_app.read_data) for _ in range(args.iterations)])
+    latency["write_data"] = summarize([_timed(lambda: flask_app.write_data(data)) for _ in range(args.iterations)])
+    del data
+    for name, spec in requests_by_route.items():
+        latency[name], errors[name] = bench_route(client, spec, user_ids, args.iterations, reset)
+
+    allocations = {}
+    if args.alloc_samples:
+        reset()
+        allocations["read_data"] = measure_allocations(flask_app.read_data, args.alloc_samples)
+        for name, spec in requests_by_route.items():
+            reset()
+            login_as(client, user_ids[0])
+            allocations[name] = measure_allocations(lambda: send_request(client, *spec, user_ids[0]), args.alloc_samples)
+
+    set_llm_backend(None)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": run_metadata(
+            benchmark="routes",
+            users=args.users,
+            days=args.days,
+            seed=args.seed,
+            iterations=args.iterations,
+            data_file_bytes=data_file_bytes,
+            rows={k: len(v) for k, v in store.items() if isinstance(v, list)},
+            photo_kb=args.photo_kb,
+            llm_latency_ms=args.llm_latency_ms,
+        ),
+        "latency": latency,
+        "errors": errors,
+        "allocations": allocations,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark flask_app routes against a synthetic data.json")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--water-per-day", type=int, default=6)
+    parser.add_argument("--medical-per-user", type=int, default=3)
+    parser.add_argument("--photo-kb", type=int, default=50, help="profile photo size (0 for none)")
+    parser.add_argument("--photo-share", type=float, default=0.5, help="share of users with a photo")
+    parser.add_argument("--iterations", type=int, default=50, help="timed requests per route")
+    parser.add_argument("--alloc-samples", type=int, default=5, help="requests per route traced for allocations (0 skips)")
+    parser.add_argument("--routes", nargs="*", help="only these routes")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated LLM response time")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 latency against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p95 ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    write_results(results, args.output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare_results(results, baseline, args.threshold)
+        alloc_lines, alloc_regressions = compare_results(
+            results, baseline, args.threshold, section="allocations", metric="peak_kb_mean"
+        )
+        print("\n".join(lines + alloc_lines), file=sys.stderr)
+        return 1 if regressions or alloc_regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Shared helpers for benchmarks: timing, percentile summaries and result files
+"""
+import json
+import math
+import platform
+import time
+from datetime import datetime
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples, elapsed=None):
+    """
+    Summarize latency samples (seconds)
+
+    Args:
+        samples: List of per-call durations in seconds
+        elapsed: Wall-clock seconds for the whole run (defaults to the sum of samples)
+
+    Returns:
+        dict with count, mean/p50/p95/p99/max in milliseconds and throughput per second
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+    elapsed = elapsed if elapsed is not None else sum(ordered)
+
+    def ms(value):
+        return round(value * 1000, 4) if value is not None else None
+
+    return {
+        "count": count,
+        "mean_ms": ms(sum(ordered) / count) if count else None,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else None,
+        "throughput_per_s": round(count / elapsed, 2) if elapsed else None,
+    }
+
+
+def time_calls(fn, calls):
+    """
+    Call fn(*args) for every args tuple in calls
+
+    Returns:
+        (samples, elapsed, results) where samples are per-call seconds
+    """
+    samples = []
+    results = []
+    start = time.perf_counter()
+    for args in calls:
+        t0 = time.perf_counter()
+        results.append(fn(*args))
+        samples.append(time.perf_counter() - t0)
+    return samples, time.perf_counter() - start, results
+
+
+def run_metadata(**extra):
+    """Environment details recorded alongside every result file"""
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def write_results(results, path=None):
+    """Write results as JSON to path, or print them when no path is given"""
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def compare_results(current, baseline, threshold=1.2, section="latency", metric="p95_ms"):
+    """
+    Compare a metric between two result files
+
+    Returns:
+        (report_lines, regressions) where regressions lists the names whose
+        metric grew by more than `threshold` times the baseline
+    """
+    lines = []
+    regressions = []
+    for name, stats in sorted(current.get(section, {}).items()):
+        base = baseline.get(section, {}).get(name)
+        if not base or not base.get(metric) or stats.get(metric) is None:
+            lines.append(f"{name:<32} {metric}={stats.get(metric)} (no baseline)")
+            continue
+        ratio = stats[metric] / base[metric]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(f"{name:<32} {metric} {base[metric]:.3f} -> {stats[metric]:.3f} ({ratio:.2f}x){flag}")
+    return lines, regressions
@@ -0,0 +1,114 @@
+"""
+Local stand-in for the OpenAI and Anthropic HTTP APIs
+
+Answers POST /v1/chat/completions (OpenAI) and POST /v1/messages (Anthropic)
+with a fixed recommendation after a configurable latency, optionally failing a
+share of calls. Point the SDKs at it with OPENAI_BASE_URL=http://host:port/v1
+and ANTHROPIC_BASE_URL=http://host:port.
+
+    python -m benchmarks.llm_stub --port 8765 --latency-ms 800
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+
+from agents.replay import STUB_LLM_TEXT
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, error_rate=0.0, seed=None):
+        super().__init__(address, StubLLMHandler)
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_call(self):
+        """Count a call; returns True when it should fail"""
+        with self._lock:
+            self.calls += 1
+            fail = self.error_rate and self.rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return fail
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="llm-stub", daemon=True).start()
+        return self
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        fail = self.server.next_call()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if fail:
+            return self._reply(500, {"error": {"type": "server_error", "message": "stub failure"}})
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            return self._reply(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": STUB_LLM_TEXT}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        if self.path.rstrip("/").endswith("/messages"):
+            return self._reply(200, {
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "model": body.get("model", "stub"),
+                "content": [{"type": "text", "text": STUB_LLM_TEXT}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": 0, "output_tokens": 0},
+            })
+        return self._reply(404, {"error": {"type": "not_found", "message": self.path}})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stub OpenAI/Anthropic API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server = StubLLMServer((args.host, args.port), args.latency_ms, args.error_rate)
+    print(f"Stub LLM API on {server.url} (OPENAI_BASE_URL={server.url}/v1, ANTHROPIC_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Concurrent load test for flask_app with a local LLM stub
+
+Starts a stub OpenAI/Anthropic API (benchmarks.llm_stub) and, unless --url
+points at a running server, serves flask_app in a subprocess against a
+synthetic data.json. Virtual users then arrive at --rate sessions per second
+for --duration seconds and run mixed sessions (login, dashboard views,
+check-in, water taps). Reports throughput, error rate and tail latency per step.
+
+    python -m benchmarks.load_test --users 100 --rate 5 --duration 30 --llm-latency-ms 800
+    python -m benchmarks.load_test --url http://127.0.0.1:3000 --rate 2 --duration 60
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.harness import compare_results, percentile, run_metadata, summarize, write_results
+from benchmarks.llm_stub import StubLLMServer
+from benchmarks.synthetic import SYNTHETIC_PASSWORD, generate_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK_IN_SHARE = 0.6     # sessions that submit a check-in
+REQUEST_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(data_file, port, llm_url, model_dir):
+    """Serve flask_app on a threaded dev server in a subprocess"""
+    env = dict(os.environ)
+    env.update({
+        "DATA_FILE": data_file,
+        "ML_MODEL_DIR": model_dir,
+        "OPENAI_API_KEY": env.get("LOAD_TEST_OPENAI_KEY", "sk-load-test"),
+        "OPENAI_BASE_URL": f"{llm_url}/v1",
+        "ANTHROPIC_BASE_URL": llm_url,
+        "TRACE_ENABLED": "false",
+        "PROFILE_TOKEN": "",
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "flask_app", "run",
+         "--host", "127.0.0.1", "--port", str(port), "--with-threads", "--no-reload"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+
+
+def wait_ready(base_url, process=None, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"app exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            if requests.get(f"{base_url}/login", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"app at {base_url} not ready after {timeout}s")
+
+
+def session_steps(rng, water_taps):
+    """One mixed session: login, dashboard, maybe a check-in, some water taps, dashboard"""
+    steps = ["login", "dashboard"]
+    if rng.random() < CHECK_IN_SHARE:
+        steps.append("check_in")
+    steps.extend(["water"] * rng.randint(0, water_taps))
+    steps.append("dashboard")
+    return steps
+
+
+def _request(http, base_url, step, email, rng):
+    if step == "login":
+        return http.post(f"{base_url}/login", data={"email": email, "password": SYNTHETIC_PASSWORD},
+                         allow_redirects=False, timeout=REQUEST_TIMEOUT)
+    if step == "dashboard":
+        return http.get(f"{base_url}/dashboard", timeout=REQUEST_TIMEOUT)
+    if step == "check_in":
+        return http.post(f"{base_url}/log", allow_redirects=False, timeout=REQUEST_TIMEOUT, data={
+            "stress": rng.choice(["low", "medium", "high"]),
+            "sleep_hours": str(rng.choice([5, 6, 7, 8, 9])),
+            "energy": rng.choice(["low", "medium", "high"]),
+            "water_intake": str(rng.randint(2, 10)),
+        })
+    if step == "water":
+        return http.post(f"{base_url}/api/log-water", timeout=REQUEST_TIMEOUT)
+    raise ValueError(step)
+
+
+def run_session(base_url, email, steps, seed):
+    """Run one virtual user's session; returns [(step, seconds, error or None)]"""
+    rng = random.Random(seed)
+    results = []
+    with requests.Session() as http:
+        for step in steps:
+            t0 = time.perf_counter()
+            error = None
+            try:
+                response = _request(http, base_url, step, email, rng)
+                if response.status_code >= 400:
+                    error = f"HTTP {response.status_code}"
+                elif step == "login" and response.status_code != 302:
+                    # the login form is re-rendered when the credentials are not found
+                    error = "login rejected"
+            except requests.RequestException as e:
+                error = type(e).__name__
+            results.append((step, time.perf_counter() - t0, error))
+    return results
+
+
+def run_load(base_url, emails, rate, duration, concurrency, water_taps, seed):
+    """
+    Open-loop load: sessions start every 1/rate seconds regardless of how fast earlier ones finish
+
+    Returns:
+        (per-request results, per-session start lag in seconds, wall seconds)
+    """
+    rng = random.Random(seed)
+    total = max(1, int(rate * duration))
+    lags = []
+    lag_lock = threading.Lock()
+
+    def scheduled(due, email, steps, session_seed):
+        with lag_lock:
+            lags.append(max(0.0, time.perf_counter() - due))
+        return run_session(base_url, email, steps, session_seed)
+
+    futures = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            due = start + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            email = rng.choice(emails)
+            futures.append(pool.submit(scheduled, due, email, session_steps(rng, water_taps), rng.random()))
+        results = [item for future in futures for item in future.result()]
+    return results, lags, time.perf_counter() - start
+
+
+def report(results, lags, wall):
+    by_step = {}
+    errors = {}
+    error_kinds = {}
+    for step, seconds, error in results:
+        by_step.setdefault(step, []).append(seconds)
+        if error:
+            errors[step] = errors.get(step, 0) + 1
+            error_kinds[error] = error_kinds.get(error, 0) + 1
+    latency = {step: summarize(samples, wall) for step, samples in by_step.items()}
+    latency["all"] = summarize([seconds for _, seconds, _ in results], wall)
+    failed = sum(errors.values())
+    lags = sorted(lags)
+    return {
+        "latency": latency,
+        "errors": errors,
+        "totals": {
+            "requests": len(results),
+            "errors": failed,
+            "error_rate": round(failed / len(results), 4) if results else None,
+            "error_kinds": error_kinds,
+            "throughput_rps": round(len(results) / wall, 2) if wall else None,
+            "sessions": len(lags),
+            "wall_seconds": round(wall, 3),
+            "start_lag_p95_ms": round(percentile(lags, 95) * 1000, 2) if lags else None,
+        },
+    }
+
+
+def run(args):
+    llm = StubLLMServer(("127.0.0.1", 0), args.llm_latency_ms, args.llm_error_rate, seed=args.seed).start()
+    process = None
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            emails = [f"user{i}@example.com" for i in range(args.users)]
+            wait_ready(base_url)
+        else:
+            store = generate_store(args.users, args.days, seed=args.seed, photo_kb=args.photo_kb)
+            data_file = os.path.join(workdir, "data.json")
+            with open(data_file, "w", encoding="utf-8") as f:
+                json.dump(store, f, indent=2)
+            emails = [p["email"] for p in store["user_profiles"]]
+            port = args.port or free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_app(data_file, port, llm.url, os.path.join(workdir, "models"))
+            wait_ready(base_url, process)
+
+        results, lags, wall = run_load(base_url, emails, args.rate, args.duration,
+                                       args.concurrency, args.water_taps, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        llm.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out = report(results, lags, wall)
+    out["totals"]["llm_calls"] = llm.calls
+    out["totals"]["llm_errors"] = llm.errors
+    out["meta"] = run_metadata(
+        benchmark="load",
+        url=args.url,
+        users=args.users,
+        days=args.days,
+        rate=args.rate,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        water_taps=args.water_taps,
+        seed=args.seed,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_error_rate=args.llm_error_rate,
+    )
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test flask_app with mixed user sessions and a stub LLM API")
+    parser.add_argument("--url", help="target a running server instead of starting one (its users need user<N>@example.com accounts)")
+    parser.add_argument("--port", type=int, help="port for the started server (default: a free port)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--photo-kb", type=int, default=0)
+    parser.add_argument("--rate", type=float, default=2.0, help="new sessions per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of session arrivals")
+    parser.add_argument("--concurrency", type=int, default=16, help="max simultaneous sessions")
+    parser.add_argument("--water-taps", type=int, default=3, help="max water taps per session")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 latency against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p95 ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    write_results(results, args.output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare_results(results, baseline, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Memory footprint of the data store as it grows
+
+For each user count generates a synthetic data.json and reports the file
+size, the in-memory size of every collection once loaded, and the tracemalloc
+peak of read_data() and of the main routes. Because read_data() materializes
+the whole store per request, the per-request peak times the number of
+concurrent requests approximates a worker's memory need.
+
+    python -m benchmarks.memory_scaling --users 50 100 200 400 --days 90 --output memory.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.bench_routes import login_as, measure_allocations, route_requests, send_request
+from benchmarks.harness import run_metadata, write_results
+from benchmarks.synthetic import generate_store
+
+ROUTES = ("dashboard", "log", "history")
+
+
+def measure_size(flask_app, client, store, data_file, samples, concurrency):
+    from profiling import collection_sizes
+
+    with open(data_file, "w", encoding="utf-8") as f:
+        json.dump(store, f, indent=2)
+    pristine = data_file + ".pristine"
+    shutil.copyfile(data_file, pristine)
+    flask_app.DATA_FILE = data_file
+
+    collections = collection_sizes(flask_app.read_data())
+    read_peak = measure_allocations(flask_app.read_data, samples)
+
+    user_id = store["user_profiles"][0]["user_id"]
+    specs = route_requests(store)
+    routes = {}
+    for name in ROUTES:
+        shutil.copyfile(pristine, data_file)
+        login_as(client, user_id)
+        send_request(client, *specs[name], user_id)  # warm up
+        routes[name] = measure_allocations(lambda: send_request(client, *specs[name], user_id), samples)
+
+    worst_peak_kb = max([read_peak["peak_kb_max"]] + [r["peak_kb_max"] for r in routes.values()])
+    return {
+        "users": len(store["user_profiles"]),
+        "file_bytes": os.path.getsize(pristine),
+        "memory_bytes": sum(c["bytes"] for c in collections.values()),
+        "collections": collections,
+        "read_data": read_peak,
+        "routes": routes,
+        "est_worker_peak_mb": round(worst_peak_kb * concurrency / 1024, 1),
+    }
+
+
+def scaling_summary(sizes):
+    """Marginal memory per extra user between the smallest and largest store"""
+    if len(sizes) < 2:
+        return {}
+    first, last = sizes[0], sizes[-1]
+    users = last["users"] - first["users"]
+    if users <= 0:
+        return {}
+    return {
+        "file_bytes_per_user": round((last["file_bytes"] - first["file_bytes"]) / users),
+        "memory_bytes_per_user": round((last["memory_bytes"] - first["memory_bytes"]) / users),
+        "read_peak_kb_per_user": round((last["read_data"]["peak_kb_max"] - first["read_data"]["peak_kb_max"]) / users, 2),
+    }
+
+
+def format_table(sizes):
+    lines = [f"{'users':>7} {'file MB':>9} {'heap MB':>9} {'read peak MB':>13} {'route peak MB':>14} {'est worker MB':>14}"]
+    for s in sizes:
+        route_peak = max(r["peak_kb_max"] for r in s["routes"].values())
+        lines.append(
+            f"{s['users']:>7} {s['file_bytes'] / 2**20:>9.1f} {s['memory_bytes'] / 2**20:>9.1f} "
+            f"{s['read_data']['peak_kb_max'] / 1024:>13.1f} {route_peak / 1024:>14.1f} {s['est_worker_peak_mb']:>14.1f}"
+        )
+    return "\n".join(lines)
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="memory_scaling_")
+    data_file = os.path.join(workdir, "data.json")
+    with open(data_file, "w", encoding="utf-8") as f:
+        json.dump(generate_store(1, 1, seed=args.seed), f)
+
+    os.environ["DATA_FILE"] = data_file
+    os.environ["ML_MODEL_DIR"] = os.path.join(workdir, "models")
+    os.environ["TRACE_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["PROFILE_TOKEN"] = ""
+
+    import flask_app
+    from agents.recommendation_agent import set_llm_backend
+    from agents.replay import StubLLM
+
+    set_llm_backend(StubLLM())
+    client = flask_app.app.test_client()
+    sizes = []
+    try:
+        for users in sorted(args.users):
+            store = generate_store(users, args.days, seed=args.seed, meals_per_day=args.meals_per_day,
+                                   water_per_day=args.water_per_day, photo_kb=args.photo_kb)
+            sizes.append(measure_size(flask_app, client, store, data_file, args.samples, args.concurrency))
+            del store
+    finally:
+        set_llm_backend(None)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": run_metadata(
+            benchmark="memory_scaling",
+            days=args.days,
+            seed=args.seed,
+            photo_kb=args.photo_kb,
+            samples=args.samples,
+            concurrency=args.concurrency,
+        ),
+        "sizes": sizes,
+        "scaling": scaling_summary(sizes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report data store memory use across store sizes")
+    parser.add_argument("--users", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--water-per-day", type=int, default=6)
+    parser.add_argument("--photo-kb", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=3, help="traced calls per measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent requests per worker for the estimate")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    write_results(results, args.output)
+    print(format_table(results["sizes"]), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
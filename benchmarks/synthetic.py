@@ -0,0 +1,246 @@
+"""
+Deterministic synthetic data for benchmarks
+Generates users x days of check-ins with realistic correlations: short sleep
+raises stress, stress and short sleep lower energy, and low energy or high
+stress make a missed workout more likely. The same seed always yields the same data.
+"""
+import base64
+import hashlib
+import random
+import uuid
+from datetime import date, timedelta
+
+ACTIVITY_LEVELS = ["sedentary", "light", "moderate", "active", "very_active"]
+GOALS = ["lose_weight", "build_muscle", "improve_fitness", "reduce_stress", "better_sleep"]
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Riley", "Casey", "Morgan", "Jamie", "Avery", "Quinn"]
+STRESS_CODES = {"low": 0, "medium": 1, "high": 2}
+MEAL_NAMES = ["Oatmeal", "Chicken Salad", "Rice Bowl", "Greek Yogurt", "Pasta", "Smoothie", "Omelette", "Stir Fry"]
+MEAL_TIMES = ["08:00", "12:30", "16:00", "19:30", "21:00"]
+MEDICATIONS = ["Vitamin D", "Ibuprofen", "Omega-3", "Iron", "Magnesium"]
+VACCINES = ["Influenza", "Tetanus", "Hepatitis B", "COVID-19"]
+
+# Every synthetic account logs in with this password
+SYNTHETIC_PASSWORD = "benchmark"
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _user_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _age_group(age):
+    if age <= 17:
+        return "13-17"
+    if age <= 30:
+        return "18-30"
+    if age <= 50:
+        return "31-50"
+    return "50+"
+
+
+def generate_profile(rng, index):
+    """One synthetic user profile with hidden behavioural traits"""
+    age = rng.randint(16, 70)
+    activity_level = rng.choice(ACTIVITY_LEVELS)
+    return {
+        "user_id": _user_id(rng),
+        "name": f"{rng.choice(FIRST_NAMES)} {index}",
+        "email": f"user{index}@example.com",
+        "age": age,
+        "age_group": _age_group(age),
+        "height": round(rng.uniform(150, 195), 1),
+        "weight": round(rng.uniform(50, 110), 1),
+        "activity_level": activity_level,
+        "goal": rng.choice(GOALS),
+        "level": ACTIVITY_LEVELS.index(activity_level) + 1,
+        "experience_points": 0,
+        "profile_photo": None,
+        "total_logs": 0,
+        "workouts_completed": 0,
+        # hidden traits driving the generated logs
+        "_sleep_mean": _clamp(rng.gauss(7.0, 0.8), 4.5, 9.5),
+        "_stress_prone": rng.random(),
+        "_discipline": rng.uniform(0.35, 0.9),
+    }
+
+
+def generate_user_logs(rng, profile, days, end):
+    """Daily check-ins for one user ending on `end` (inclusive)"""
+    logs = []
+    prev_completed = True
+    for offset in range(days):
+        day = end - timedelta(days=days - 1 - offset)
+        sleep = round(_clamp(rng.gauss(profile["_sleep_mean"], 1.0), 3, 11) * 2) / 2
+
+        stress_score = profile["_stress_prone"] * 1.5 + (7 - sleep) * 0.35 + rng.gauss(0, 0.5)
+        stress = "low" if stress_score < 0.6 else "high" if stress_score > 1.4 else "medium"
+
+        energy_score = _clamp(sleep / 10 * 5 + (2 - STRESS_CODES[stress]) * 2.5 + rng.gauss(0, 1), 0, 10)
+        energy = "low" if energy_score < 4 else "high" if energy_score > 6.5 else "medium"
+
+        p_complete = (profile["_discipline"] + 0.06 * (energy_score - 5)
+                      - 0.08 * STRESS_CODES[stress] + (0.08 if prev_completed else -0.08))
+        completed = rng.random() < _clamp(p_complete, 0.05, 0.95)
+        prev_completed = completed
+
+        logs.append({
+            "user_id": profile["user_id"],
+            "date": day.isoformat(),
+            "missed_workout": not completed,
+            "stress_level": stress,
+            "sleep_hours": sleep,
+            "energy_level": energy,
+            "energy_score": round(energy_score, 2),
+            "mood": rng.choice(["happy", "calm", "neutral", "tired", "stressed"]),
+            "water_intake": rng.randint(2, 10),
+            "steps": rng.randint(1500, 15000),
+            "distance": None,
+            "heart_rate": rng.randint(55, 105),
+            "calories": rng.randint(1500, 3000),
+            "weight": None,
+            "workout_type": "" if not completed else rng.choice(["cardio", "strength", "yoga", "hiit"]),
+            "workout_duration": rng.randint(15, 75) if completed else None,
+            "notes": "",
+        })
+    return logs
+
+
+def generate_cohort(users, days, seed=42, end=None):
+    """
+    Generate a synthetic cohort
+
+    Args:
+        users: Number of users
+        days: Days of check-ins per user
+        seed: Random seed (same seed, same data)
+        end: Last day of logs (defaults to today)
+
+    Returns:
+        dict with user_profiles and daily_logs (logs ordered by date across users)
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    profiles = []
+    logs = []
+    for index in range(users):
+        profile = generate_profile(rng, index)
+        user_logs = generate_user_logs(rng, profile, days, end)
+        profile["total_logs"] = len(user_logs)
+        profile["workouts_completed"] = sum(1 for l in user_logs if not l["missed_workout"])
+        profiles.append(profile)
+        logs.extend(user_logs)
+    logs.sort(key=lambda l: l["date"])
+    return {"user_profiles": profiles, "daily_logs": logs}
+
+
+def public_profile(profile):
+    """Profile without the hidden generator traits"""
+    return {k: v for k, v in profile.items() if not k.startswith("_")}
+
+
+def _record_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_store(users, days, seed=42, end=None, meals_per_day=3, water_per_day=6,
+                   medical_per_user=3, photo_kb=0, photo_share=0.5, decisions=True):
+    """
+    Generate a complete data.json store for route benchmarks
+
+    Args:
+        users: Number of users
+        days: Days of check-ins (and meals/hydration) per user
+        seed: Random seed (same seed, same data)
+        end: Last day of data (defaults to today)
+        meals_per_day: Meals logged per user per day
+        water_per_day: Water taps per user per day
+        medical_per_user: Medications, vaccinations and medical reports per user (each)
+        photo_kb: Size of the base64 profile photo in KB (0 for none)
+        photo_share: Share of users with a profile photo
+        decisions: Add one agent decision per check-in
+
+    Returns:
+        dict in the flask_app data.json layout
+    """
+    end = end or date.today()
+    cohort = generate_cohort(users, days, seed=seed, end=end)
+    rng = random.Random(seed + 1)
+    password_hash = hashlib.sha256(SYNTHETIC_PASSWORD.encode()).hexdigest()
+
+    profiles = []
+    meals = []
+    hydration = []
+    medications = []
+    vaccinations = []
+    records = []
+    for profile in cohort["user_profiles"]:
+        user = public_profile(profile)
+        user["password_hash"] = password_hash
+        user["created_at"] = (end - timedelta(days=days)).isoformat()
+        if photo_kb and rng.random() < photo_share:
+            user["profile_photo"] = base64.b64encode(rng.randbytes(photo_kb * 768)).decode()
+        profiles.append(user)
+
+        user_id = user["user_id"]
+        for offset in range(days):
+            day = (end - timedelta(days=offset)).isoformat()
+            for i in range(meals_per_day):
+                meals.append({
+                    "id": _record_id(rng),
+                    "user_id": user_id,
+                    "date": day,
+                    "time": MEAL_TIMES[i % len(MEAL_TIMES)],
+                    "name": rng.choice(MEAL_NAMES),
+                    "calories": rng.randint(150, 900),
+                    "protein": rng.randint(0, 60),
+                    "carbs": rng.randint(0, 120),
+                    "fats": rng.randint(0, 40),
+                })
+            for i in range(water_per_day):
+                hydration.append({
+                    "id": _record_id(rng),
+                    "user_id": user_id,
+                    "date": day,
+                    "time": f"{(8 + i * 2) % 24:02d}:{rng.randint(0, 59):02d}",
+                })
+        for i in range(medical_per_user):
+            on = (end - timedelta(days=rng.randint(0, 365))).isoformat()
+            medications.append({
+                "id": _record_id(rng), "user_id": user_id, "name": rng.choice(MEDICATIONS),
+                "dosage": f"{rng.choice([5, 10, 200, 500])} mg", "frequency": "daily", "start_date": on, "notes": "",
+            })
+            vaccinations.append({
+                "id": _record_id(rng), "user_id": user_id, "name": rng.choice(VACCINES),
+                "date": on, "provider": "City Clinic", "notes": "",
+            })
+            records.append({
+                "id": _record_id(rng), "user_id": user_id, "title": "Annual checkup",
+                "date": on, "facility": "City Clinic", "notes": "Routine results",
+            })
+
+    agent_decisions = []
+    if decisions:
+        for log in cohort["daily_logs"]:
+            agent_decisions.append({
+                "user_id": log["user_id"],
+                "date": log["date"],
+                "goal_status": "at_risk" if log["missed_workout"] else "on_track",
+                "wellness_state": "fatigued" if log["energy_level"] == "low" else "normal",
+                "final_plan": ["20 min cardio", "bodyweight workout"],
+            })
+
+    return {
+        "daily_logs": [{k: v for k, v in log.items() if k != "energy_score"} for log in cohort["daily_logs"]],
+        "agent_decisions": agent_decisions,
+        "user_profiles": profiles,
+        "medical_records": records,
+        "medications": medications,
+        "vaccinations": vaccinations,
+        "meals": meals,
+        "personal_goals": [],
+        "hydration_logs": hydration,
+        "settings": {"user_id": profiles[0]["user_id"] if profiles else "", "use_supabase": False},
+    }
@@ -0,0 +1,89 @@
+"""
+Shared pytest fixtures
+`app_client` runs flask_app against a small store in a temporary directory,
+once with the single-file layout and once sharded. Write-behind is off unless
+a test installs a buffer, so every write lands before the response returns.
+"""
+import json
+
+import pytest
+
+SETTINGS_USER = "11111111-1111-1111-1111-111111111111"
+USER_A = "aaaaaaaa-0000-0000-0000-000000000001"
+USER_B = "bbbbbbbb-0000-0000-0000-000000000002"
+
+
+def sample_store():
+    """Two signed-up users and the signed-out settings user, a few records each"""
+    logs = []
+    for user_id, days in ((USER_A, 5), (USER_B, 3), (SETTINGS_USER, 2)):
+        for day in range(1, days + 1):
+            logs.append({
+                "user_id": user_id,
+                "date": f"2026-01-{day:02d}",
+                "stress_level": "medium",
+                "sleep_hours": 7.5,
+                "energy_level": "high",
+                "missed_workout": day % 2 == 0,
+                "mood": "happy",
+            })
+    profiles = [
+        {"user_id": user_id, "name": name, "email": f"{name.lower()}@example.com", "age": 30,
+         "age_group": "26-35", "activity_level": "moderate", "goal": "improve_fitness",
+         "level": 3, "experience_points": 0, "total_logs": 0, "workouts_completed": 0}
+        for user_id, name in ((USER_A, "Ana"), (USER_B, "Ben"))
+    ]
+    return {
+        "daily_logs": logs,
+        "agent_decisions": [
+            {"user_id": USER_A, "date": "2026-01-05", "goal_status": "on_track",
+             "wellness_state": "good", "final_plan": ["Walk 30 minutes"]},
+        ],
+        "user_profiles": profiles,
+        "medical_records": [],
+        "medications": [],
+        "vaccinations": [],
+        "meals": [],
+        "personal_goals": [
+            {"id": "goal-a", "user_id": USER_A, "title": "Run", "target": "100", "progress": 0, "status": "active"},
+        ],
+        "hydration_logs": [],
+        "data_versions": {},
+        "settings": {"user_id": SETTINGS_USER, "use_supabase": False},
+    }
+
+
+@pytest.fixture(params=["single", "sharded"])
+def app_client(request, tmp_path, monkeypatch):
+    """Flask test client on a fresh store; `app_client.sharded` tells the layout"""
+    import flask_app
+    import fragment_cache
+    import storage
+    import write_behind
+
+    data_file = tmp_path / "data.json"
+    data_file.write_text(json.dumps(sample_store()))
+    monkeypatch.setattr(flask_app, "DATA_FILE", str(data_file))
+    monkeypatch.setattr(flask_app, "SHARD_DIR", str(tmp_path / "data_shards"))
+    monkeypatch.setattr(storage, "STORE_SHARDED", request.param == "sharded")
+    monkeypatch.setattr(write_behind, "_buffer", None)
+    cache = fragment_cache.get_fragment_cache()
+    if cache is not None:
+        cache.clear()
+
+    flask_app.app.config["TESTING"] = True
+    client = flask_app.app.test_client()
+    client.sharded = request.param == "sharded"
+    return client
+
+
+def sign_in(client, user_id):
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+
+
+def stored(client):
+    """The whole store as persisted (read outside a request, so every shard)"""
+    import flask_app
+
+    return flask_app.read_data()
@@ -1,5 +1,8 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, has_request_context
 from agents.orchestrator import decide_plan
+from agents.feature_store import get_feature_store
+from agents.telemetry import record, timed
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, date, timedelta
 from dotenv import load_dotenv
 import os, json
@@ -7,37 +10,69 @@ import time
 import uuid
 import base64
 import hashlib
+from log_columns import LogTable
 from werkzeug.utils import secure_filename
+import click
+import assets
+import fragment_cache
+import http_cache
+import metrics
+import profiling
+import storage
+import template_cache
+import tracing
+import write_behind
+
+try:
+    from agents.ml_predictor import get_predictor, record_workout_outcome
+    ML_AVAILABLE = True
+except ImportError:
+    ML_AVAILABLE = False
 
 load_dotenv()
 
-DATA_FILE = os.path.join(os.path.dirname(__file__), "data.json")
+DATA_FILE = os.getenv("DATA_FILE", os.path.join(os.path.dirname(__file__), "data.json"))
+SHARD_DIR = os.getenv("STORE_SHARD_DIR", os.path.splitext(DATA_FILE)[0] + "_shards")
+SCHEDULE_DIR = os.getenv("SCHEDULE_DIR", os.path.splitext(DATA_FILE)[0] + "_schedules")
+
+# Endpoints that read every user's records; in sharded mode the others load only the session user's shard
+CROSS_USER_ENDPOINTS = {"api_logs", "api_decisions"}
+# Writers that may change shared collections (profiles, settings); in sharded mode they also lock the index
+INDEX_WRITE_ENDPOINTS = {"register", "profile", "sync_fitness", "settings"}
+# Writers that do slow work (the agent's plan) on an unlocked read, then lock and read again to write (reread_for_write)
+LATE_LOCK_ENDPOINTS = {"log_today"}
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Tap-style endpoints whose updates go through the write-behind buffer instead of locking the store
+WRITE_BEHIND_ENDPOINTS = {"log_water", "update_goal_progress", "log_mood"}
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-key")
 
+feature_store = get_feature_store()
+http_cache.init_app(app)
+assets.init_app(app)
+fragment_cache.init_app(app)
+metrics.init_app(app)
+profiling.init_app(app, data_loader=lambda: read_data())
+tracing.init_app(app)
+template_cache.init_app(app)
+write_behind.init_app(app, commit=lambda users: commit_pending_writes(users))
+
 
 @app.context_processor
 def inject_globals():
-    # provide a cache-busting version for static files and the current year
-    try:
-        path = os.path.join(app.root_path, 'static', 'style.css')
-        ver = str(int(os.path.getmtime(path)))
-    except Exception:
-        ver = str(int(time.time()))
-    
-    # Get current user for navbar
+    # provide the current year and the current user for the navbar
     current_user_profile = None
     user_id = session.get("user_id")
     if user_id:
-        data = read_data()
+        data = request_data()
         user_profiles = data.get("user_profiles", [])
         for profile in user_profiles:
             if profile.get("user_id") == user_id:
                 current_user_profile = profile
                 break
     
-    return dict(static_version=ver, year=date.today().year, current_user_profile=current_user_profile, user_name=session.get("user_name"))
+    return dict(year=date.today().year, current_user_profile=current_user_profile, user_name=session.get("user_name"))
 
 # Initialize Supabase client if credentials exist
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -52,10 +87,19 @@ if SUPABASE_URL and SUPABASE_KEY:
         supabase_client = None
 
 
-def read_data():
+@timed("storage_read")
+def read_data(users=None, index=None):
+    """
+    Load the data store
+
+    Args:
+        users: With STORE_SHARDED, the user ids whose records to load (None:
+            everyone, empty: only the index); ignored for the single file
+        index: With STORE_SHARDED, the index when the caller already read it
+    """
     # default structure
     default_data = {
-        "daily_logs": [], 
+        "daily_logs": LogTable(), 
         "agent_decisions": [], 
         "user_profiles": [],
         "medical_records": [],
@@ -64,13 +108,18 @@ def read_data():
         "meals": [],
         "personal_goals": [],
         "hydration_logs": [],
+        "data_versions": {},
         "settings": {"user_id": "11111111-1111-1111-1111-111111111111", "use_supabase": False}
     }
 
-    if os.path.exists(DATA_FILE):
+    migrate_store()
+
+    if os.path.exists(storage.index_path(SHARD_DIR) if storage.STORE_SHARDED else DATA_FILE):
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                local = json.load(f)
+            if storage.STORE_SHARDED:
+                local = storage.load_sharded(SHARD_DIR, users, index)
+            else:
+                local = storage.load_store(DATA_FILE)
             # Ensure all keys from default_data are present
             for key, value in default_data.items():
                 if key not in local:
@@ -79,15 +128,14 @@ def read_data():
             local = default_data
     else:
         local = default_data
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(local, f, indent=2)
+        write_data(local)
 
     settings = local.get("settings", {})
     if settings.get("use_supabase") and supabase_client:
         try:
             logs_resp = supabase_client.table("daily_logs").select("*").order("date", desc=True).execute()
             decisions_resp = supabase_client.table("agent_decisions").select("*").order("date", desc=True).execute()
-            local["daily_logs"] = logs_resp.data if hasattr(logs_resp, "data") else local.get("daily_logs", [])
+            local["daily_logs"] = LogTable(logs_resp.data) if hasattr(logs_resp, "data") else local.get("daily_logs", LogTable())
             local["agent_decisions"] = decisions_resp.data if hasattr(decisions_resp, "data") else local.get("agent_decisions", [])
         except Exception:
             pass
@@ -95,25 +143,333 @@ def read_data():
     return local
 
 
-def write_data(data):
+@timed("storage_write")
+def write_data(data, collections=None, users=None):
+    """
+    Persist the data store
+
+    Args:
+        data: Data store as loaded by read_data()
+        collections: Names of the collections that changed (None when unknown);
+            only changed logs/decisions are pushed to Supabase
+        users: With STORE_SHARDED, the user ids whose shards to write (None:
+            every user in `data`)
+    """
     # always persist locally
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    if storage.STORE_SHARDED:
+        storage.dump_sharded(data, SHARD_DIR, collections, users)
+    else:
+        storage.dump_store(data, DATA_FILE)
 
     # if settings ask for Supabase and client present, try to persist there too
     settings = data.get("settings", {})
     if settings.get("use_supabase") and supabase_client:
         try:
             # upload daily_logs
-            for log in data.get("daily_logs", []):
-                # naive insert - in real app use upsert/unique keys
-                supabase_client.table("daily_logs").insert(log).execute()
-            for dec in data.get("agent_decisions", []):
-                supabase_client.table("agent_decisions").insert(dec).execute()
+            if collections is None or "daily_logs" in collections:
+                for log in data.get("daily_logs", []):
+                    # naive insert - in real app use upsert/unique keys
+                    supabase_client.table("daily_logs").insert(dict(log)).execute()
+            if collections is None or "agent_decisions" in collections:
+                for dec in data.get("agent_decisions", []):
+                    supabase_client.table("agent_decisions").insert(dec).execute()
         except Exception:
             pass
 
 
+def request_data():
+    """
+    The data store for the current request
+
+    Read once per request and shared by the view, helpers and templates;
+    outside a request every call reads the store.
+    """
+    if not has_request_context():
+        return read_data()
+    if "store_data" not in g:
+        migrate_store()
+        g.store_locks = []
+        g.store_scope = store_scope()
+        buffered = write_behind.get_buffer() is not None and request.endpoint in WRITE_BEHIND_ENDPOINTS
+        late = request.endpoint in LATE_LOCK_ENDPOINTS
+        if request.method not in READ_ONLY_METHODS and not buffered and not late:
+            # held until the request ends, so no other writer changes these files between read and write
+            index = request.endpoint in INDEX_WRITE_ENDPOINTS
+            hold_store_locks(g.store_scope, index)
+            if index:
+                g.pop("store_index", None)  # read again under the index lock
+        load_request_data()
+    return g.store_data
+
+
+def load_request_data():
+    """(Re)load the current request's store into g, with nothing marked dirty"""
+    index = g.pop("store_index", None)
+    buffer = write_behind.get_buffer()
+    if buffer is None:
+        g.store_data, g.store_overlay = read_data(g.store_scope, index), []
+    else:
+        # taps of this process still waiting for their group commit are replayed so the request sees them
+        g.store_data, g.store_overlay = buffer.load(lambda: read_data(g.store_scope, index), g.store_scope)
+    g.store_dirty = set()
+    g.store_dirty_users = set()
+
+
+def reread_for_write(index=False):
+    """
+    Lock the store for the request's write and read it again
+
+    LATE_LOCK_ENDPOINTS get an unlocked read from request_data() for their
+    slow work; they then make their changes on the store returned here,
+    which no other writer changes until the request ends. Changes made to
+    the earlier read are not written.
+
+    Args:
+        index: With STORE_SHARDED, also lock the index (shared collections change)
+    """
+    request_data()
+    hold_store_locks(g.store_scope, index)
+    load_request_data()
+    g.store_reread = True
+    return g.store_data
+
+
+def store_scope():
+    """
+    Users whose shards the current request loads
+
+    The session user, or None for everyone when the store is not sharded or
+    the endpoint reads other users' records. Signed out, it is the
+    settings user the views fall back to (the unassigned shard if there is
+    none); the index read to find them is kept for read_data().
+    """
+    if not storage.STORE_SHARDED or request.endpoint in CROSS_USER_ENDPOINTS:
+        return None
+    user_id = session.get("user_id")
+    if user_id:
+        return (user_id,)
+    try:
+        g.store_index = storage.load_store(storage.index_path(SHARD_DIR))
+    except (OSError, ValueError):
+        return (None,)
+    return (g.store_index.get("settings", {}).get("user_id"),)
+
+
+def migrate_store():
+    """
+    First start in sharded mode: split the single-file store into SHARD_DIR
+
+    Done under every writer lock, so a worker that migrates at the same
+    time finds the shards in place and leaves them alone.
+    """
+    if not storage.STORE_SHARDED or storage.sharded_exists(SHARD_DIR) or not os.path.exists(DATA_FILE):
+        return
+    with ExitStack() as stack:
+        for lock in store_locks():
+            stack.enter_context(lock)
+        if not storage.sharded_exists(SHARD_DIR):
+            storage.dump_sharded(storage.load_store(DATA_FILE), SHARD_DIR)
+
+
+def store_locks(users=None, index=True):
+    """
+    Locks a writer of the local store needs, in acquisition order
+
+    Args:
+        users: With STORE_SHARDED, the users whose shards are written (None: any user)
+        index: With STORE_SHARDED, also lock the index
+
+    Single-shard writers share the lock on the users directory, so they only
+    exclude each other per shard; writers of any shard take it exclusively.
+    """
+    if not storage.STORE_SHARDED:
+        return [storage.FileLock(DATA_FILE, kind="store")]
+    locks = [storage.FileLock(storage.index_path(SHARD_DIR), kind="index")] if index else []
+    locks.append(storage.FileLock(os.path.join(SHARD_DIR, storage.USERS_DIR), shared=users is not None, kind="shards"))
+    for user_id in sorted(users or (), key=storage.shard_name):
+        locks.append(storage.FileLock(storage.shard_path(SHARD_DIR, user_id), kind="shard"))
+    return locks
+
+
+def hold_store_locks(users, index):
+    """Acquire the store locks this request does not hold yet; released when it ends"""
+    held = {lock.path for lock in g.store_locks}
+    for lock in store_locks(users, index):
+        if lock.path not in held:
+            g.store_locks.append(lock.acquire())
+
+
+@contextmanager
+def locked_store(users=None, index=True):
+    """Hold the writer locks outside a request (CLI commands, group commits)"""
+    migrate_store()  # takes every lock, so not while some are held
+    with ExitStack() as stack:
+        for lock in store_locks(users, index):
+            stack.enter_context(lock)
+        yield
+
+
+@app.teardown_request
+def release_store_locks(exc):
+    for lock in reversed(g.pop("store_locks", [])):
+        lock.release()
+
+
+@app.errorhandler(storage.StoreLockTimeout)
+def store_busy(error):
+    response = jsonify({"error": "The data store is busy, please retry"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+def mark_dirty(*collections, user_id=None):
+    """
+    Record that the request changed these collections; they are written once when it finishes
+
+    Also bumps the data versions of the collections and of the user whose
+    records changed (the session user unless given), which conditional GETs
+    are validated against, and drops the user's cached fragments.
+    """
+    data = request_data()
+    g.store_dirty.update(collections)
+    g.store_dirty.add("data_versions")
+    user_id = user_id or session.get("user_id")
+    stamp_versions(data, collections, user_id, time.time())
+    if user_id:
+        g.store_dirty_users.add(user_id)
+        fragment_cache.invalidate_user(user_id)
+
+
+def stamp_versions(data, collections, user_id, now):
+    """Move the data versions of the collections and of the user (if any) forward to `now`"""
+    versions = data.setdefault("data_versions", {})
+    for name in collections:
+        versions[name] = max(now, versions.get(name) or 0)
+    if user_id:
+        key = f"user:{user_id}"
+        versions[key] = max(now, versions.get(key) or 0)
+
+
+def buffered_write(user_id, collections, apply, read=True):
+    """
+    Make a tap-style update to a user's records
+
+    With write-behind on, the update is queued and the response does not
+    wait for the store to be written; the group commit replays apply() on
+    the store as it is then. Otherwise it is written when the request ends.
+
+    Args:
+        user_id: Owner of the records apply() changes
+        collections: Collections apply() changes
+        apply: apply(data) makes the update and returns the result for the
+            response; it may run on several loads of the store, so ids and
+            timestamps must be fixed before it is created
+        read: Also apply to this request's store and return the result; taps
+            whose response does not depend on the store skip loading it
+
+    Returns:
+        apply(request_data()), or None when not read
+    """
+    now = time.time()
+
+    def stamped(data):
+        stamp_versions(data, collections, user_id, now)
+        return apply(data)
+
+    buffer = write_behind.get_buffer()
+    result = stamped(request_data()) if read or buffer is None else None
+    if buffer is None:
+        mark_dirty(*collections, user_id=user_id)
+    else:
+        buffer.add(user_id, collections, stamped)
+        fragment_cache.invalidate_user(user_id)
+    return result
+
+
+def commit_pending_writes(users):
+    """
+    Group commit of the write-behind buffer: one locked read and one write
+    for every queued update of these users
+
+    Returns:
+        Number of updates written
+    """
+    buffer = write_behind.get_buffer()
+    with locked_store(users, index=False):
+        ops = buffer.pending(users)
+        if not ops:
+            return 0
+        data = read_data(users)
+        for op in ops:
+            op.apply(data)
+        collections = {name for op in ops for name in op.collections} | {"data_versions"}
+        buffer.committed(ops, lambda: write_data(data, collections, users))
+    return len(ops)
+
+
+def data_version(collections, per_user=True):
+    """
+    Version of the data a page renders for the current request
+
+    Args:
+        collections: Collections whose writes by any user change the page
+        per_user: Whether writes to the session user's records change it
+
+    Returns:
+        (key parts, last modified epoch seconds), or None when there is no
+        session user for a per-user page or reads come from Supabase and local
+        versions do not apply
+    """
+    user_id = session.get("user_id")
+    if per_user and not user_id:
+        return None
+    data = request_data()
+    if data.get("settings", {}).get("use_supabase") and supabase_client:
+        return None
+    versions = data.get("data_versions", {})
+    stamps = [versions.get(name, 0) for name in collections]
+    if per_user:
+        stamps.append(versions.get(f"user:{user_id}", 0))
+    # The date is part of the key: pages show "today" and rolling windows
+    return (date.today().isoformat(), user_id, *stamps), max(stamps, default=0)
+
+
+def data_validator(*collections, per_user=True):
+    """Validator for http_cache.conditional built from data_version()"""
+    return lambda: data_version(collections, per_user)
+
+
+def fragment_scope(*collections):
+    """fragment_key for the {% cache %} tag: the session user and the page's data version"""
+    version = data_version(collections)
+    return (session.get("user_id"), version[0]) if version else None
+
+
+@app.after_request
+def commit_request_data(response):
+    """Single write of everything the request changed (skipped when the view raised)"""
+    dirty = g.pop("store_dirty", None)
+    if dirty:
+        if request.endpoint in LATE_LOCK_ENDPOINTS and not g.get("store_reread"):
+            raise RuntimeError(f"{request.endpoint} changed the store without reread_for_write()")
+        # a partial load writes back exactly the shards it read
+        users = g.store_scope if g.store_scope is not None else g.store_dirty_users or None
+        unloaded = g.store_dirty_users - set(users or g.store_dirty_users)
+        if unloaded:
+            # their shards were not read, so writing them would drop their other records
+            raise RuntimeError(f"Request changed records of users whose shards it did not load: {sorted(unloaded)}")
+        # normally held since the read; taken here for writes the request did not announce (a GET, an index write)
+        hold_store_locks(users, index=bool(set(dirty) - set(storage.USER_COLLECTIONS) - {"data_versions"}))
+        if g.store_overlay and (not storage.STORE_SHARDED or storage.writes_shards(dirty, users)):
+            # the replayed taps are written with everything else
+            sharded_users = users if storage.STORE_SHARDED else None
+            written = [op for op in g.store_overlay if sharded_users is None or op.user_id in sharded_users]
+            write_behind.get_buffer().committed(written, lambda: write_data(g.store_data, dirty, users))
+        else:
+            write_data(g.store_data, dirty, users)
+    return response
+
 
 def get_age_group(age):
     """Determine age group from age"""
@@ -144,6 +500,37 @@ def calculate_experience_points(activity_level, logs_count=0):
     log_bonus = logs_count * 2
     return base_points + log_bonus
 
+def record_previous_outcome(data, user_id, completed):
+    """Label the user's last unlabelled prediction with today's workout outcome"""
+    if not ML_AVAILABLE:
+        return
+    today = date.today().isoformat()
+    for decision in reversed(data.get("agent_decisions", [])):
+        if decision.get("user_id") != user_id or decision.get("date", "") >= today:
+            continue
+        if decision.get("ml_features") and not decision.get("outcome_recorded"):
+            try:
+                if record_workout_outcome(decision["ml_features"], completed):
+                    decision["outcome_recorded"] = True
+            except Exception:
+                pass
+        break
+
+def user_rolling_features(data, user_id):
+    """Rolling 7/14/30-day ML features for a user, syncing the store with their daily_logs first"""
+    feature_store.sync_user(user_id, data["daily_logs"].for_user(user_id).rows())
+    return feature_store.features(user_id)
+
+def prediction_features(user_state, recent_logs, user_profile, rolling_features=None):
+    """Feature vector stored with a decision so its outcome can be learned later"""
+    if not ML_AVAILABLE:
+        return None
+    try:
+        features = get_predictor().extract_features(user_state, recent_logs, user_profile, rolling_features)
+        return [float(x) for x in features.ravel()]
+    except Exception:
+        return None
+
 def hash_password(password):
     """Hash password using SHA256 (for demo - use bcrypt in production)"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -155,7 +542,7 @@ def verify_password(password, hashed):
 @app.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
-        data = read_data()
+        data = request_data()
         
         # Get form data
         name = request.form.get("name")
@@ -234,7 +621,7 @@ def register():
         if "user_profiles" not in data:
             data["user_profiles"] = []
         data["user_profiles"].append(user_profile)
-        write_data(data)
+        mark_dirty("user_profiles")
         
         # Set user in session
         session["user_id"] = user_id
@@ -247,7 +634,7 @@ def register():
 @app.route("/api/leaderboard/<age_group>")
 def get_leaderboard(age_group):
     """Get leaderboard for a specific age group"""
-    data = read_data()
+    data = request_data()
     profiles = data.get("user_profiles", [])
     
     # Filter by age group
@@ -287,7 +674,7 @@ def login():
             return render_template("login.html")
         
         # Find user by email and verify password
-        data = read_data()
+        data = request_data()
         user_profiles = data.get("user_profiles", [])
         
         user_found = None
@@ -328,8 +715,10 @@ def google_auth():
 
 @app.route("/")
 @app.route("/dashboard")
+@http_cache.conditional(data_validator("user_profiles"))
 def index():
-    data = read_data()
+    data = request_data()
+    analytics_start = time.perf_counter()
     user_id = session.get("user_id") or data["settings"].get("user_id")
     
     # Get current user profile
@@ -341,53 +730,28 @@ def index():
             break
     
     # Get user's logs
-    user_logs = [l for l in data.get("daily_logs", []) if l.get("user_id") == user_id]
-    logs = list(reversed(user_logs))
+    user_logs = data["daily_logs"].for_user(user_id)
+    logs = list(reversed(user_logs.rows()))
     decisions = [d for d in data.get("agent_decisions", []) if d.get("user_id") == user_id]
     decisions = list(reversed(decisions))
 
     # compute KPIs
     recent = logs[:14]
-    all_logs = logs
-    total_logs = len(all_logs)
+    total_logs = len(user_logs)
     missed = sum(1 for l in recent if l.get("missed_workout"))
     avg_sleep = (sum(l.get("sleep_hours", 0) for l in recent)/len(recent)) if recent else None
     
-    # Calculate comprehensive analytics
-    total_workouts = sum(1 for l in all_logs if not l.get("missed_workout"))
-    total_missed = sum(1 for l in all_logs if l.get("missed_workout"))
-    consistency_rate = (total_workouts / total_logs * 100) if total_logs > 0 else 0
-    
-    # Weekly stats
-    week_ago = (date.today() - timedelta(days=7)).isoformat()
-    week_logs = [l for l in all_logs if l.get("date") >= week_ago]
-    week_workouts = sum(1 for l in week_logs if not l.get("missed_workout"))
-    week_avg_sleep = (sum(l.get("sleep_hours", 0) for l in week_logs)/len(week_logs)) if week_logs else None
-    
-    # Monthly stats
-    month_ago = (date.today() - timedelta(days=30)).isoformat()
-    month_logs = [l for l in all_logs if l.get("date") >= month_ago]
-    month_workouts = sum(1 for l in month_logs if not l.get("missed_workout"))
-    
-    # Calculate averages
-    all_sleep_hours = [l.get("sleep_hours", 0) for l in all_logs if l.get("sleep_hours")]
-    overall_avg_sleep = sum(all_sleep_hours) / len(all_sleep_hours) if all_sleep_hours else None
-    
-    # Activity level distribution
-    activity_distribution = {}
-    for l in all_logs:
-        energy = l.get("energy_level", "unknown")
-        activity_distribution[energy] = activity_distribution.get(energy, 0) + 1
-    
-    # Streaks calculation
-    current_streak = 0
-    if all_logs:
-        sorted_logs = sorted(all_logs, key=lambda x: x.get("date", ""), reverse=True)
-        for log in sorted_logs:
-            if not log.get("missed_workout"):
-                current_streak += 1
-            else:
-                break
+    # Whole-history analytics as column scans over this user's logs
+    summary = user_logs.summary()
+    total_workouts = summary["total_workouts"]
+    total_missed = summary["total_missed"]
+    consistency_rate = summary["consistency_rate"]
+    week_workouts = summary["week_workouts"]
+    week_avg_sleep = summary["week_avg_sleep"]
+    month_workouts = summary["month_workouts"]
+    overall_avg_sleep = summary["overall_avg_sleep"]
+    activity_distribution = summary["activity_distribution"]
+    current_streak = summary["current_streak"]
 
     # Calculate Wellness Score (0-100)
     wellness_score = 0
@@ -537,6 +901,7 @@ def index():
     if total_workouts >= 10:
         user_badges.append({"icon": "💪", "name": "Iron Will", "desc": "10 Workouts"})
 
+    record("analytics", time.perf_counter() - analytics_start)
     return render_template(
         "dashboard.html",
         logs=logs,
@@ -567,13 +932,14 @@ def index():
         today_steps=today_steps,
         alerts=alerts,
         user_goals=user_goals,
-        user_badges=user_badges
+        user_badges=user_badges,
+        fragment_key=fragment_scope("user_profiles"),
     )
 
 
 @app.route("/log", methods=["GET", "POST"])
 def log_today():
-    data = read_data()
+    data = request_data()
     if request.method == "POST":
         user_id = session.get("user_id") or data["settings"].get("user_id")
         stress = request.form.get("stress")
@@ -620,50 +986,44 @@ def log_today():
             "workout_duration": workout_duration,
             "notes": notes
         }
-        data["daily_logs"].append(entry)
-        
-        # Update user profile if exists
-        user_profiles = data.get("user_profiles", [])
-        for profile in user_profiles:
-            if profile.get("user_id") == user_id:
-                # Update total logs
-                profile["total_logs"] = profile.get("total_logs", 0) + 1
-                
-                # Update workouts completed if not missed
-                if not missed:
-                    profile["workouts_completed"] = profile.get("workouts_completed", 0) + 1
-                
-                # Recalculate experience points and level
-                activity_level = profile.get("activity_level", "sedentary")
-                profile["experience_points"] = calculate_experience_points(activity_level, profile["total_logs"])
-                
-                # Level increases based on experience points
-                base_level = calculate_level(activity_level)
-                experience_bonus = profile["experience_points"] // 50  # Every 50 XP = +1 level
-                profile["level"] = min(10, base_level + experience_bonus)  # Cap at level 10
-                break
-        
-        write_data(data)
+
+        def check_in(data):
+            """Add the entry and update the user's profile stats; returns the profile (None if there is none)"""
+            data["daily_logs"].append(entry)
+            for profile in data.get("user_profiles", []):
+                if profile.get("user_id") == user_id:
+                    # Update total logs
+                    profile["total_logs"] = profile.get("total_logs", 0) + 1
+
+                    # Update workouts completed if not missed
+                    if not missed:
+                        profile["workouts_completed"] = profile.get("workouts_completed", 0) + 1
+
+                    # Recalculate experience points and level
+                    activity_level = profile.get("activity_level", "sedentary")
+                    profile["experience_points"] = calculate_experience_points(activity_level, profile["total_logs"])
+
+                    # Level increases based on experience points
+                    base_level = calculate_level(activity_level)
+                    experience_bonus = profile["experience_points"] // 50  # Every 50 XP = +1 level
+                    profile["level"] = min(10, base_level + experience_bonus)  # Cap at level 10
+                    return profile
+            return None
+
+        # The plan is computed on this request's unlocked read, so the agent
+        # (and its LLM call) does not keep other writers waiting
+        current_user_profile = check_in(data)
 
         # compute plan
-        # compute missed_days from last 30 logs
-        recent = data["daily_logs"][-30:]
-        user_logs = [l for l in recent if l.get("user_id") == user_id]
-        missed_days = sum(1 for l in user_logs if l.get("missed_workout"))
+        # missed_days comes from the user's rolling 30-day window
+        rolling = user_rolling_features(data, user_id)
+        missed_days = rolling["missed_30"]
         user_state = {"missed_days": missed_days, "stress": stress, "sleep_hours": sleep_hours, "energy": energy}
         
-        # Get user profile for personalized recommendations
-        current_user_profile = None
-        user_profiles = data.get("user_profiles", [])
-        for profile in user_profiles:
-            if profile.get("user_id") == user_id:
-                current_user_profile = profile
-                break
-        
-        # Get recent logs for AI analysis (last 14 days)
-        recent_for_ai = user_logs[-14:] if len(user_logs) > 14 else user_logs
+        # Get recent logs for AI analysis (last 14 entries)
+        recent_for_ai = feature_store.recent_logs(user_id)
         
-        plan = decide_plan(user_state, recent_logs=recent_for_ai, user_profile=current_user_profile)
+        plan = decide_plan(user_state, recent_logs=recent_for_ai, user_profile=current_user_profile, rolling_features=rolling)
 
         decision = {
             "user_id": user_id,
@@ -671,10 +1031,17 @@ def log_today():
             "goal_status": plan["goal"],
             "wellness_state": plan["wellness"],
             "final_plan": plan["plan"],
-            "ai_recommendation": plan.get("ai_recommendation")
+            "ai_recommendation": plan.get("ai_recommendation"),
+            "ml_features": prediction_features(user_state, recent_for_ai, current_user_profile, rolling)
         }
+
+        # then the check-in is made again on the store as it is now, under the write locks
+        data = reread_for_write(index=True)
+        check_in(data)
+        # Today's check-in tells us whether the last prediction came true
+        record_previous_outcome(data, user_id, completed=not missed)
         data["agent_decisions"].append(decision)
-        write_data(data)
+        mark_dirty("daily_logs", "user_profiles", "agent_decisions", user_id=user_id)
 
         flash("Check-in saved! Check your dashboard for AI-powered recommendations on what to do next.", "success")
         return redirect(url_for("index"))
@@ -686,7 +1053,7 @@ def medical():
     if not session.get("user_id"):
         return redirect(url_for("login"))
     
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id")
     
     if request.method == "POST":
@@ -723,7 +1090,7 @@ def medical():
             }
             data["medical_records"].append(ref)
         
-        write_data(data)
+        mark_dirty("medications", "vaccinations", "medical_records")
         flash("Record saved successfully!", "success")
         return redirect(url_for("medical"))
 
@@ -738,7 +1105,7 @@ def nutrition():
     if not session.get("user_id"):
         return redirect(url_for("login"))
         
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id")
     
     if request.method == "POST":
@@ -758,7 +1125,7 @@ def nutrition():
             "fats": get_int("fats")
         }
         data["meals"].append(meal)
-        write_data(data)
+        mark_dirty("meals")
         flash("Meal logged!", "success")
         return redirect(url_for("nutrition"))
 
@@ -780,23 +1147,23 @@ def log_water():
     if not session.get("user_id"):
         return jsonify({"success": False, "error": "Unauthorized"}), 401
         
-    data = read_data()
     user_id = session.get("user_id")
+    today = date.today().isoformat()
     
     log = {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
-        "date": date.today().isoformat(),
+        "date": today,
         "time": datetime.now().strftime("%H:%M")
     }
     
-    if "hydration_logs" not in data:
-        data["hydration_logs"] = []
-        
-    data["hydration_logs"].append(log)
-    write_data(data)
+    def add_log(data):
+        if "hydration_logs" not in data:
+            data["hydration_logs"] = []
+        data["hydration_logs"].append(dict(log))
+        return len([h for h in data["hydration_logs"] if h.get("user_id") == user_id and h.get("date") == today])
     
-    today_count = len([h for h in data["hydration_logs"] if h.get("user_id") == user_id and h.get("date") == date.today().isoformat()])
+    today_count = buffered_write(user_id, ("hydration_logs",), add_log)
     return jsonify({"success": True, "count": today_count})
 
 
@@ -805,7 +1172,7 @@ def goals():
     if not session.get("user_id"):
         return redirect(url_for("login"))
     
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id")
     
     if request.method == "POST":
@@ -820,7 +1187,7 @@ def goals():
             "status": "active"
         }
         data["personal_goals"].append(goal)
-        write_data(data)
+        mark_dirty("personal_goals")
         flash("Goal set! Let's crush it. 🚀", "success")
         return redirect(url_for("goals"))
 
@@ -840,14 +1207,15 @@ def meditation():
     return render_template("meditation.html")
 
 @app.route("/history")
+@http_cache.conditional(data_validator())
 def history():
     if not session.get("user_id"):
         return redirect(url_for("login"))
     
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id")
     
-    user_logs = [l for l in data.get("daily_logs", []) if l.get("user_id") == user_id]
+    user_logs = data["daily_logs"].for_user(user_id).rows()
     user_decisions = [d for d in data.get("agent_decisions", []) if d.get("user_id") == user_id]
     
     # Sort by date descending
@@ -859,7 +1227,7 @@ def history():
 
 @app.route("/programs")
 def programs():
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id") or data["settings"].get("user_id")
     
     # Get current user profile
@@ -874,7 +1242,7 @@ def programs():
 
 @app.route("/programs/<program_type>")
 def program_detail(program_type):
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id") or data["settings"].get("user_id")
     
     # Get current user profile
@@ -888,21 +1256,56 @@ def program_detail(program_type):
     # Get user level (default to 1 if no user)
     user_level = current_user.get("level", 1) if current_user else 1
     
-    # Import workout generator
-    from agents.workout_generator import get_workouts_for_program
-    
-    # Get workout suggestions
-    workout_plan = get_workouts_for_program(program_type, user_level)
+    # Prefer the precomputed schedule (flask build-schedules) for today's session
+    from agents.program_scheduler import load_schedules, scheduled_day
+    from agents.workout_catalog import level_tier
+    schedule = load_schedules(SCHEDULE_DIR, user_id).get(program_type.lower())
+    next_day = None
+    if schedule and schedule.get("level_tier") == level_tier(user_level):
+        next_day = scheduled_day(schedule)
+    
+    if next_day:
+        workout_plan = {
+            "program_name": schedule["program_name"],
+            "description": schedule["description"],
+            "workouts": next_day["workouts"],
+            "user_level": user_level,
+            "level_tier": schedule["level_tier"],
+            "total_duration": next_day["total_duration"]
+        }
+    else:
+        schedule = None
+        # Import workout generator
+        from agents.workout_generator import get_workouts_for_program
+        
+        # Get workout suggestions
+        workout_plan = get_workouts_for_program(program_type, user_level)
     
     return render_template("program_detail.html", 
                          program_type=program_type, 
                          workout_plan=workout_plan,
+                         schedule=schedule,
+                         next_day=next_day,
                          current_user=current_user)
 
 
+@app.cli.command("build-schedules")
+@click.option("--weeks", default=4, show_default=True, help="Weeks per schedule")
+@click.option("--workers", default=0, help="Worker processes (0 = CPU count, 1 = inline)")
+def build_schedules(weeks, workers):
+    """Precompute periodized program schedules for every user (written to SCHEDULE_DIR)"""
+    from agents.program_scheduler import save_schedules, schedule_all_users
+    
+    data = read_data()
+    started = time.time()
+    schedules = schedule_all_users(data.get("user_profiles", []), data.get("daily_logs", []), weeks=weeks, workers=workers or None)
+    save_schedules(schedules, SCHEDULE_DIR)
+    click.echo(f"Scheduled {len(schedules)} users in {time.time() - started:.1f}s")
+
+
 @app.route("/profile", methods=["GET", "POST"])
 def profile():
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id") or data["settings"].get("user_id")
     
     # Get current user profile
@@ -947,7 +1350,7 @@ def profile():
         session["user_name"] = current_user["name"]
         
         # Save data
-        write_data(data)
+        mark_dirty("user_profiles")
         flash("Profile updated successfully!", "success")
         return redirect(url_for("profile"))
     
@@ -955,8 +1358,10 @@ def profile():
 
 
 @app.route("/analytics")
+@http_cache.conditional(data_validator())
 def analytics():
-    data = read_data()
+    data = request_data()
+    analytics_start = time.perf_counter()
     user_id = session.get("user_id") or data["settings"].get("user_id")
     
     # Get current user profile
@@ -968,51 +1373,26 @@ def analytics():
             break
     
     # Get user's logs
-    user_logs = [l for l in data.get("daily_logs", []) if l.get("user_id") == user_id]
-    logs = list(reversed(user_logs))
+    user_logs = data["daily_logs"].for_user(user_id)
+    logs = list(reversed(user_logs.rows()))
     
     # compute KPIs
     recent = logs[:14]
-    all_logs = logs
-    total_logs = len(all_logs)
+    total_logs = len(user_logs)
     missed = sum(1 for l in recent if l.get("missed_workout"))
     avg_sleep = (sum(l.get("sleep_hours", 0) for l in recent)/len(recent)) if recent else None
     
-    # Calculate comprehensive analytics
-    total_workouts = sum(1 for l in all_logs if not l.get("missed_workout"))
-    total_missed = sum(1 for l in all_logs if l.get("missed_workout"))
-    consistency_rate = (total_workouts / total_logs * 100) if total_logs > 0 else 0
-    
-    # Weekly stats
-    week_ago = (date.today() - timedelta(days=7)).isoformat()
-    week_logs = [l for l in all_logs if l.get("date") >= week_ago]
-    week_workouts = sum(1 for l in week_logs if not l.get("missed_workout"))
-    week_avg_sleep = (sum(l.get("sleep_hours", 0) for l in week_logs)/len(week_logs)) if week_logs else None
-    
-    # Monthly stats
-    month_ago = (date.today() - timedelta(days=30)).isoformat()
-    month_logs = [l for l in all_logs if l.get("date") >= month_ago]
-    month_workouts = sum(1 for l in month_logs if not l.get("missed_workout"))
-    
-    # Calculate averages
-    all_sleep_hours = [l.get("sleep_hours", 0) for l in all_logs if l.get("sleep_hours")]
-    overall_avg_sleep = sum(all_sleep_hours) / len(all_sleep_hours) if all_sleep_hours else None
-    
-    # Activity level distribution
-    activity_distribution = {}
-    for l in all_logs:
-        energy = l.get("energy_level", "unknown")
-        activity_distribution[energy] = activity_distribution.get(energy, 0) + 1
-    
-    # Streak calculation
-    current_streak = 0
-    if all_logs:
-        sorted_logs = sorted(all_logs, key=lambda x: x.get("date", ""), reverse=True)
-        for log in sorted_logs:
-            if not log.get("missed_workout"):
-                current_streak += 1
-            else:
-                break
+    # Whole-history analytics as column scans over this user's logs
+    summary = user_logs.summary()
+    total_workouts = summary["total_workouts"]
+    total_missed = summary["total_missed"]
+    consistency_rate = summary["consistency_rate"]
+    week_workouts = summary["week_workouts"]
+    week_avg_sleep = summary["week_avg_sleep"]
+    month_workouts = summary["month_workouts"]
+    overall_avg_sleep = summary["overall_avg_sleep"]
+    activity_distribution = summary["activity_distribution"]
+    current_streak = summary["current_streak"]
     
     # prepare chart data
     # sleep time series (last 14 entries)
@@ -1029,6 +1409,7 @@ def analytics():
         stress_counts[l.get("stress_level", "unknown")] = stress_counts.get(l.get("stress_level", "unknown"), 0) + 1
         energy_counts[l.get("energy_level", "unknown")] = energy_counts.get(l.get("energy_level", "unknown"), 0) + 1
     
+    record("analytics", time.perf_counter() - analytics_start)
     return render_template(
         "analytics.html",
         total_logs=total_logs,
@@ -1048,6 +1429,7 @@ def analytics():
         overall_avg_sleep=overall_avg_sleep,
         current_streak=current_streak,
         activity_distribution=activity_distribution,
+        fragment_key=fragment_scope(),
     )
 
 
@@ -1059,13 +1441,16 @@ def spa():
 
 # API endpoints for SPA / integrations
 @app.route("/api/logs", methods=["GET", "POST"])
+@http_cache.conditional(data_validator("daily_logs", per_user=False))
 def api_logs():
-    data = read_data()
+    data = request_data()
     if request.method == "GET":
-        return json.dumps(list(reversed(data.get("daily_logs", []))))
-    payload = request.get_json() or {}
+        return json.dumps([dict(log) for log in reversed(data.get("daily_logs", []))])
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return json.dumps({"error": "Expected a JSON object"}), 400
     data["daily_logs"].append(payload)
-    write_data(data)
+    mark_dirty("daily_logs", user_id=payload.get("user_id"))
     return json.dumps(payload)
 
 
@@ -1086,18 +1471,19 @@ def sync_fitness():
     }
     
     # Persist the sync status to user profile
-    data = read_data()
+    data = request_data()
     for profile in data["user_profiles"]:
         if profile.get("user_id") == user_id:
             profile["fitness_sync"] = synced_data
             break
-    write_data(data)
+    mark_dirty("user_profiles")
     
     return json.dumps({"status": "success", "data": synced_data})
 
 @app.route("/api/decisions", methods=["GET"])
+@http_cache.conditional(data_validator("agent_decisions", per_user=False))
 def api_decisions():
-    data = read_data()
+    data = request_data()
     return json.dumps(list(reversed(data.get("agent_decisions", []))))
 
 
@@ -1106,7 +1492,7 @@ def settings():
     if not session.get("user_id"):
         return redirect(url_for("login"))
     
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id")
     
     if request.method == "POST":
@@ -1115,7 +1501,7 @@ def settings():
         data["settings"]["use_supabase"] = use_supabase
         
         # Handle user settings if needed
-        write_data(data)
+        mark_dirty("settings")
         flash("Settings updated!", "success")
         return redirect(url_for("settings"))
         
@@ -1134,7 +1520,7 @@ def delete_item():
     if not item_type or not item_id:
         return jsonify({"success": False, "error": "Missing parameters"}), 400
         
-    data = read_data()
+    data = request_data()
     user_id = session.get("user_id")
     
     # Map item types to data keys
@@ -1155,7 +1541,7 @@ def delete_item():
     data[key] = [item for item in data.get(key, []) if not (item.get("id") == item_id and item.get("user_id") == user_id)]
     
     if len(data[key]) < original_len:
-        write_data(data)
+        mark_dirty(key)
         return jsonify({"success": True})
     else:
         return jsonify({"success": False, "error": "Item not found"}), 404
@@ -1169,16 +1555,20 @@ def update_goal_progress():
     goal_id = req.get("id")
     increment = req.get("increment", 10)
     
-    data = read_data()
     user_id = session.get("user_id")
     
-    for goal in data.get("personal_goals", []):
-        if goal.get("id") == goal_id and goal.get("user_id") == user_id:
-            goal["progress"] = min(100, goal.get("progress", 0) + increment)
-            write_data(data)
-            return jsonify({"success": True, "new_progress": goal["progress"]})
-            
-    return jsonify({"success": False, "error": "Goal not found"}), 404
+    def add_progress(data):
+        for goal in data.get("personal_goals", []):
+            if goal.get("id") == goal_id and goal.get("user_id") == user_id:
+                goal["progress"] = min(100, goal.get("progress", 0) + increment)
+                return goal["progress"]
+        return None  # deleted before the update was committed
+    
+    if not any(goal.get("id") == goal_id and goal.get("user_id") == user_id for goal in request_data().get("personal_goals", [])):
+        return jsonify({"success": False, "error": "Goal not found"}), 404
+    
+    new_progress = buffered_write(user_id, ("personal_goals",), add_progress)
+    return jsonify({"success": True, "new_progress": new_progress})
 
 @app.route("/api/log-mood", methods=["POST"])
 def log_mood():
@@ -1191,33 +1581,30 @@ def log_mood():
     if not mood:
         return jsonify({"success": False, "error": "Missing mood"}), 400
         
-    data = read_data()
     user_id = session.get("user_id")
     today = date.today().isoformat()
     
-    # Check if a log exists for today
-    log_found = False
-    for log in data.get("daily_logs", []):
-        if log.get("user_id") == user_id and log.get("date") == today:
-            log["mood"] = mood
-            log_found = True
-            break
-            
-    if not log_found:
-        # Create a partial log for today with just the mood
-        new_log = {
-            "id": str(uuid.uuid4()), # Added UUID for new log
-            "user_id": user_id,
-            "date": today,
-            "mood": mood,
-            "stress_level": "medium", # defaults
-            "sleep_hours": 0,
-            "energy_level": "medium",
-            "missed_workout": False
-        }
-        data["daily_logs"].append(new_log)
-        
-    write_data(data)
+    # Partial log for today with just the mood, used when there is no log for today yet
+    new_log = {
+        "id": str(uuid.uuid4()), # Added UUID for new log
+        "user_id": user_id,
+        "date": today,
+        "mood": mood,
+        "stress_level": "medium", # defaults
+        "sleep_hours": 0,
+        "energy_level": "medium",
+        "missed_workout": False
+    }
+    
+    def set_mood(data):
+        # Check if a log exists for today
+        for log in data["daily_logs"].for_user(user_id).rows():
+            if log.get("date") == today:
+                log["mood"] = mood
+                return
+        data["daily_logs"].append(dict(new_log))
+    
+    buffered_write(user_id, ("daily_logs",), set_mood, read=False)
     return jsonify({"success": True})
 
 
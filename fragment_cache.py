@@ -0,0 +1,131 @@
+"""
+Per-user cache of rendered template fragments
+Templates wrap expensive sections in {% cache "name" %}...{% endcache %}.
+The view passes fragment_key (the user id plus the data versions the page
+depends on, see flask_app.fragment_scope); without it the section renders
+normally. Entries are held in an LRU bounded by FRAGMENT_CACHE_MAX_BYTES and
+a user's entries are dropped when their records are written, so stale
+versions do not wait for eviction.
+"""
+from collections import OrderedDict
+import os
+import threading
+
+from dotenv import load_dotenv
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+load_dotenv()
+
+FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "true").lower() == "true"
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+class FragmentCache:
+    """LRU of rendered fragments keyed by (user id, scope, fragment name), bounded by total size"""
+
+    def __init__(self, max_bytes=FRAGMENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = html
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def invalidate_user(self, user_id):
+        """Drop every fragment rendered for a user"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                self.bytes -= len(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache "name" %}...{% endcache %} backed by the FragmentCache singleton"""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        args = [name, nodes.Name("fragment_key", "load")]
+        return nodes.CallBlock(self.call_method("_render", args), [], [], body).set_lineno(lineno)
+
+    def _render(self, name, fragment_key, caller):
+        cache = get_fragment_cache()
+        if not fragment_key or cache is None:
+            return caller()
+        user_id, scope = fragment_key
+        key = (user_id, scope, name)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, html)
+        return Markup(html)
+
+
+_cache = None
+
+
+def get_fragment_cache():
+    """Get singleton fragment cache, or None when FRAGMENT_CACHE_ENABLED is off"""
+    global _cache
+    if _cache is None and FRAGMENT_CACHE_ENABLED:
+        _cache = FragmentCache()
+    return _cache
+
+
+def invalidate_user(user_id):
+    cache = get_fragment_cache()
+    if cache is not None and user_id:
+        cache.invalidate_user(user_id)
+
+
+def init_app(app):
+    """
+    Enable the {% cache %} tag in the app's templates
+
+    Args:
+        app: Flask application
+    """
+    app.jinja_env.add_extension(FragmentCacheExtension)
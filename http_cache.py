@@ -0,0 +1,150 @@
+"""
+Response compression and conditional GET for flask_app
+Responses above HTTP_COMPRESS_MIN_BYTES with a text, JSON or SVG content type
+are gzip-compressed (brotli when the client accepts it and the brotli package
+is installed). Views wrapped in conditional() get a weak ETag and
+Last-Modified computed from data versions instead of from the rendered body,
+so an unchanged page is answered with 304 before the view runs.
+"""
+from datetime import datetime, timezone
+from functools import wraps
+import gzip
+import hashlib
+import os
+
+from dotenv import load_dotenv
+from flask import make_response, request, session
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+load_dotenv()
+
+COMPRESS_ENABLED = os.getenv("HTTP_COMPRESS", "true").lower() == "true"
+COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "5"))
+CONDITIONAL_ENABLED = os.getenv("HTTP_CONDITIONAL", "true").lower() == "true"
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+# Validated pages are user-specific: browsers may keep them but must revalidate
+REVALIDATE = "private, no-cache"
+
+
+def negotiate_encoding(accept_encodings):
+    """Best encoding we can produce for an Accept-Encoding header, or None"""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response):
+    """after_request hook: compress eligible responses in place"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+        or request.method == "HEAD"
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    packed = compress(body, encoding)
+    if len(packed) >= len(body):
+        return response
+    response.set_data(packed)
+    response.content_encoding = encoding
+    return response
+
+
+def make_etag(parts):
+    """Weak ETag: the body varies with Content-Encoding, the data behind it does not"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def conditional(validator):
+    """
+    Answer 304 for a GET view when the data it renders is unchanged
+
+    Args:
+        validator: Called per request; returns (key parts, last modified epoch
+            seconds or None), or None to skip validation for this request.
+            The key parts must cover everything the response depends on.
+
+    The check is skipped while flash messages are pending, since the page
+    would show them once and they are not part of the data version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not CONDITIONAL_ENABLED or request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+            validated = validator()
+            if validated is None:
+                return view(*args, **kwargs)
+            parts, last_modified = validated
+            etag = make_etag(parts)
+            last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc) if last_modified else None
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = REVALIDATE
+            response.vary.add("Cookie")
+            return response
+        return wrapped
+    return decorator
+
+
+def init_app(app, enabled=None):
+    """
+    Register response compression
+
+    Register it before other after_request hooks so it runs last and
+    compresses the final body.
+
+    Args:
+        app: Flask application
+        enabled: Override HTTP_COMPRESS
+
+    Returns:
+        True when compression was enabled
+    """
+    if not (COMPRESS_ENABLED if enabled is None else enabled):
+        return False
+    app.after_request(compress_response)
+    return True
@@ -0,0 +1,535 @@
+"""
+Columnar in-memory representation of daily logs
+LogTable replaces the list of daily log dicts. Each user's logs are held in
+a UserLogs object as parallel typed columns: dates as day ordinals, floats
+and ints in array columns with a null sentinel, stress/energy/mood as byte
+codes, missed_workout as a bitset and text fields as lists, plus a per-row mask of which fields
+the log has. Fields that are not columns, or values that do not fit their
+column (an unknown mood, an int sleep_hours), go to a per-row extras dict,
+so every log reads back exactly as it was written.
+
+LogTable behaves like the list it replaces: it is indexed, sliced, iterated
+and appended to in write order. Its rows are LogRow views that read and
+write through to the columns and behave like dicts (get, [], items, Jinja
+attribute access). for_user() gives one user's logs without scanning the
+others, and UserLogs.summary() computes the dashboard KPIs as column scans.
+"""
+from array import array
+from collections.abc import Mapping, MutableMapping, Sequence
+from datetime import date
+import math
+import sys
+
+LEVELS = ["low", "medium", "high"]
+MOODS = [
+    "happy", "calm", "neutral", "tired", "stressed", "excited", "sad",
+    # dashboard mood buttons
+    "Great", "Good", "Neutral", "Low", "Angry",
+]
+
+FLOAT_FIELDS = ("sleep_hours", "distance", "weight")
+INT_FIELDS = ("water_intake", "steps", "heart_rate", "calories", "workout_duration")
+CODE_FIELDS = {
+    "stress_level": LEVELS,
+    "energy_level": LEVELS,
+    "mood": MOODS,
+}
+# Free text, kept as lists of str (repeated values share one object)
+STRING_FIELDS = ("workout_type", "notes", "id")
+COLUMNS = ("user_id", "date", "missed_workout") + FLOAT_FIELDS + INT_FIELDS + tuple(CODE_FIELDS) + STRING_FIELDS
+BITS = {name: 1 << i for i, name in enumerate(COLUMNS)}
+
+NULL_INT = -(2 ** 63)
+NULL_CODE = -1
+INT_MIN, INT_MAX = NULL_INT + 1, 2 ** 63 - 1
+
+_CODE_INDEX = {field: {value: i for i, value in enumerate(table)} for field, table in CODE_FIELDS.items()}
+
+
+def _date_ordinal(value):
+    """Day ordinal of a canonical ISO date string, or None if it would not round-trip"""
+    if type(value) is not str or len(value) != 10:
+        return None
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return None
+    return day.toordinal() if day.isoformat() == value else None
+
+
+class UserLogs:
+    """One user's daily logs as parallel columns, in write order"""
+
+    __slots__ = ("user_id", "present", "dates", "missed", "floats", "ints", "codes", "strings", "extras")
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.present = array("L")
+        self.dates = array("l")
+        self.missed = bytearray()
+        self.floats = {name: array("d") for name in FLOAT_FIELDS}
+        self.ints = {name: array("q") for name in INT_FIELDS}
+        self.codes = {name: array("b") for name in CODE_FIELDS}
+        self.strings = {name: [] for name in STRING_FIELDS}
+        self.extras = {}  # row -> {field: value} for fields kept outside the columns
+
+    def __len__(self):
+        return len(self.present)
+
+    def __sizeof__(self):
+        size = object.__sizeof__(self) + sys.getsizeof(self.present) + sys.getsizeof(self.dates)
+        size += sys.getsizeof(self.missed) + sys.getsizeof(self.extras)
+        for columns in (self.floats, self.ints, self.codes, self.strings):
+            size += sum(sys.getsizeof(column) for column in columns.values())
+        size += sum(sys.getsizeof(extra) for extra in self.extras.values())
+        return size
+
+    def append(self, record):
+        """Add a log; returns its row number"""
+        row = len(self.present)
+        self.present.append(0)
+        self.dates.append(0)
+        if row % 8 == 0:
+            self.missed.append(0)
+        for column in self.floats.values():
+            column.append(math.nan)
+        for column in self.ints.values():
+            column.append(NULL_INT)
+        for column in self.codes.values():
+            column.append(NULL_CODE)
+        for column in self.strings.values():
+            column.append(None)
+        for key, value in record.items():
+            self.set(row, key, value)
+        return row
+
+    def _is_missed(self, row):
+        return bool(self.missed[row >> 3] & (1 << (row & 7)))
+
+    def _set_missed(self, row, missed):
+        if missed:
+            self.missed[row >> 3] |= 1 << (row & 7)
+        else:
+            self.missed[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    def _store(self, row, key, value):
+        """Write a value into its column; False when it has to live in extras instead"""
+        if key == "user_id":
+            return value == self.user_id and type(value) is type(self.user_id)
+        if key == "date":
+            ordinal = _date_ordinal(value)
+            if ordinal is None:
+                return False
+            self.dates[row] = ordinal
+            return True
+        if key == "missed_workout":
+            if type(value) is not bool:
+                return False
+            self._set_missed(row, value)
+            return True
+        if key in self.floats:
+            if value is None:
+                self.floats[key][row] = math.nan
+                return True
+            if type(value) is not float or math.isnan(value):
+                return False
+            self.floats[key][row] = value
+            return True
+        if key in self.ints:
+            if value is None:
+                self.ints[key][row] = NULL_INT
+                return True
+            if type(value) is not int or not INT_MIN <= value <= INT_MAX:
+                return False
+            self.ints[key][row] = value
+            return True
+        if key in self.strings:
+            if value is not None and type(value) is not str:
+                return False
+            self.strings[key][row] = value
+            return True
+        if value is None:
+            self.codes[key][row] = NULL_CODE
+            return True
+        code = _CODE_INDEX[key].get(value) if type(value) is str else None
+        if code is None:
+            return False
+        self.codes[key][row] = code
+        return True
+
+    def set(self, row, key, value):
+        bit = BITS.get(key)
+        if bit is not None and self._store(row, key, value):
+            self.present[row] |= bit
+            extra = self.extras.get(row)
+            if extra and key in extra:
+                del extra[key]
+            return
+        if bit is not None:
+            self.present[row] &= ~bit
+        self.extras.setdefault(row, {})[key] = value
+
+    def delete(self, row, key):
+        bit = BITS.get(key)
+        if bit is not None and self.present[row] & bit:
+            self.present[row] &= ~bit
+            return
+        extra = self.extras.get(row)
+        if not extra or key not in extra:
+            raise KeyError(key)
+        del extra[key]
+
+    def value(self, row, key):
+        bit = BITS.get(key)
+        if bit is not None and self.present[row] & bit:
+            if key == "user_id":
+                return self.user_id
+            if key == "date":
+                return date.fromordinal(self.dates[row]).isoformat()
+            if key == "missed_workout":
+                return self._is_missed(row)
+            if key in self.floats:
+                value = self.floats[key][row]
+                return None if math.isnan(value) else value
+            if key in self.ints:
+                value = self.ints[key][row]
+                return None if value == NULL_INT else value
+            if key in self.strings:
+                return self.strings[key][row]
+            code = self.codes[key][row]
+            return None if code == NULL_CODE else CODE_FIELDS[key][code]
+        extra = self.extras.get(row)
+        if extra and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def keys(self, row):
+        mask = self.present[row]
+        keys = [name for name in COLUMNS if mask & BITS[name]]
+        extra = self.extras.get(row)
+        if extra:
+            keys.extend(extra)
+        return keys
+
+    def to_columns(self):
+        """JSON-ready columns: nulls as None, missed_workout as a hex bitset"""
+        columns = {
+            "user_id": self.user_id,
+            "present": list(self.present),
+            "date": list(self.dates),
+            "missed_workout": self.missed.hex(),
+        }
+        for name, column in self.floats.items():
+            columns[name] = [None if math.isnan(value) else value for value in column]
+        for name, column in self.ints.items():
+            columns[name] = [None if value == NULL_INT else value for value in column]
+        for name, column in self.codes.items():
+            columns[name] = list(column)
+        for name, column in self.strings.items():
+            columns[name] = list(column)
+        extras = {str(row): extra for row, extra in self.extras.items() if extra}
+        if extras:
+            columns["extras"] = extras
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns, tables=None):
+        """
+        Rebuild from to_columns() output
+
+        Args:
+            columns: Parsed columns
+            tables: Code tables the columns were written with (defaults to
+                CODE_FIELDS); codes are remapped when they differ
+        """
+        logs = cls(columns["user_id"])
+        n = len(columns["present"])
+        logs.present = array("L", columns["present"])
+        logs.dates = array("l", columns["date"])
+        logs.missed = bytearray.fromhex(columns["missed_workout"])
+        for name in FLOAT_FIELDS:
+            values = columns.get(name) or [None] * n
+            logs.floats[name] = array("d", [math.nan if value is None else value for value in values])
+        for name in INT_FIELDS:
+            values = columns.get(name) or [None] * n
+            logs.ints[name] = array("q", [NULL_INT if value is None else value for value in values])
+        for name in STRING_FIELDS:
+            logs.strings[name] = list(columns.get(name) or [None] * n)
+        logs.extras = {int(row): extra for row, extra in columns.get("extras", {}).items()}
+
+        tables = tables or CODE_FIELDS
+        for name, current in CODE_FIELDS.items():
+            codes = columns.get(name) or [NULL_CODE] * n
+            written = tables.get(name, current)
+            if written == current:
+                logs.codes[name] = array("b", codes)
+                continue
+            # Written with another table: remap, and move values this code does not know to extras
+            remap = [_CODE_INDEX[name].get(value) for value in written]
+            column = logs.codes[name] = array("b", [NULL_CODE] * n)
+            for row, code in enumerate(codes):
+                if code == NULL_CODE:
+                    continue
+                if remap[code] is None:
+                    logs.present[row] &= ~BITS[name]
+                    logs.extras.setdefault(row, {})[name] = written[code]
+                else:
+                    column[row] = remap[code]
+        return logs
+
+    def row(self, row):
+        return LogRow(self, row)
+
+    def rows(self):
+        return [LogRow(self, row) for row in range(len(self.present))]
+
+    def _has_column(self, name):
+        bit = BITS[name]
+        return [bool(mask & bit) for mask in self.present]
+
+    def summary(self, today=None):
+        """
+        Whole-history KPIs for the dashboard and analytics pages, as column scans
+
+        Matches the per-dict computations they replace: rows without a date
+        column value are compared as strings, absent energy levels count as
+        "unknown" and the streak runs over logs newest date first.
+
+        Returns:
+            dict with total_logs, total_workouts, total_missed, consistency_rate,
+            week_workouts, week_avg_sleep, month_workouts, overall_avg_sleep,
+            activity_distribution and current_streak
+        """
+        today = today or date.today()
+        n = len(self.present)
+        bits = self.missed
+        missed = [bool(bits[row >> 3] & (1 << (row & 7))) for row in range(n)]
+        for row, extra in self.extras.items():
+            if "missed_workout" in extra:
+                missed[row] = bool(extra["missed_workout"])
+
+        # NaN (null) is the only float not equal to itself
+        sleep = [None if value != value else value for value in self.floats["sleep_hours"]]
+        has_sleep = self._has_column("sleep_hours")
+        for row in range(n):
+            if not has_sleep[row]:
+                sleep[row] = self.extras.get(row, {}).get("sleep_hours", 0)
+
+        has_date = self._has_column("date")
+        all_dated = all(has_date)
+
+        def since(days):
+            cutoff = today.toordinal() - days
+            cutoff_iso = date.fromordinal(cutoff).isoformat()
+            if all_dated:
+                return [row for row, day in enumerate(self.dates) if day >= cutoff]
+            rows = []
+            for row in range(n):
+                if has_date[row]:
+                    if self.dates[row] >= cutoff:
+                        rows.append(row)
+                else:
+                    value = self.extras.get(row, {}).get("date")
+                    if isinstance(value, str) and value >= cutoff_iso:
+                        rows.append(row)
+            return rows
+
+        total_missed = sum(missed)
+        total_workouts = n - total_missed
+        week = since(7)
+        month = since(30)
+        week_sleep = [sleep[row] or 0 for row in week]
+        all_sleep = [value for value in sleep if value]
+
+        energy = self.codes["energy_level"]
+        has_energy = self._has_column("energy_level")
+        activity_distribution = {}
+        for row in range(n - 1, -1, -1):
+            if has_energy[row]:
+                level = None if energy[row] == NULL_CODE else LEVELS[energy[row]]
+            else:
+                level = self.extras.get(row, {}).get("energy_level", "unknown")
+            activity_distribution[level] = activity_distribution.get(level, 0) + 1
+
+        # day ordinals sort like ISO dates, so they only need converting when some row has no date column value
+        date_key = self.dates.__getitem__ if all_dated else self._date_key
+        current_streak = 0
+        for row in sorted(range(n - 1, -1, -1), key=date_key, reverse=True):
+            if missed[row]:
+                break
+            current_streak += 1
+
+        return {
+            "total_logs": n,
+            "total_workouts": total_workouts,
+            "total_missed": total_missed,
+            "consistency_rate": (total_workouts / n * 100) if n > 0 else 0,
+            "week_workouts": sum(1 for row in week if not missed[row]),
+            "week_avg_sleep": (sum(week_sleep) / len(week_sleep)) if week_sleep else None,
+            "month_workouts": sum(1 for row in month if not missed[row]),
+            "overall_avg_sleep": (sum(all_sleep) / len(all_sleep)) if all_sleep else None,
+            "activity_distribution": activity_distribution,
+            "current_streak": current_streak,
+        }
+
+    def _date_key(self, row):
+        if self.present[row] & BITS["date"]:
+            return date.fromordinal(self.dates[row]).isoformat()
+        return self.extras.get(row, {}).get("date", "")
+
+
+class LogRow(MutableMapping):
+    """Dict-like view of one log in a UserLogs"""
+
+    __slots__ = ("_logs", "_row")
+
+    def __init__(self, logs, row):
+        self._logs = logs
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._logs.value(self._row, key)
+
+    def __setitem__(self, key, value):
+        self._logs.set(self._row, key, value)
+
+    def __delitem__(self, key):
+        self._logs.delete(self._row, key)
+
+    def __iter__(self):
+        return iter(self._logs.keys(self._row))
+
+    def __len__(self):
+        return len(self._logs.keys(self._row))
+
+    def __contains__(self, key):
+        try:
+            self._logs.value(self._row, key)
+        except KeyError:
+            return False
+        return True
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class LogTable(Sequence):
+    """The daily_logs collection: per-user columns plus the global write order"""
+
+    def __init__(self, records=()):
+        self._users = {}
+        self._user_list = []
+        self._row_user = array("l")  # global row -> index into _user_list
+        self._row_pos = array("l")   # global row -> row within that user's columns
+        self.extend(records)
+
+    def __len__(self):
+        return len(self._row_user)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return LogRow(self._user_list[self._row_user[index]], self._row_pos[index])
+
+    def __iter__(self):
+        users = self._user_list
+        for user, row in zip(self._row_user, self._row_pos):
+            yield LogRow(users[user], row)
+
+    def __reversed__(self):
+        users = self._user_list
+        for i in range(len(self) - 1, -1, -1):
+            yield LogRow(users[self._row_user[i]], self._row_pos[i])
+
+    def __sizeof__(self):
+        size = object.__sizeof__(self) + sys.getsizeof(self._users) + sys.getsizeof(self._user_list)
+        size += sys.getsizeof(self._row_user) + sys.getsizeof(self._row_pos)
+        return size + sum(sys.getsizeof(user) for user in self._user_list)
+
+    def _user(self, user_id):
+        """Index of a user's columns in _user_list, created on first use"""
+        try:
+            index = self._users.get(user_id)
+        except TypeError:  # unhashable id: grouped under None, kept in extras
+            user_id = None
+            index = self._users.get(None)
+        if index is None:
+            index = self._users[user_id] = len(self._user_list)
+            self._user_list.append(UserLogs(user_id))
+        return index
+
+    def append(self, record):
+        if not isinstance(record, Mapping):
+            raise TypeError(f"A daily log must be a mapping, not {type(record).__name__}")
+        index = self._user(record.get("user_id"))
+        self._row_pos.append(self._user_list[index].append(record))
+        self._row_user.append(index)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def for_user(self, user_id):
+        """One user's logs (an empty UserLogs when they have none)"""
+        try:
+            index = self._users.get(user_id)
+        except TypeError:
+            index = None
+        return UserLogs(user_id) if index is None else self._user_list[index]
+
+    def users(self):
+        return list(self._user_list)
+
+    def to_records(self):
+        return [dict(row) for row in self]
+
+    def to_columns(self):
+        """JSON-ready form: each user's columns plus the user index of every row in write order"""
+        return {
+            "order": list(self._row_user),
+            "users": [logs.to_columns() for logs in self._user_list],
+        }
+
+    @classmethod
+    def from_columns(cls, encoded, tables=None):
+        """Rebuild from to_columns() output without going through per-log dicts"""
+        table = cls()
+        table._user_list = [UserLogs.from_columns(columns, tables) for columns in encoded["users"]]
+        table._users = {logs.user_id: index for index, logs in enumerate(table._user_list)}
+        table._row_user = array("l", encoded["order"])
+        counts = [0] * len(table._user_list)
+        positions = []
+        for index in encoded["order"]:
+            positions.append(counts[index])
+            counts[index] += 1
+        table._row_pos = array("l", positions)
+        return table
+
+    @classmethod
+    def from_users(cls, user_logs):
+        """
+        Combine per-user logs loaded separately (e.g. from storage shards)
+
+        Shards do not record the write order across users, so table rows
+        are ordered by date (for_user() keeps each user's write order). Logs
+        of a user that appears twice are appended to the first occurrence.
+        """
+        table = cls()
+        for logs in user_logs:
+            index = table._users.get(logs.user_id)
+            if index is None:
+                table._users[logs.user_id] = len(table._user_list)
+                table._user_list.append(logs)
+            else:
+                first = table._user_list[index]
+                for row in logs.rows():
+                    first.append(dict(row))
+        rows = [
+            (str(logs._date_key(row) or ""), index, row)
+            for index, logs in enumerate(table._user_list)
+            for row in range(len(logs))
+        ]
+        rows.sort(key=lambda entry: entry[0])
+        table._row_user = array("l", [index for _, index, _ in rows])
+        table._row_pos = array("l", [row for _, _, row in rows])
+        return table
@@ -0,0 +1,188 @@
+"""
+Request and stage latency metrics for flask_app
+Enabled with METRICS_ENABLED=true. Records a latency histogram per route and
+per pipeline stage (storage, analytics, agent, ML predict, LLM call, template
+render) plus store lock contention, and serves them in Prometheus text
+format on /metrics. When disabled
+nothing is registered and spans stay no-ops.
+"""
+from bisect import bisect_left
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from flask import Response, g, request, template_rendered, before_render_template
+
+from agents import telemetry
+import storage
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+# Upper bounds in seconds, Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+SKIPPED_ENDPOINTS = {"metrics", "static", "asset"}
+
+
+class Histogram:
+    """Labelled latency histogram with cumulative Prometheus buckets"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: (list(counts), total, n) for labels, (counts, total, n) in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, n) in sorted(self.snapshot().items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {n}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {n}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LATENCY = Histogram(
+    "flask_request_duration_seconds", "Request latency by endpoint", ("endpoint", "method")
+)
+REQUESTS = Counter("flask_requests_total", "Requests by endpoint and status", ("endpoint", "method", "status"))
+STAGE_LATENCY = Histogram("app_stage_duration_seconds", "Latency of request/agent stages", ("stage",))
+
+
+def observe_stage(name, seconds):
+    STAGE_LATENCY.observe((name,), seconds)
+
+
+LOCK_COUNTERS = (
+    ("acquired", "app_storage_lock_acquired_total", "Store file locks acquired"),
+    ("contended", "app_storage_lock_contended_total", "Store file locks that had to wait"),
+    ("timeouts", "app_storage_lock_timeouts_total", "Store file locks given up after STORE_LOCK_TIMEOUT"),
+    ("wait_seconds", "app_storage_lock_wait_seconds_total", "Time spent waiting for store file locks"),
+)
+
+
+def render_lock_stats():
+    """Store lock contention of this process (storage.lock_stats) as counters by lock kind"""
+    stats = storage.lock_stats()
+    lines = []
+    for key, name, help_text in LOCK_COUNTERS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for kind, values in sorted(stats.items()):
+            lines.append(f'{name}{{kind="{_escape(kind)}"}} {values[key]}')
+    return lines
+
+
+def render_metrics():
+    """All metrics in Prometheus text exposition format"""
+    lines = REQUEST_LATENCY.render() + REQUESTS.render() + STAGE_LATENCY.render() + render_lock_stats()
+    return "\n".join(lines) + "\n"
+
+
+def _endpoint():
+    return request.endpoint or "unmatched"
+
+
+def _start_timer():
+    g._metrics_start = time.perf_counter()
+
+
+def _observe_request(response):
+    start = g.pop("_metrics_start", None)
+    endpoint = _endpoint()
+    if start is not None and endpoint not in SKIPPED_ENDPOINTS:
+        REQUEST_LATENCY.observe((endpoint, request.method), time.perf_counter() - start)
+        REQUESTS.inc((endpoint, request.method, str(response.status_code)))
+    return response
+
+
+def _template_started(sender, template, context, **extra):
+    if telemetry.active():
+        g._render_start = time.perf_counter()
+
+
+def _template_finished(sender, template, context, **extra):
+    start = g.pop("_render_start", None)
+    if start is not None:
+        telemetry.record("template_render", time.perf_counter() - start)
+
+
+def instrument_templates(app):
+    """Report render_template calls as the template_render stage (idempotent)"""
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+
+
+def init_app(app, enabled=None):
+    """
+    Register the timing hooks and the /metrics route
+
+    Args:
+        app: Flask application
+        enabled: Override METRICS_ENABLED
+
+    Returns:
+        True when metrics were enabled
+    """
+    if not (METRICS_ENABLED if enabled is None else enabled):
+        return False
+
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    instrument_templates(app)
+    telemetry.add_observer(observe_stage)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    return True
@@ -0,0 +1,330 @@
+"""
+On-demand sampling profiler for flask_app workers
+Enabled by setting PROFILE_TOKEN. Admin routes (token in the X-Profile-Token
+header) can sample the whole worker for a few seconds or profile the next N
+requests of an endpoint; PROFILE_REQUESTS="index:10,log_today:5" arms
+endpoints at startup. Profiles are written to PROFILE_DIR as folded stacks
+("frame;frame;frame count" lines) that flamegraph.pl and speedscope read.
+
+PROFILE_MEMORY=true adds a memory mode: tracemalloc measures the peak and
+retained allocations of every request per endpoint, and an admin route
+reports them with the size of each data store collection and the top
+allocation sites. Peaks are exact when the worker handles one request at a time.
+"""
+from collections import Counter
+from collections.abc import Sized
+from datetime import datetime
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import tracemalloc
+
+from dotenv import load_dotenv
+from flask import abort, g, jsonify, request
+
+load_dotenv()
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "false").lower() == "true"
+MEMORY_FRAMES = int(os.getenv("PROFILE_MEMORY_FRAMES", "1"))
+MAX_SECONDS = 120
+MAX_REQUESTS = 1000
+TOP_ALLOCATIONS = 15
+
+
+def fold_stack(frame):
+    """Root-first "func (file:line);..." string for a frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Samples the stacks of some (or all) threads on a background thread"""
+
+    def __init__(self, thread_ids=None, interval=SAMPLE_INTERVAL):
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and return the folded stack counts"""
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                self.stacks[fold_stack(frame)] += 1
+
+
+def write_folded(stacks, label, path=None):
+    """Write stack counts in folded format; returns the file path"""
+    if path is None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", label)
+        path = os.path.join(PROFILE_DIR, f"{safe}-{os.getpid()}-{stamp}.folded")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp, path)
+    return path
+
+
+class RequestProfiler:
+    """Profiles the next N requests of armed endpoints into one cumulative file per endpoint"""
+
+    def __init__(self):
+        self._armed = {}
+        self._lock = threading.Lock()
+
+    def arm(self, endpoint, count):
+        with self._lock:
+            self._armed[endpoint] = {"remaining": count, "profiled": 0, "stacks": Counter(), "path": None}
+
+    def status(self):
+        with self._lock:
+            return {
+                endpoint: {"remaining": s["remaining"], "profiled": s["profiled"], "path": s["path"]}
+                for endpoint, s in self._armed.items()
+            }
+
+    def before_request(self):
+        if not self._armed:
+            return
+        endpoint = request.endpoint
+        with self._lock:
+            session = self._armed.get(endpoint)
+            if session is None or session["remaining"] <= 0:
+                return
+            session["remaining"] -= 1
+        g._profile_sampler = (endpoint, Sampler([threading.get_ident()]).start())
+
+    def teardown_request(self, exc=None):
+        profiled = g.pop("_profile_sampler", None)
+        if profiled is None:
+            return
+        endpoint, sampler = profiled
+        stacks = sampler.stop()
+        with self._lock:
+            session = self._armed[endpoint]
+            session["stacks"].update(stacks)
+            session["profiled"] += 1
+            session["path"] = write_folded(session["stacks"], f"requests-{endpoint}", session["path"])
+
+
+def profile_worker(seconds):
+    """Sample every thread of this worker for `seconds` in the background; returns the output path"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(PROFILE_DIR, f"worker-{os.getpid()}-{stamp}.folded")
+
+    def run():
+        sampler = Sampler().start()
+        threading.Event().wait(seconds)
+        write_folded(sampler.stop(), "worker", path)
+
+    threading.Thread(target=run, name="profile-worker", daemon=True).start()
+    return path
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by a JSON-like object graph (dicts, lists, strings, numbers)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def _json_default(value):
+    """Columnar collections (log_columns.LogTable) as written to disk, anything else as str"""
+    to_columns = getattr(value, "to_columns", None)
+    return to_columns() if to_columns is not None else str(value)
+
+
+def collection_sizes(data):
+    """
+    Size of every top-level collection of the data store
+
+    Returns:
+        dict of name -> {"rows", "bytes" (in memory), "json_bytes" (compact JSON)}
+    """
+    sizes = {}
+    for name, value in data.items():
+        sizes[name] = {
+            "rows": len(value) if isinstance(value, Sized) and not isinstance(value, str) else 1,
+            "bytes": deep_sizeof(value),
+            "json_bytes": len(json.dumps(value, separators=(",", ":"), default=_json_default)),
+        }
+    return sizes
+
+
+class MemoryProfiler:
+    """Per-endpoint peak and retained allocations measured with tracemalloc"""
+
+    def __init__(self, frames=MEMORY_FRAMES):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        tracemalloc.reset_peak()
+        g._memory_start = tracemalloc.get_traced_memory()[0]
+
+    def teardown_request(self, exc=None):
+        start = g.pop("_memory_start", None)
+        if start is None:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            stats = self._stats.setdefault(request.endpoint or "unmatched", {
+                "requests": 0, "peak_bytes_max": 0, "peak_bytes_total": 0, "retained_bytes_total": 0,
+            })
+            stats["requests"] += 1
+            stats["peak_bytes_max"] = max(stats["peak_bytes_max"], peak - start)
+            stats["peak_bytes_total"] += peak - start
+            stats["retained_bytes_total"] += current - start
+
+    def endpoint_stats(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": s["requests"],
+                    "peak_kb_mean": round(s["peak_bytes_total"] / s["requests"] / 1024, 1),
+                    "peak_kb_max": round(s["peak_bytes_max"] / 1024, 1),
+                    "retained_kb_mean": round(s["retained_bytes_total"] / s["requests"] / 1024, 1),
+                }
+                for endpoint, s in self._stats.items()
+            }
+
+    def top_allocations(self, limit=TOP_ALLOCATIONS):
+        """Source lines whose live allocations grew most since profiling started"""
+        diff = tracemalloc.take_snapshot().compare_to(self._baseline, "lineno")
+        return [
+            {"site": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1),
+             "size_diff_kb": round(stat.size_diff / 1024, 1), "count": stat.count}
+            for stat in diff[:limit]
+        ]
+
+    def dump_snapshot(self):
+        """Write a tracemalloc snapshot to PROFILE_DIR for offline analysis"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(PROFILE_DIR, f"memory-{os.getpid()}-{stamp}.tracemalloc")
+        tracemalloc.take_snapshot().dump(path)
+        return path
+
+
+def parse_armed(spec):
+    """"index:10,log_today:5" -> {"index": 10, "log_today": 5}"""
+    armed = {}
+    for item in spec.split(","):
+        endpoint, _, count = item.strip().partition(":")
+        if endpoint:
+            armed[endpoint] = min(MAX_REQUESTS, int(count or 1))
+    return armed
+
+
+def _require_token(token):
+    supplied = request.headers.get("X-Profile-Token", "")
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        abort(404)
+
+
+def init_app(app, token=None, data_loader=None, memory=None):
+    """
+    Register the profiling hooks and admin routes
+
+    Args:
+        app: Flask application
+        token: Override PROFILE_TOKEN (profiling stays off when empty)
+        data_loader: Returns the data store, for per-collection sizes in memory mode
+        memory: Override PROFILE_MEMORY
+
+    Returns:
+        The RequestProfiler, or None when profiling is disabled
+    """
+    token = PROFILE_TOKEN if token is None else token
+    if not token:
+        return None
+
+    profiler = RequestProfiler()
+    for endpoint, count in parse_armed(PROFILE_REQUESTS).items():
+        profiler.arm(endpoint, count)
+    app.before_request(profiler.before_request)
+    app.teardown_request(profiler.teardown_request)
+
+    memory_profiler = None
+    if PROFILE_MEMORY if memory is None else memory:
+        memory_profiler = MemoryProfiler()
+        app.before_request(memory_profiler.before_request)
+        app.teardown_request(memory_profiler.teardown_request)
+
+    @app.route("/admin/profile", methods=["GET"])
+    def profile_status():
+        _require_token(token)
+        files = sorted(os.listdir(PROFILE_DIR)) if os.path.isdir(PROFILE_DIR) else []
+        return jsonify({"armed": profiler.status(), "files": files, "dir": PROFILE_DIR})
+
+    @app.route("/admin/profile/worker", methods=["POST"])
+    def profile_worker_route():
+        _require_token(token)
+        seconds = min(MAX_SECONDS, max(0.1, request.args.get("seconds", 10, type=float)))
+        return jsonify({"seconds": seconds, "path": profile_worker(seconds)}), 202
+
+    @app.route("/admin/profile/requests", methods=["POST"])
+    def profile_requests_route():
+        _require_token(token)
+        endpoint = request.args.get("endpoint", "")
+        if endpoint not in app.view_functions:
+            return jsonify({"error": f"unknown endpoint '{endpoint}'"}), 400
+        count = min(MAX_REQUESTS, max(1, request.args.get("count", 10, type=int)))
+        profiler.arm(endpoint, count)
+        return jsonify({"endpoint": endpoint, "count": count}), 202
+
+    @app.route("/admin/profile/memory", methods=["GET", "POST"])
+    def profile_memory_route():
+        _require_token(token)
+        if memory_profiler is None:
+            return jsonify({"error": "memory profiling is off (PROFILE_MEMORY=true)"}), 404
+        if request.method == "POST":
+            return jsonify({"path": memory_profiler.dump_snapshot()}), 201
+        report = {
+            "traced_kb": round(tracemalloc.get_traced_memory()[0] / 1024, 1),
+            "endpoints": memory_profiler.endpoint_stats(),
+            "top_allocations": memory_profiler.top_allocations(),
+        }
+        if data_loader is not None:
+            report["collections"] = collection_sizes(data_loader())
+        return jsonify(report)
+
+    return profiler
@@ -0,0 +1,527 @@
+"""
+On-disk format of the flask_app data store
+The store is written as compact JSON (no indentation). Daily logs are held
+in memory as a log_columns.LogTable and written as its columns: per user,
+dates as day ordinals, stress/energy/mood as small integer codes,
+missed_workout as a hex bitset and nulls inside number columns, with the
+write order of all logs kept separately. The code tables are written into
+the file under "_encoding", so a file always decodes with the tables it was
+written with. load_store() returns the store with daily_logs as a LogTable,
+whose rows read like the original dicts.
+
+Older files are still read: version 1 stored daily logs as records with
+codes and omitted nulls, and files without "_encoding" are plain indented
+JSON. Set STORE_COMPACT=false to write the plain indented format.
+
+With STORE_SHARDED=true the store is split across files in a directory: a
+small index.json (profiles, settings and anything else shared) and one file
+per user under users/ with that user's records from every per-user
+collection. A request then reads the index plus one user's file and writes
+only what it changed.
+
+Every file is written to a temporary file in the same directory and renamed
+over the old one, so readers never see a partly written store. Writers from
+several processes coordinate with FileLock, an flock/msvcrt lock on a
+".lock" file next to the file it protects.
+"""
+from collections.abc import Mapping
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from agents import telemetry
+from log_columns import CODE_FIELDS, LogTable
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+load_dotenv()
+
+STORE_COMPACT = os.getenv("STORE_COMPACT", "true").lower() == "true"
+STORE_SHARDED = os.getenv("STORE_SHARDED", "false").lower() == "true"
+STORE_FSYNC = os.getenv("STORE_FSYNC", "true").lower() == "true"
+STORE_LOCK_TIMEOUT = float(os.getenv("STORE_LOCK_TIMEOUT", "10"))
+
+ENCODING_KEY = "_encoding"
+ENCODING_VERSION = 2
+
+COLUMNAR_COLLECTION = "daily_logs"
+
+# Collections split by user_id in the sharded layout
+USER_COLLECTIONS = (
+    "daily_logs",
+    "agent_decisions",
+    "medical_records",
+    "medications",
+    "vaccinations",
+    "meals",
+    "personal_goals",
+    "hydration_logs",
+)
+VERSIONS_KEY = "data_versions"
+INDEX_FILE = "index.json"
+USERS_DIR = "users"
+UNASSIGNED_SHARD = "_unassigned"
+SAFE_SHARD_NAME = re.compile(r"[A-Za-z0-9-][A-Za-z0-9_.-]{0,127}\Z")
+
+
+def _decode_record(record, tables, nullable):
+    """Version 1 record: codes back to strings, omitted nullable fields back to None"""
+    for key, table in tables.items():
+        value = record.get(key)
+        # bool is an int subclass; only plain ints are codes
+        if type(value) is int and 0 <= value < len(table):
+            record[key] = table[value]
+    for key in nullable:
+        record.setdefault(key, None)
+    return record
+
+
+def _decode_records(raw, encoding):
+    enums = encoding.get("enums", {})
+    nullable_fields = encoding.get("nullable", {})
+    for collection in set(enums) | set(nullable_fields):
+        records = raw.get(collection)
+        if not isinstance(records, list):
+            continue
+        tables = enums.get(collection, {})
+        nullable = nullable_fields.get(collection, ())
+        for record in records:
+            if isinstance(record, dict):
+                _decode_record(record, tables, nullable)
+
+
+def encode_store(data):
+    """
+    Compact copy of the store for writing
+
+    Args:
+        data: Data store (not modified); daily_logs may be a LogTable or a list of dicts
+
+    Returns:
+        Store with daily_logs as columns and the code tables under "_encoding"
+    """
+    encoded = dict(data)
+    if COLUMNAR_COLLECTION in data:
+        logs = data[COLUMNAR_COLLECTION] or []
+        if not isinstance(logs, LogTable):
+            logs = LogTable(logs)
+        encoded[COLUMNAR_COLLECTION] = logs.to_columns()
+    encoded[ENCODING_KEY] = {
+        "version": ENCODING_VERSION,
+        "columnar": {COLUMNAR_COLLECTION: {"codes": CODE_FIELDS}},
+    }
+    return encoded
+
+
+def decode_store(raw):
+    """
+    Decode a loaded store in place
+
+    Args:
+        raw: Parsed JSON in the current or an older format
+
+    Returns:
+        The same dict with daily_logs as a LogTable and without "_encoding"
+    """
+    encoding = raw.pop(ENCODING_KEY, None) or {}
+    version = encoding.get("version", 0)
+    if version > ENCODING_VERSION:
+        raise ValueError(f"data store encoding version {version} is newer than this code")
+
+    logs = raw.get(COLUMNAR_COLLECTION)
+    if version >= 2:
+        if logs is None:
+            return raw
+        codes = encoding.get("columnar", {}).get(COLUMNAR_COLLECTION, {}).get("codes")
+        raw[COLUMNAR_COLLECTION] = LogTable.from_columns(logs, codes)
+        return raw
+    if version == 1:
+        _decode_records(raw, encoding)
+    if isinstance(logs, list):
+        raw[COLUMNAR_COLLECTION] = LogTable(raw[COLUMNAR_COLLECTION])
+    return raw
+
+
+def plain_store(data):
+    """Copy of the store with daily_logs as a list of dicts, for plain JSON"""
+    plain = dict(data)
+    logs = plain.get(COLUMNAR_COLLECTION)
+    if isinstance(logs, LogTable):
+        plain[COLUMNAR_COLLECTION] = logs.to_records()
+    return plain
+
+
+class StoreLockTimeout(TimeoutError):
+    """A store lock was not acquired within STORE_LOCK_TIMEOUT"""
+
+
+_lock_stats = {}
+_lock_stats_lock = threading.Lock()
+
+
+def _record_lock(kind, waited, contended, timed_out=False):
+    with _lock_stats_lock:
+        stats = _lock_stats.setdefault(kind, {
+            "acquired": 0, "contended": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+        })
+        if timed_out:
+            stats["timeouts"] += 1
+        else:
+            stats["acquired"] += 1
+        if contended:
+            stats["contended"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+    if contended:
+        telemetry.record("storage_lock_wait", waited)
+
+
+def lock_stats():
+    """
+    Lock contention counters of this process
+
+    Returns:
+        dict of lock kind -> {"acquired", "contended", "timeouts",
+        "wait_seconds", "max_wait_seconds"}
+    """
+    with _lock_stats_lock:
+        return {kind: dict(stats) for kind, stats in _lock_stats.items()}
+
+
+class FileLock:
+    """
+    Inter-process lock on `path` + ".lock"
+
+    Uses fcntl.flock where available and msvcrt.locking on Windows, where
+    shared locks are taken as exclusive. Each FileLock opens its own
+    descriptor, so it also excludes other threads of the same process.
+    Without either module the lock is a no-op.
+    """
+
+    def __init__(self, path, shared=False, kind="store"):
+        self.path = path + ".lock"
+        self.shared = shared
+        self.kind = kind
+        self._file = None
+
+    def _try_lock(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), (fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Wait for the lock, polling with backoff
+
+        Raises:
+            StoreLockTimeout: not acquired within `timeout` (default STORE_LOCK_TIMEOUT) seconds
+        """
+        timeout = STORE_LOCK_TIMEOUT if timeout is None else timeout
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a+b")
+        start = time.perf_counter()
+        delay = 0.001
+        contended = False
+        while not self._try_lock():
+            contended = True
+            waited = time.perf_counter() - start
+            if waited >= timeout:
+                self._file.close()
+                self._file = None
+                _record_lock(self.kind, waited, contended, timed_out=True)
+                raise StoreLockTimeout(f"{self.kind} lock {self.path} not acquired in {timeout:g}s")
+            time.sleep(min(delay, timeout - waited))
+            delay = min(delay * 2, 0.05)
+        _record_lock(self.kind, time.perf_counter() - start, contended)
+        return self
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+    @property
+    def locked(self):
+        return self._file is not None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _atomic_write(path, write):
+    """Call write(file) on a temporary file next to `path`, then rename it over `path`"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            if STORE_FSYNC:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_store(path):
+    """
+    Read and decode the data store
+
+    Raises:
+        OSError, ValueError: the file is missing or not a valid store
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return decode_store(json.load(f))
+
+
+def dump_store(data, path, compact=None):
+    """
+    Write the data store atomically
+
+    Args:
+        data: Data store as returned by load_store()
+        path: File to write
+        compact: Override STORE_COMPACT
+    """
+    if STORE_COMPACT if compact is None else compact:
+        _atomic_write(path, lambda f: json.dump(encode_store(data), f, separators=(",", ":"), ensure_ascii=False))
+    else:
+        _atomic_write(path, lambda f: json.dump(plain_store(data), f, indent=2))
+
+
+def shard_name(user_id):
+    """File name (without .json) of a user's shard; ids that are not safe file names are hashed"""
+    if user_id is None:
+        return UNASSIGNED_SHARD
+    if isinstance(user_id, str) and SAFE_SHARD_NAME.match(user_id):
+        return user_id
+    return "_" + hashlib.sha1(json.dumps(user_id, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_FILE)
+
+
+def shard_path(directory, user_id):
+    return os.path.join(directory, USERS_DIR, shard_name(user_id) + ".json")
+
+
+def _record_user(record):
+    user_id = record.get("user_id") if isinstance(record, Mapping) else None
+    try:
+        hash(user_id)
+    except TypeError:
+        return None
+    return user_id
+
+
+def _new_shard(user_id):
+    return {"user_id": user_id, VERSIONS_KEY: {}}
+
+
+def split_store(data, users=()):
+    """
+    Split a store into the index and per-user shards
+
+    Args:
+        data: Data store as returned by load_store() or load_sharded()
+        users: User ids that get a shard even when they have no records
+
+    Returns:
+        (index dict, {user_id: shard dict}); records without a usable
+        user_id go to the None shard
+    """
+    versions = data.get(VERSIONS_KEY) or {}
+    index = {key: value for key, value in data.items() if key not in USER_COLLECTIONS}
+    index[VERSIONS_KEY] = {
+        key: stamp for key, stamp in versions.items()
+        if key not in USER_COLLECTIONS and not key.startswith("user:")
+    }
+    shards = {}
+
+    def shard(user_id):
+        if user_id not in shards:
+            shards[user_id] = _new_shard(user_id)
+        return shards[user_id]
+
+    for name in USER_COLLECTIONS:
+        value = data.get(name)
+        if not value:
+            continue
+        if name == COLUMNAR_COLLECTION:
+            table = value if isinstance(value, LogTable) else LogTable(value)
+            for logs in table.users():
+                shard(logs.user_id)[name] = LogTable.from_users([logs])
+        else:
+            for record in value:
+                shard(_record_user(record)).setdefault(name, []).append(record)
+
+    for user_id in users:
+        shard(user_id)
+    for user_id, user_shard in shards.items():
+        stamps = user_shard[VERSIONS_KEY]
+        for key in USER_COLLECTIONS + (f"user:{user_id}",):
+            if key in versions:
+                stamps[key] = versions[key]
+    return index, shards
+
+
+def merge_shards(index, shards):
+    """
+    Rebuild a store from the index and any number of shards
+
+    Collections come back in the shape the single-file store has. Lists are
+    ordered by date across users, and each version stamp is the newest
+    found in any file.
+    """
+    data = dict(index)
+    versions = dict(index.get(VERSIONS_KEY) or {})
+    tables = []
+    for name in USER_COLLECTIONS:
+        data[name] = []
+    for shard in shards:
+        for key, stamp in (shard.get(VERSIONS_KEY) or {}).items():
+            if stamp is not None and (versions.get(key) is None or stamp > versions[key]):
+                versions[key] = stamp
+        for name in USER_COLLECTIONS:
+            if name not in shard:
+                continue
+            if name == COLUMNAR_COLLECTION:
+                tables.extend(shard[name].users())
+            else:
+                data[name].extend(shard[name])
+    if len(shards) > 1:
+        for name in USER_COLLECTIONS:
+            data[name].sort(key=lambda record: str(record.get("date") or "") if isinstance(record, Mapping) else "")
+    data[COLUMNAR_COLLECTION] = LogTable.from_users(tables)
+    data[VERSIONS_KEY] = versions
+    return data
+
+
+def sharded_exists(directory):
+    return os.path.exists(index_path(directory))
+
+
+def load_sharded(directory, users=None, index=None):
+    """
+    Read the index and the shards of some users
+
+    Args:
+        directory: Shard directory
+        users: User ids whose shards to read; None reads every shard and
+            an empty tuple reads only the index
+        index: The index as already read by the caller (read from disk when None)
+
+    Returns:
+        Data store in the single-file layout, holding only those users' records
+
+    Raises:
+        OSError, ValueError: the index is missing or a file is not a valid store
+    """
+    if index is None:
+        index = load_store(index_path(directory))
+    if users is None:
+        users_dir = os.path.join(directory, USERS_DIR)
+        names = sorted(os.listdir(users_dir)) if os.path.isdir(users_dir) else []
+        paths = [os.path.join(users_dir, name) for name in names if name.endswith(".json")]
+    else:
+        paths = [shard_path(directory, user_id) for user_id in users]
+    shards = []
+    for path in paths:
+        try:
+            shards.append(load_store(path))
+        except FileNotFoundError:
+            continue  # user without records
+    return merge_shards(index, shards)
+
+
+def dump_sharded(data, directory, collections=None, users=None, compact=None):
+    """
+    Write the parts of a store that changed to the shard directory
+
+    Args:
+        data: Data store as returned by load_sharded() or load_store()
+        directory: Shard directory
+        collections: Names of the collections that changed; None writes the
+            index and every shard found in `data`, and removes the shards
+            of users who no longer have records
+        users: User ids whose shards to write (None: every user in `data`).
+            Pass the users that were loaded when `data` holds only some of them,
+            so a user whose last record was deleted is written empty. Their
+            shards are also written when `collections` holds data_versions,
+            which carries their `user:<id>` stamps.
+        compact: Override STORE_COMPACT
+    """
+    index, shards = split_store(data, users or ())
+    os.makedirs(os.path.join(directory, USERS_DIR), exist_ok=True)
+
+    changed = None if collections is None else set(collections) - {VERSIONS_KEY}
+    # shards first: a reader that finds the index (e.g. after a migration) finds the shards too
+    if writes_shards(collections, users):
+        _dump_shards(directory, shards, collections, users, compact)
+    if changed is None or changed - set(USER_COLLECTIONS):
+        dump_store(index, index_path(directory), compact)
+
+
+def writes_shards(collections, users=None):
+    """
+    Whether dump_sharded() with these arguments rewrites user shards
+
+    Shards are written when user collections changed, and also when only
+    index collections did but the version stamps moved for named users,
+    since each user's `user:<id>` stamp lives in their shard.
+    """
+    if collections is None:
+        return True
+    collections = set(collections)
+    return bool(collections & set(USER_COLLECTIONS)) or (VERSIONS_KEY in collections and bool(users))
+
+
+def _dump_shards(directory, shards, collections, users, compact):
+    if users is None:
+        targets = shards
+        if collections is None:
+            keep = {shard_name(user_id) + ".json" for user_id in shards}
+            users_dir = os.path.join(directory, USERS_DIR)
+            for name in os.listdir(users_dir):
+                if name.endswith(".json") and name not in keep:
+                    os.remove(os.path.join(users_dir, name))
+    else:
+        targets = {user_id: shards[user_id] for user_id in users}
+    for user_id, shard in targets.items():
+        dump_store(shard, shard_path(directory, user_id), compact)
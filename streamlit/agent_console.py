@@ -1,6 +1,7 @@
 # streamlit/agent_console.py
 import streamlit as st
 from agents.orchestrator import decide_plan
+from agents.replay import build_tasks, load_signals, replay
 from dotenv import load_dotenv
 from datetime import date
 import os
@@ -19,6 +20,7 @@ def init_state():
     st.session_state.setdefault("logs", [])
     st.session_state.setdefault("decisions", [])
     st.session_state.setdefault("user_id", "11111111-1111-1111-1111-111111111111")
+    st.session_state.setdefault("replay_results", None)
 
 init_state()
 
@@ -28,7 +30,7 @@ st.caption("Internal monitoring interface for agent behavior")
 
 page = st.sidebar.radio(
     "Navigation",
-    ["Dashboard", "Signal Intake", "History"]
+    ["Dashboard", "Signal Intake", "History", "Replay"]
 )
 
 # ------------------ DASHBOARD ------------------
@@ -106,6 +108,96 @@ def history_view():
     else:
         st.info("No decisions yet")
 
+# ------------------ REPLAY ------------------
+HISTOGRAM_BINS = 20
+DECISION_FIELDS = ["goal", "wellness", "plan", "recommendation"]
+
+
+def latency_histogram(values, bins=HISTOGRAM_BINS):
+    """Count of calls per latency bucket, indexed by the bucket's upper bound in ms"""
+    buckets = pd.cut(values, bins=min(bins, max(1, values.nunique())))
+    counts = buckets.value_counts(sort=False)
+    counts.index = [f"{interval.right:.1f}" for interval in counts.index]
+    return counts
+
+
+def replay_view():
+    st.subheader("Replay Signal Histories")
+    st.caption(
+        "Upload CSV or NDJSON rows with stress/energy/sleep_hours/missed "
+        "(or stress_level/energy_level/missed_workout) and an optional user_id per history"
+    )
+
+    uploaded = st.file_uploader("Signal file", type=["csv", "ndjson", "jsonl", "json"])
+
+    col1, col2, col3 = st.columns(3)
+    mode = col1.selectbox("Workers", ["threads", "processes"])
+    workers = col2.slider("Pool size", 1, max(2, (os.cpu_count() or 1) * 4), 4)
+    with_recent = col3.checkbox("Pass recent logs", value=True)
+
+    col1, col2 = st.columns(2)
+    use_stub = col1.checkbox("Stub LLM", value=True, help="Replace the LLM APIs with a fixed response")
+    stub_latency = col2.number_input("Stub LLM latency (ms)", 0, 5000, 0, disabled=not use_stub)
+
+    if uploaded is not None and st.button("Run Replay"):
+        try:
+            signals = load_signals(uploaded.getvalue(), uploaded.name)
+        except Exception as e:
+            st.error("Could not parse the signal file")
+            st.exception(e)
+            return
+        if not signals:
+            st.warning("The file has no signals")
+            return
+
+        tasks = build_tasks(signals, with_recent_logs=with_recent)
+        with st.spinner(f"Replaying {len(tasks)} signals..."):
+            results, wall = replay(tasks, workers=workers, mode=mode,
+                                   stub_latency_ms=stub_latency if use_stub else None)
+        st.session_state.replay_results = {
+            "results": results,
+            "wall": wall,
+            "mode": mode,
+            "workers": workers,
+        }
+
+    run = st.session_state.replay_results
+    if not run:
+        st.info("No replay yet")
+        return
+
+    results = run["results"]
+    frame = pd.DataFrame([{k: v for k, v in r.items() if k != "stages"} for r in results])
+    stages = pd.DataFrame([r["stages"] for r in results])
+    stages["total"] = frame["total_ms"]
+    errors = int(frame["error"].notna().sum())
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Decisions", len(results))
+    col2.metric("Throughput", f"{len(results) / run['wall']:.1f}/s" if run["wall"] else "—")
+    col3.metric("Wall Time", f"{run['wall']:.2f}s")
+    col4.metric("Errors", errors)
+    st.caption(f"{run['workers']} {run['mode']}")
+
+    st.subheader("Stage Latency (ms)")
+    summary = stages.describe(percentiles=[0.5, 0.95, 0.99]).T
+    st.dataframe(summary[["count", "mean", "50%", "95%", "99%", "max"]].round(2))
+
+    stage = st.selectbox("Histogram", list(stages.columns), index=len(stages.columns) - 1)
+    values = stages[stage].dropna()
+    if not values.empty:
+        st.bar_chart(latency_histogram(values))
+
+    st.subheader("Decision Distribution")
+    columns = st.columns(len(DECISION_FIELDS))
+    for column, field in zip(columns, DECISION_FIELDS):
+        column.write(field.title())
+        column.dataframe(frame[field].value_counts())
+
+    if errors:
+        st.subheader("Errors")
+        st.dataframe(frame.loc[frame["error"].notna(), ["history", "date", "error"]])
+
 # ------------------ ROUTING ------------------
 if page == "Dashboard":
     dashboard_view()
@@ -113,3 +205,5 @@ elif page == "Signal Intake":
     signal_view()
 elif page == "History":
     history_view()
+elif page == "Replay":
+    replay_view()
@@ -0,0 +1,238 @@
+"""
+Persistent outbox for Supabase inserts
+The Streamlit apps write rows to a local SQLite file and return immediately;
+a background thread inserts them into Supabase in batches and retries failed
+rows with exponential backoff, so nothing is lost when Supabase is down or
+the app restarts. A batch that is rejected is sent again row by row, so one
+bad row is parked without holding back the others.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+OUTBOX_FILE = os.getenv("SUPABASE_OUTBOX_FILE", "supabase_outbox.db")
+BATCH_SIZE = int(os.getenv("SUPABASE_OUTBOX_BATCH", "50"))
+MAX_ATTEMPTS = 8          # attempts before a row is parked as failed
+BASE_BACKOFF = 1.0        # seconds, doubled per attempt
+MAX_BACKOFF = 300.0
+CLAIM_SECONDS = 60        # rows being sent are hidden from other writers for this long
+IDLE_WAIT = 30            # seconds between scans when nothing is due
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    user_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts` (with jitter)"""
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class SupabaseOutbox:
+    """SQLite-backed queue of Supabase inserts drained by a daemon thread"""
+
+    def __init__(self, client, path=OUTBOX_FILE, batch_size=BATCH_SIZE, on_flush=None, start=True):
+        """
+        Args:
+            client: Supabase client rows are inserted with
+            path: SQLite file holding the queued rows
+            batch_size: Rows sent per insert call
+            on_flush: Called as on_flush(table, user_ids) after rows are inserted,
+                before they leave the outbox (e.g. to drop cached reads)
+            start: Start the background writer thread
+        """
+        self.client = client
+        self.path = path
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.last_error = ""
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._thread = None
+        if start:
+            self.start()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="supabase-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, table, row):
+        """Queue one row for insertion into `table`; returns immediately"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (table_name, user_id, payload, created_at) VALUES (?, ?, ?, ?)",
+                (table, row.get("user_id"), json.dumps(row, default=str), time.time()),
+            )
+        self._wake.set()
+
+    def pending_rows(self, table, user_id=None):
+        """Rows of `table` not yet in Supabase (pending or failed), oldest first"""
+        query = "SELECT payload FROM outbox WHERE table_name = ?"
+        params = [table]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def counts(self):
+        """{"pending": n, "failed": n}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        counts = {"pending": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def retry_failed(self):
+        """Move failed rows back to pending with a fresh attempt budget"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = 0 WHERE status = 'failed'"
+            )
+        self._wake.set()
+        return cursor.rowcount
+
+    def _claim(self, now):
+        """Take the next due batch (one table) and hide it from other writers while it is sent"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                first = self._conn.execute(
+                    "SELECT table_name FROM outbox WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if first is None:
+                    self._conn.execute("COMMIT")
+                    return None, []
+                rows = self._conn.execute(
+                    "SELECT id, user_id, payload, attempts FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt <= ? AND table_name = ? ORDER BY id LIMIT ?",
+                    (now, first[0], self.batch_size),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET next_attempt = ? WHERE id = ?",
+                    [(now + CLAIM_SECONDS, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return first[0], rows
+
+    def _send(self, table, rows):
+        """
+        Insert claimed rows, one call per batch; a rejected batch is retried row by row
+
+        Returns:
+            (inserted rows, [(row, error)] for the rows that failed)
+        """
+        try:
+            self.client.table(table).insert([json.loads(row[2]) for row in rows]).execute()
+            return rows, []
+        except Exception as e:
+            if len(rows) == 1:
+                return [], [(rows[0], str(e))]
+        sent, failed = [], []
+        for row in rows:
+            try:
+                self.client.table(table).insert([json.loads(row[2])]).execute()
+                sent.append(row)
+            except Exception as e:
+                failed.append((row, str(e)))
+        return sent, failed
+
+    def _mark_sent(self, table, rows):
+        """
+        Delete inserted rows
+
+        on_flush runs first, under the same lock as pending_rows(), so a
+        reader never finds a row gone from the outbox while its cached
+        Supabase read is still missing it.
+        """
+        with self._lock:
+            if self.on_flush:
+                try:
+                    self.on_flush(table, {row[1] for row in rows})
+                except Exception:
+                    pass
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(row[0],) for row in rows])
+
+    def _mark_failed(self, failed, now):
+        updates = []
+        for (row_id, _, _, attempts), error in failed:
+            attempts += 1
+            status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+            updates.append((status, attempts, now + backoff_delay(attempts), error, row_id))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                updates,
+            )
+
+    def drain(self):
+        """
+        Send every batch that is due now
+
+        Returns:
+            Number of rows inserted
+        """
+        sent = 0
+        while not self._stop.is_set():
+            now = time.time()
+            table, rows = self._claim(now)
+            if not rows:
+                break
+            inserted, failed = self._send(table, rows)
+            if inserted:
+                self._mark_sent(table, inserted)
+                sent += len(inserted)
+            if failed:
+                self.last_error = failed[-1][1]
+                self._mark_failed(failed, now)
+                break
+        return sent
+
+    def _next_due(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return IDLE_WAIT
+        return min(IDLE_WAIT, max(0.0, row[0] - time.time()))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+                wait = self._next_due()
+            except Exception as e:
+                self.last_error = str(e)
+                wait = BASE_BACKOFF
+            self._wake.wait(wait)
+            self._wake.clear()
@@ -0,0 +1,85 @@
+"""
+Jinja bytecode cache and template precompilation for flask_app
+Compiled templates are stored in TEMPLATE_CACHE_DIR so a new worker loads
+bytecode instead of parsing and compiling the template sources, and
+init_app() compiles every template at startup (TEMPLATE_PRECOMPILE) so the
+first requests do not pay for it. `flask precompile-templates` fills the
+cache at deploy time. Auto-reload follows TEMPLATES_AUTO_RELOAD and is off
+unless the app runs in debug mode.
+"""
+import logging
+import os
+import time
+
+import click
+from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+load_dotenv()
+
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "template_cache"))
+TEMPLATE_PRECOMPILE = os.getenv("TEMPLATE_PRECOMPILE", "true").lower() == "true"
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD")
+
+logger = logging.getLogger(__name__)
+
+
+def bytecode_cache(directory=None):
+    """FileSystemBytecodeCache in `directory` (TEMPLATE_CACHE_DIR), or None when it cannot be created"""
+    directory = directory or TEMPLATE_CACHE_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        logger.warning("Template bytecode cache disabled: %s", e)
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
+def precompile(app):
+    """
+    Compile every template of the app into the in-memory and bytecode caches
+
+    Returns:
+        (number of templates compiled, {name: error} for those that failed)
+    """
+    env = app.jinja_env
+    compiled = 0
+    failed = {}
+    for name in env.list_templates():
+        try:
+            env.get_template(name)
+            compiled += 1
+        except TemplateError as e:
+            failed[name] = str(e)
+            logger.warning("Template %s failed to compile: %s", name, e)
+    return compiled, failed
+
+
+def init_app(app, precompile_templates=None):
+    """
+    Attach the bytecode cache, set auto-reload and precompile the templates
+
+    Call after every Jinja extension is registered, since precompiled
+    templates are compiled with the extensions present at that point.
+
+    Args:
+        app: Flask application
+        precompile_templates: Override TEMPLATE_PRECOMPILE
+    """
+    if TEMPLATES_AUTO_RELOAD is not None:
+        app.config["TEMPLATES_AUTO_RELOAD"] = TEMPLATES_AUTO_RELOAD.lower() == "true"
+    auto_reload = app.config["TEMPLATES_AUTO_RELOAD"]
+    app.jinja_env.auto_reload = app.debug if auto_reload is None else auto_reload
+    app.jinja_env.bytecode_cache = bytecode_cache()
+
+    if TEMPLATE_PRECOMPILE if precompile_templates is None else precompile_templates:
+        precompile(app)
+
+    @app.cli.command("precompile-templates")
+    def precompile_templates_command():
+        """Compile all templates into TEMPLATE_CACHE_DIR"""
+        start = time.perf_counter()
+        compiled, failed = precompile(app)
+        click.echo(f"Compiled {compiled} templates into {TEMPLATE_CACHE_DIR} in {time.perf_counter() - start:.2f}s")
+        for name, error in failed.items():
+            click.echo(f"  {name}: {error}", err=True)
@@ -0,0 +1,98 @@
+"""
+Fingerprinted assets: stable content hashes, manifest lookups and precompressed variants
+"""
+import gzip
+
+from flask import Flask
+import pytest
+
+import assets
+
+CSS = "body { color: #222; }\n" * 50
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / "static"
+    (static / "js").mkdir(parents=True)
+    (static / "style.css").write_text(CSS)
+    (static / "js" / "app.js").write_text("console.log('hi');\n" * 50)
+    (static / "notes.txt").write_text("not an asset")
+    return static
+
+
+@pytest.fixture
+def asset_app(static_dir, tmp_path, monkeypatch):
+    """A bare app serving /assets/ from a build of static_dir"""
+    output = str(tmp_path / "dist")
+    monkeypatch.setattr(assets, "ASSETS_DIR", output)
+    monkeypatch.setattr(assets, "_manifest", {})
+    monkeypatch.setattr(assets, "_fallback_versions", {})
+    app = Flask(__name__, static_folder=str(static_dir))
+    app.add_url_rule("/assets/<path:filename>", "asset", assets.serve_asset)
+    app.manifest = assets.build(str(static_dir), output)
+    assets.load_manifest(output)
+    return app
+
+
+def test_fingerprints_are_stable_and_follow_the_content(static_dir, tmp_path):
+    first = assets.build(str(static_dir), str(tmp_path / "a"))
+    again = assets.build(str(static_dir), str(tmp_path / "b"))
+    (static_dir / "style.css").write_text(CSS + "a { color: red; }\n")
+    changed = assets.build(str(static_dir), str(tmp_path / "a"))
+
+    assert first == again
+    assert sorted(first) == ["js/app.js", "style.css"]
+    assert first["style.css"] == f"style.{assets.file_hash(str(tmp_path / 'b' / first['style.css']))}.css"
+    assert changed["style.css"] != first["style.css"]
+    assert changed["js/app.js"] == first["js/app.js"]
+    assert not (tmp_path / "a" / first["style.css"]).exists()  # rebuilt from scratch
+
+
+def test_build_skips_the_output_directory(static_dir):
+    output = static_dir / "dist"
+
+    assets.build(str(static_dir), str(output))
+    manifest = assets.build(str(static_dir), str(output))
+
+    assert sorted(manifest) == ["js/app.js", "style.css"]
+
+
+def test_asset_url_uses_the_manifest_then_falls_back_to_a_versioned_static_url(asset_app):
+    with asset_app.test_request_context():
+        assert assets.asset_url("style.css") == f"/assets/{asset_app.manifest['style.css']}"
+
+        assets.load_manifest("/nonexistent")
+        digest = assets.file_hash(asset_app.static_folder + "/style.css")
+        assert assets.asset_url("style.css") == f"/static/style.css?v={digest}"
+        assert assets.asset_url("missing.css") == "/static/missing.css"
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("identity", None),
+])
+def test_serve_asset_picks_the_encoding_from_accept_encoding(asset_app, accept, encoding):
+    built = asset_app.manifest["style.css"]
+    with open(f"{assets.ASSETS_DIR}/{built}.br", "wb") as f:
+        f.write(b"br-bytes")  # stands in for the brotli build when the package is missing
+
+    response = asset_app.test_client().get(f"/assets/{built}", headers={"Accept-Encoding": accept})
+
+    assert response.status_code == 200
+    assert response.content_encoding == encoding
+    assert response.mimetype == "text/css"
+    assert "Accept-Encoding" in response.vary
+    assert response.cache_control.immutable and response.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    body = response.get_data()
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    assert body == (b"br-bytes" if encoding == "br" else CSS.encode())
+
+
+def test_only_built_assets_are_served(asset_app):
+    client = asset_app.test_client()
+
+    assert client.get("/assets/manifest.json").status_code == 404
+    assert client.get("/assets/style.css").status_code == 404
@@ -0,0 +1,73 @@
+"""
+Benchmark harness: percentile summaries and the regression check against a baseline
+"""
+import pytest
+
+from benchmarks.harness import compare_results, percentile, summarize
+
+
+def test_percentile_of_no_samples_is_none():
+    assert percentile([], 50) is None
+    assert percentile([], 99) is None
+
+
+@pytest.mark.parametrize("pct", [0, 1, 50, 95, 99, 100])
+def test_percentile_of_a_single_sample_is_that_sample(pct):
+    assert percentile([0.25], pct) == 0.25
+
+
+def test_percentile_uses_the_nearest_rank():
+    samples = list(range(1, 21))  # 1..20
+
+    assert percentile(samples, 50) == 10
+    assert percentile(samples, 95) == 19
+    assert percentile(samples, 99) == 20
+    assert percentile(samples, 100) == 20
+
+
+def test_summary_of_no_samples_has_no_latencies():
+    assert summarize([]) == {
+        "count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None,
+        "p99_ms": None, "max_ms": None, "throughput_per_s": None,
+    }
+
+
+def test_summary_of_a_single_sample():
+    summary = summarize([0.002], elapsed=0.004)
+
+    assert summary["count"] == 1
+    assert summary["mean_ms"] == summary["p50_ms"] == summary["p99_ms"] == summary["max_ms"] == 2.0
+    assert summary["throughput_per_s"] == 250.0
+
+
+def results(**p95):
+    return {"latency": {name: {"p95_ms": value} for name, value in p95.items()}}
+
+
+def test_compare_flags_only_growth_past_the_threshold():
+    baseline = results(index=10.0, history=10.0, log=10.0)
+    current = results(index=12.0, history=12.01, log=5.0)
+
+    lines, regressions = compare_results(current, baseline, threshold=1.2)
+
+    assert regressions == ["history"]
+    assert [line.endswith("REGRESSION") for line in lines] == [True, False, False]
+    assert "10.000 -> 12.010 (1.20x)" in lines[0]
+
+
+def test_compare_threshold_is_configurable():
+    baseline = results(index=10.0)
+    current = results(index=11.0)
+
+    assert compare_results(current, baseline, threshold=1.2)[1] == []
+    assert compare_results(current, baseline, threshold=1.05)[1] == ["index"]
+
+
+def test_compare_without_a_baseline_value_is_not_a_regression():
+    baseline = {"latency": {"index": {"p95_ms": 0}, "history": {"p95_ms": None}}}
+    current = results(index=50.0, history=50.0, new_route=50.0)
+
+    lines, regressions = compare_results(current, baseline)
+
+    assert regressions == []
+    assert all(line.endswith("(no baseline)") for line in lines)
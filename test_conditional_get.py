@@ -0,0 +1,95 @@
+"""
+Conditional GET: pages answer 304 until a writer changes the data they render
+"""
+import pytest
+
+from conftest import USER_A, USER_B, sign_in
+
+PER_USER_PAGES = ("/", "/history", "/analytics")
+
+CHECKIN = {"stress": "low", "sleep_hours": "8", "energy": "high"}
+
+# Every route that writes the session user's records, with a valid request
+WRITERS = {
+    "log_today": ("/log", {"data": CHECKIN}),
+    "medical": ("/medical", {"data": {"type": "medication", "name": "Vitamin D"}}),
+    "nutrition": ("/nutrition", {"data": {"name": "Oats", "calories": "300"}}),
+    "log_water": ("/api/log-water", {}),
+    "goals": ("/goals", {"data": {"title": "Swim", "target": "10"}}),
+    "profile": ("/profile", {"data": {"name": "Anna", "age": "31", "height": "170", "weight": "60"}}),
+    "sync_fitness": ("/api/sync-fitness", {}),
+    "settings": ("/settings", {"data": {}}),
+    "delete_item": ("/api/delete-item", {"json": {"type": "goal", "id": "goal-a"}}),
+    "update_goal_progress": ("/api/update-goal-progress", {"json": {"id": "goal-a", "increment": 5}}),
+    "log_mood": ("/api/log-mood", {"json": {"mood": "calm"}}),
+    "api_logs": ("/api/logs", {"json": {"user_id": USER_A, "date": "2026-02-01", "sleep_hours": 7}}),
+}
+
+
+def etags(client, paths):
+    """Current ETag of each page, checking that it validates"""
+    tags = {}
+    for path in paths:
+        response = client.get(path)
+        assert response.status_code == 200, path
+        tags[path] = response.headers["ETag"]
+        assert client.get(path, headers={"If-None-Match": tags[path]}).status_code == 304, path
+    return tags
+
+
+def post(client, path, kwargs):
+    response = client.post(path, **kwargs)
+    assert response.status_code in (200, 302), (path, response.status_code)
+    with client.session_transaction() as session:
+        session.pop("_flashes", None)
+
+
+def assert_changed(client, before):
+    for path, etag in before.items():
+        response = client.get(path, headers={"If-None-Match": etag})
+        assert response.status_code == 200, path
+        assert response.headers["ETag"] != etag, path
+
+
+@pytest.mark.parametrize("writer", sorted(WRITERS))
+def test_writer_invalidates_the_users_pages(app_client, writer):
+    sign_in(app_client, USER_A)
+    before = etags(app_client, PER_USER_PAGES)
+
+    path, kwargs = WRITERS[writer]
+    post(app_client, path, kwargs)
+
+    assert_changed(app_client, before)
+
+
+def test_other_users_writes_keep_the_page_valid(app_client):
+    sign_in(app_client, USER_A)
+    before = etags(app_client, ("/history",))
+
+    sign_in(app_client, USER_B)
+    post(app_client, "/nutrition", {"data": {"name": "Rice", "calories": "200"}})
+
+    sign_in(app_client, USER_A)
+    assert app_client.get("/history", headers={"If-None-Match": before["/history"]}).status_code == 304
+
+
+def test_registration_invalidates_the_leaderboard(app_client):
+    sign_in(app_client, USER_A)
+    before = etags(app_client, ("/",))
+
+    other = app_client.application.test_client()
+    other.post("/register", data={
+        "name": "Cleo", "email": "cleo@example.com", "password": "secret1", "confirm_password": "secret1",
+        "age": "30", "height": "165", "weight": "58", "activity_level": "moderate", "goal": "improve_fitness",
+    })
+
+    assert_changed(app_client, before)
+
+
+def test_shared_lists_change_with_any_users_write(app_client):
+    before = etags(app_client, ("/api/logs", "/api/decisions"))
+
+    sign_in(app_client, USER_B)
+    post(app_client, "/log", WRITERS["log_today"][1])
+
+    assert_changed(app_client, before)
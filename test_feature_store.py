@@ -0,0 +1,130 @@
+"""
+Rolling per-user feature store: windows match a full rescan of the logs
+"""
+from datetime import date, timedelta
+import random
+
+import pytest
+
+from agents.feature_store import FeatureStore, RECENT_LOGS, STRESS_MAP, WINDOWS
+
+TODAY = date(2026, 3, 31)
+
+
+def make_logs(count=120, users=("u1", "u2"), seed=3):
+    rng = random.Random(seed)
+    logs = []
+    for i in range(count):
+        logs.append({
+            "user_id": users[i % len(users)],
+            "date": (TODAY - timedelta(days=count // len(users) - i // len(users))).isoformat(),
+            "sleep_hours": round(rng.uniform(4, 9), 1),
+            "stress_level": rng.choice(list(STRESS_MAP)),
+            "missed_workout": rng.random() < 0.3,
+        })
+    return logs
+
+
+def rescan(logs, user_id, days):
+    """Reference: the window computed from scratch"""
+    cutoff = TODAY.toordinal() - days
+    window = [log for log in logs if log["user_id"] == user_id and date.fromisoformat(log["date"]).toordinal() > cutoff]
+    if not window:
+        return {"count": 0, "sleep_avg": None, "stress_avg": None, "missed": 0}
+    return {
+        "count": len(window),
+        "sleep_avg": sum(log["sleep_hours"] for log in window) / len(window),
+        "stress_avg": sum(STRESS_MAP[log["stress_level"]] for log in window) / len(window),
+        "missed": sum(1 for log in window if log["missed_workout"]),
+    }
+
+
+def assert_matches_rescan(store, logs, user_id):
+    features = store.features(user_id, as_of=TODAY)
+    for days in WINDOWS:
+        expected = rescan(logs, user_id, days)
+        assert features[f"count_{days}"] == expected["count"]
+        assert features[f"missed_{days}"] == expected["missed"]
+        assert features[f"sleep_avg_{days}"] == pytest.approx(expected["sleep_avg"])
+        assert features[f"stress_avg_{days}"] == pytest.approx(expected["stress_avg"])
+
+
+def test_windows_match_a_rescan():
+    logs = make_logs()
+    store = FeatureStore()
+    store.load(logs)
+
+    for user_id in ("u1", "u2"):
+        assert_matches_rescan(store, logs, user_id)
+
+
+def test_incremental_sync_matches_a_full_load():
+    logs = make_logs()
+    store = FeatureStore()
+    store.sync(logs[:50])
+    store.sync(logs[:90])
+    store.record(logs[90])
+    store.sync(logs)
+
+    assert_matches_rescan(store, logs, "u1")
+    assert_matches_rescan(store, logs, "u2")
+
+
+def test_shorter_log_list_rebuilds():
+    logs = make_logs()
+    store = FeatureStore()
+    store.sync(logs)
+    store.sync(logs[:40])
+
+    assert_matches_rescan(store, logs[:40], "u1")
+
+
+def test_sync_user_keeps_other_users():
+    logs = make_logs()
+    store = FeatureStore()
+    store.sync(logs)
+    u1 = [log for log in logs if log["user_id"] == "u1"]
+
+    store.sync_user("u1", u1[:10])
+
+    assert_matches_rescan(store, u1[:10], "u1")
+    assert_matches_rescan(store, logs, "u2")
+
+
+def test_recent_logs_are_bounded():
+    logs = make_logs()
+    store = FeatureStore()
+    store.load(logs)
+
+    recent = store.recent_logs("u1")
+    assert len(recent) == RECENT_LOGS
+    assert recent == [log for log in logs if log["user_id"] == "u1"][-RECENT_LOGS:]
+    assert store.recent_logs("nobody") == []
+
+
+def test_backdated_log_is_evicted_like_a_full_load():
+    logs = make_logs()
+    u1 = [log for log in logs if log["user_id"] == "u1"]
+    store = FeatureStore()
+    store.sync_user("u1", u1)
+    backdated = dict(u1[-1], date=(TODAY - timedelta(days=10)).isoformat(), missed_workout=True)
+
+    store.sync_user("u1", u1 + [backdated])
+
+    fresh = FeatureStore()
+    fresh.load(u1 + [backdated])
+    assert store.features("u1", as_of=TODAY) == fresh.features("u1", as_of=TODAY)
+    assert_matches_rescan(store, u1 + [backdated], "u1")
+    assert store.recent_logs("u1") == fresh.recent_logs("u1")
+
+
+def test_reordered_log_list_rebuilds():
+    logs = make_logs()
+    store = FeatureStore()
+    store.sync(logs[:-1])
+
+    # e.g. Supabase reads, newest first, after one more check-in
+    store.sync(list(reversed(logs)))
+
+    assert_matches_rescan(store, logs, "u1")
+    assert_matches_rescan(store, logs, "u2")
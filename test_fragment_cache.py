@@ -0,0 +1,81 @@
+"""
+Per-user fragment cache: LRU bounds, per-user invalidation and the {% cache %} tag
+"""
+from jinja2 import Environment
+import pytest
+
+import fragment_cache
+from conftest import USER_A, sign_in
+from fragment_cache import FragmentCache, FragmentCacheExtension
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FragmentCache(max_bytes=1024 * 1024)
+    monkeypatch.setattr(fragment_cache, "_cache", cache)
+    return cache
+
+
+def render(source, **context):
+    return Environment(extensions=[FragmentCacheExtension]).from_string(source).render(**context)
+
+
+def test_lru_is_bounded_by_size():
+    cache = FragmentCache(max_bytes=10)
+    cache.set(("u1", 1, "a"), "xxxx")
+    cache.set(("u1", 1, "b"), "yyyy")
+    cache.get(("u1", 1, "a"))
+    cache.set(("u2", 1, "c"), "zzzz")
+
+    assert cache.get(("u1", 1, "b")) is None
+    assert cache.get(("u1", 1, "a")) == "xxxx"
+    assert cache.stats()["bytes"] == 8
+
+    cache.set(("u2", 1, "big"), "x" * 11)
+    assert cache.get(("u2", 1, "big")) is None
+
+
+def test_invalidate_user_drops_only_that_user():
+    cache = FragmentCache()
+    cache.set(("u1", 1, "a"), "one")
+    cache.set(("u2", 1, "a"), "two")
+
+    cache.invalidate_user("u1")
+
+    assert cache.get(("u1", 1, "a")) is None
+    assert cache.get(("u2", 1, "a")) == "two"
+    assert cache.stats()["bytes"] == 3
+
+
+def test_tag_serves_the_cached_fragment_until_the_scope_changes(cache):
+    source = "{% cache 'box' %}<b>{{ value }}</b>{% endcache %}"
+
+    assert render(source, value=1, fragment_key=("u1", "v1")) == "<b>1</b>"
+    assert render(source, value=2, fragment_key=("u1", "v1")) == "<b>1</b>"
+    assert render(source, value=3, fragment_key=("u1", "v2")) == "<b>3</b>"
+    assert render(source, value=4, fragment_key=("u2", "v1")) == "<b>4</b>"
+    assert render(source, value=5) == "<b>5</b>"
+
+
+def test_cached_fragment_is_not_escaped_again(cache):
+    source = "{% cache 'box' %}{{ value }}{% endcache %}"
+    env = Environment(extensions=[FragmentCacheExtension], autoescape=True)
+
+    first = env.from_string(source).render(value="<i>", fragment_key=("u1", "v1"))
+    second = env.from_string(source).render(value="other", fragment_key=("u1", "v1"))
+
+    assert first == second == "&lt;i&gt;"
+
+
+def test_dashboard_fragments_are_rebuilt_after_a_write(app_client, cache):
+    sign_in(app_client, USER_A)
+    app_client.get("/")
+    entries = cache.stats()["entries"]
+    assert entries > 0
+
+    app_client.get("/")
+    hits = cache.stats()["hits"]
+    assert hits >= entries
+
+    app_client.post("/nutrition", data={"name": "Oats", "calories": "300"})
+    assert cache.stats()["entries"] == 0
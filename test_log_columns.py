@@ -0,0 +1,176 @@
+"""
+LogTable and LogRow: the columnar daily logs behave like the list of dicts they replace
+"""
+from datetime import date, timedelta
+import json
+import random
+
+import pytest
+
+from conftest import stored
+from log_columns import LEVELS, LogRow, LogTable, UserLogs
+
+TODAY = date(2026, 3, 31)
+
+
+def make_logs(count=60, seed=11):
+    rng = random.Random(seed)
+    logs = []
+    for i in range(count):
+        log = {
+            "user_id": rng.choice(["u1", "u2", "u3"]),
+            "date": (TODAY - timedelta(days=rng.randrange(45))).isoformat(),
+            "sleep_hours": rng.choice([round(rng.uniform(4, 9), 1), None]),
+            "stress_level": rng.choice(LEVELS),
+            "missed_workout": rng.random() < 0.3,
+        }
+        if rng.random() < 0.8:
+            log["energy_level"] = rng.choice(LEVELS)
+        logs.append(log)
+    return logs
+
+
+def reference_summary(logs, today=TODAY):
+    """The per-dict KPI computation that summary() replaced"""
+    week_ago = (today - timedelta(days=7)).isoformat()
+    month_ago = (today - timedelta(days=30)).isoformat()
+    total = len(logs)
+    workouts = sum(1 for log in logs if not log.get("missed_workout"))
+    week = [log for log in logs if log.get("date", "") >= week_ago]
+    week_sleep = [log.get("sleep_hours") or 0 for log in week]
+    all_sleep = [log.get("sleep_hours", 0) for log in logs if log.get("sleep_hours")]
+    distribution = {}
+    for log in reversed(logs):
+        level = log.get("energy_level", "unknown")
+        distribution[level] = distribution.get(level, 0) + 1
+    streak = 0
+    for log in sorted(reversed(logs), key=lambda log: log.get("date", ""), reverse=True):
+        if log.get("missed_workout"):
+            break
+        streak += 1
+    return {
+        "total_logs": total,
+        "total_workouts": workouts,
+        "total_missed": total - workouts,
+        "consistency_rate": (workouts / total * 100) if total else 0,
+        "week_workouts": sum(1 for log in week if not log.get("missed_workout")),
+        "week_avg_sleep": (sum(week_sleep) / len(week_sleep)) if week_sleep else None,
+        "month_workouts": sum(1 for log in logs if log.get("date", "") >= month_ago and not log.get("missed_workout")),
+        "overall_avg_sleep": (sum(all_sleep) / len(all_sleep)) if all_sleep else None,
+        "activity_distribution": distribution,
+        "current_streak": streak,
+    }
+
+
+def test_table_behaves_like_the_list_of_dicts():
+    logs = make_logs()
+    table = LogTable(logs)
+
+    assert len(table) == len(logs)
+    assert [dict(row) for row in table] == logs
+    assert [dict(row) for row in reversed(table)] == logs[::-1]
+    assert dict(table[-1]) == logs[-1]
+    assert [dict(row) for row in table[5:10]] == logs[5:10]
+    assert table.to_records() == logs
+
+
+def test_row_reads_like_a_dict():
+    row = LogTable([{"user_id": "u1", "date": "2026-01-01", "sleep_hours": None, "custom": "x"}])[0]
+
+    assert isinstance(row, LogRow)
+    assert row["sleep_hours"] is None
+    assert row.get("mood", "none") == "none"
+    assert "custom" in row and "mood" not in row
+    assert len(row) == 4
+    assert set(row) == {"user_id", "date", "sleep_hours", "custom"}
+    with pytest.raises(KeyError):
+        row["mood"]
+
+
+def test_row_writes_go_through_to_the_table():
+    table = LogTable([{"user_id": "u1", "date": "2026-01-01", "mood": "happy"}])
+    row = table[0]
+
+    row["mood"] = "Great"
+    row["sleep_hours"] = 7
+    row["sleep_hours"] = 7.5
+    row["note_count"] = 2
+    del row["date"]
+
+    assert dict(table[0]) == {"user_id": "u1", "mood": "Great", "sleep_hours": 7.5, "note_count": 2}
+    assert type(table[0]["sleep_hours"]) is float
+    with pytest.raises(KeyError):
+        del row["date"]
+
+
+def test_values_that_do_not_fit_a_column_keep_their_type():
+    row = LogTable([{"user_id": "u1", "sleep_hours": 8, "mood": "elated", "missed_workout": 0, "date": "2026-1-1"}])[0]
+
+    assert row["sleep_hours"] == 8 and type(row["sleep_hours"]) is int
+    assert row["mood"] == "elated"
+    assert row["missed_workout"] == 0 and type(row["missed_workout"]) is int
+    assert row["date"] == "2026-1-1"
+
+
+def test_for_user_keeps_each_users_write_order():
+    logs = make_logs()
+    table = LogTable(logs)
+
+    for user_id in ("u1", "u2", "u3"):
+        assert [dict(row) for row in table.for_user(user_id).rows()] == [log for log in logs if log["user_id"] == user_id]
+    assert len(table.for_user("nobody")) == 0
+    assert isinstance(table.for_user(["unhashable"]), UserLogs)
+
+
+def test_appends_are_visible_through_for_user():
+    table = LogTable(make_logs(10))
+    before = len(table.for_user("u1"))
+
+    table.append({"user_id": "u1", "date": TODAY.isoformat(), "missed_workout": False})
+
+    assert len(table.for_user("u1")) == before + 1
+    assert dict(table[-1]) == {"user_id": "u1", "date": TODAY.isoformat(), "missed_workout": False}
+
+
+def test_append_rejects_records_that_are_not_mappings():
+    table = LogTable()
+
+    for record in ([{"user_id": "u1"}], "u1", 3):
+        with pytest.raises(TypeError):
+            table.append(record)
+    assert len(table) == 0
+
+
+@pytest.mark.parametrize("body", [[{"user_id": "u1", "date": "2026-02-01"}], "log", 3])
+def test_api_answers_400_for_a_log_that_is_not_an_object(app_client, body):
+    before = len(stored(app_client)["daily_logs"])
+
+    response = app_client.post("/api/logs", json=body)
+
+    assert response.status_code == 400
+    assert len(stored(app_client)["daily_logs"]) == before
+
+
+def test_from_users_orders_rows_by_date():
+    logs = make_logs()
+    table = LogTable(logs)
+
+    combined = LogTable.from_users(table.users())
+
+    canonical = lambda log: json.dumps(dict(log), sort_keys=True)
+    assert sorted(map(canonical, combined)) == sorted(map(canonical, logs))
+    dates = [row["date"] for row in combined]
+    assert dates == sorted(dates)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_summary_matches_the_per_dict_computation(seed):
+    logs = make_logs(seed=seed)
+    table = LogTable(logs)
+
+    for user_id in ("u1", "u2", "u3"):
+        user_logs = [log for log in logs if log["user_id"] == user_id]
+        summary = table.for_user(user_id).summary(TODAY)
+        expected = reference_summary(user_logs)
+        assert summary.pop("activity_distribution") == expected.pop("activity_distribution")
+        assert summary == pytest.approx(expected)
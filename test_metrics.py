@@ -0,0 +1,88 @@
+"""
+Request/stage metrics: histogram buckets and the /metrics text exposition
+"""
+from flask import Flask
+import pytest
+
+import metrics
+from agents import telemetry
+from metrics import Counter, Histogram
+
+
+def test_histogram_counts_each_observation_in_its_bucket():
+    histogram = Histogram("latency_seconds", "Latency", ("endpoint",), buckets=(0.01, 0.1, 1.0))
+
+    for seconds in (0.003, 0.01, 0.02, 0.3, 20):
+        histogram.observe(("home",), seconds)
+
+    counts, total, n = histogram.snapshot()[("home",)]
+    # a bound is inclusive (le), the last slot is +Inf
+    assert counts == [2, 1, 1, 1]
+    assert total == pytest.approx(20.333)
+    assert n == 5
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("latency_seconds", "Latency", ("endpoint", "method"), buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.003, 0.02, 0.02, 5):
+        histogram.observe(("home", "GET"), seconds)
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{endpoint="home",method="GET",le="0.01"} 1',
+        'latency_seconds_bucket{endpoint="home",method="GET",le="0.1"} 3',
+        'latency_seconds_bucket{endpoint="home",method="GET",le="1.0"} 3',
+        'latency_seconds_bucket{endpoint="home",method="GET",le="+Inf"} 4',
+        'latency_seconds_sum{endpoint="home",method="GET"} 5.043',
+        'latency_seconds_count{endpoint="home",method="GET"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("requests_total", "Requests", ("endpoint",))
+    counter.inc(('say "hi"\\\n',))
+    counter.inc(('say "hi"\\\n',), 2)
+
+    assert counter.render()[-1] == 'requests_total{endpoint="say \\"hi\\"\\\\\\n"} 3'
+
+
+@pytest.fixture
+def metrics_app(monkeypatch):
+    """A bare app with metrics enabled, on fresh request metrics"""
+    monkeypatch.setattr(metrics, "REQUEST_LATENCY", Histogram("flask_request_duration_seconds", "Latency", ("endpoint", "method")))
+    monkeypatch.setattr(metrics, "REQUESTS", Counter("flask_requests_total", "Requests", ("endpoint", "method", "status")))
+    app = Flask(__name__)
+
+    @app.route("/hello")
+    def hello():
+        return "hi"
+
+    assert metrics.init_app(app, enabled=True)
+    yield app
+    telemetry.remove_observer(metrics.observe_stage)
+
+
+def test_metrics_endpoint_reports_requests_but_not_itself(metrics_app):
+    client = metrics_app.test_client()
+    client.get("/hello")
+    client.get("/hello")
+    client.get("/missing")
+    client.get("/metrics")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'flask_request_duration_seconds_bucket{endpoint="hello",method="GET",le="+Inf"} 2' in text
+    assert 'flask_requests_total{endpoint="hello",method="GET",status="200"} 2' in text
+    assert 'flask_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in text
+    assert 'endpoint="metrics"' not in text
+
+
+def test_disabled_metrics_register_nothing():
+    app = Flask(__name__)
+
+    assert metrics.init_app(app, enabled=False) is False
+    assert app.test_client().get("/metrics").status_code == 404
@@ -0,0 +1,81 @@
+"""
+Online workout-completion learning: outcome queue, warm-up and checkpoints
+"""
+import random
+
+import pytest
+
+from agents import ml_predictor
+from agents.ml_predictor import FitnessPredictor, ONLINE_MIN_SAMPLES
+
+
+def outcomes(count, seed=7):
+    """Well-rested users complete their workout, short sleepers skip it"""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        sleep = rng.uniform(4, 9)
+        samples.append(([sleep, 1, 1, 0, sleep, 1, 0.5, 30, 3], sleep >= 6.5))
+    return samples
+
+
+@pytest.fixture
+def predictor(tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_predictor, "ONLINE_LEARNING", True)
+    return FitnessPredictor(model_path=str(tmp_path))
+
+
+def test_online_model_is_used_only_after_warm_up(predictor):
+    rested = [[8.5, 1, 1, 0, 8.5, 1, 0.5, 30, 3]]
+    assert predictor._online_workout_prob(rested) is None
+
+    predictor.learn_outcomes(outcomes(ONLINE_MIN_SAMPLES - 1))
+    assert predictor._online_workout_prob(rested) is None
+
+    predictor.learn_outcomes(outcomes(200, seed=8))
+    tired = [[4.5, 1, 1, 0, 4.5, 1, 0.5, 30, 3]]
+    assert predictor._online_workout_prob(rested) > 0.5 > predictor._online_workout_prob(tired)
+
+
+def test_recorded_outcomes_are_applied_in_the_background(predictor):
+    for features, completed in outcomes(10):
+        assert predictor.record_outcome(features, completed)
+
+    predictor._online_queue.join()
+    assert predictor.online_samples == 10
+
+
+def test_outcomes_are_dropped_when_online_learning_is_off(predictor, monkeypatch):
+    monkeypatch.setattr(ml_predictor, "ONLINE_LEARNING", False)
+
+    assert not predictor.record_outcome([7, 1, 1, 0, 7, 1, 0.5, 30, 3], True)
+    assert predictor._online_queue.qsize() == 0
+
+
+def test_checkpoint_is_reloaded(predictor, tmp_path):
+    predictor.learn_outcomes(outcomes(60))
+    predictor.checkpoint_online_model()
+
+    reloaded = FitnessPredictor(model_path=str(tmp_path))
+
+    assert reloaded.online_samples == 60
+    features = [[8, 1, 1, 0, 8, 1, 0.5, 30, 3]]
+    assert reloaded._online_workout_prob(features) == pytest.approx(predictor._online_workout_prob(features))
+
+
+def test_checkin_labels_the_previous_prediction_once(monkeypatch):
+    import flask_app
+
+    recorded = []
+    monkeypatch.setattr(flask_app, "record_workout_outcome", lambda features, completed: recorded.append(completed) or True)
+    data = {"agent_decisions": [
+        {"user_id": "u1", "date": "2026-01-01", "ml_features": [1.0]},
+        {"user_id": "u1", "date": "2026-01-02", "ml_features": [2.0]},
+        {"user_id": "u2", "date": "2026-01-03", "ml_features": [3.0]},
+    ]}
+
+    flask_app.record_previous_outcome(data, "u1", completed=False)
+    flask_app.record_previous_outcome(data, "u1", completed=True)
+
+    assert recorded == [False]
+    assert [d.get("outcome_recorded") for d in data["agent_decisions"]] == [None, True, None]
@@ -0,0 +1,79 @@
+"""
+On-demand profiler: admin routes need the token, armed endpoints are profiled N times
+"""
+from flask import Flask
+import pytest
+
+import profiling
+
+TOKEN = "s3cret"
+
+
+def test_parse_armed():
+    assert profiling.parse_armed("index:10, log_today:5") == {"index": 10, "log_today": 5}
+    assert profiling.parse_armed("history") == {"history": 1}
+    assert profiling.parse_armed("index:999999") == {"index": profiling.MAX_REQUESTS}
+    assert profiling.parse_armed("") == {}
+
+
+def test_profiling_is_off_without_a_token():
+    app = Flask(__name__)
+
+    assert profiling.init_app(app, token="") is None
+    assert app.test_client().get("/admin/profile", headers={"X-Profile-Token": ""}).status_code == 404
+
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_REQUESTS", "")
+    app = Flask(__name__)
+
+    @app.route("/hello")
+    def hello():
+        return "hi"
+
+    app.profiler = profiling.init_app(app, token=TOKEN, memory=False)
+    return app
+
+
+@pytest.mark.parametrize("method, path", [
+    ("get", "/admin/profile"),
+    ("post", "/admin/profile/worker?seconds=1"),
+    ("post", "/admin/profile/requests?endpoint=hello"),
+    ("get", "/admin/profile/memory"),
+])
+@pytest.mark.parametrize("headers", [{}, {"X-Profile-Token": "wrong"}])
+def test_admin_routes_are_hidden_without_the_token(profiled_app, method, path, headers):
+    client = profiled_app.test_client()
+
+    response = getattr(client, method)(path, headers=headers)
+
+    assert response.status_code == 404
+    assert profiled_app.profiler.status() == {}
+
+
+def test_arming_profiles_the_next_requests_then_disarms(profiled_app, tmp_path):
+    client = profiled_app.test_client()
+    auth = {"X-Profile-Token": TOKEN}
+
+    response = client.post("/admin/profile/requests?endpoint=hello&count=2", headers=auth)
+    assert response.status_code == 202
+    assert response.get_json() == {"endpoint": "hello", "count": 2}
+    for _ in range(3):
+        assert client.get("/hello").data == b"hi"
+
+    status = client.get("/admin/profile", headers=auth).get_json()
+    session = status["armed"]["hello"]
+    assert (session["remaining"], session["profiled"]) == (0, 2)
+    assert status["files"] == [session["path"].rsplit("/", 1)[-1]]
+    assert (tmp_path / status["files"][0]).exists()
+
+
+def test_arming_an_unknown_endpoint_is_rejected(profiled_app):
+    response = profiled_app.test_client().post(
+        "/admin/profile/requests?endpoint=nope", headers={"X-Profile-Token": TOKEN}
+    )
+
+    assert response.status_code == 400
+    assert profiled_app.profiler.status() == {}
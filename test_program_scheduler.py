@@ -0,0 +1,92 @@
+"""
+Periodized program scheduler: progression, deload weeks, adherence scaling and the batch run
+"""
+from datetime import date
+import os
+
+import pytest
+
+from agents.program_scheduler import (
+    DELOAD_EVERY, REDUCED_TRAINING_DAYS, TRAINING_DAYS, adherence_rate, build_schedule, load_schedules,
+    progression_rate, save_schedules, schedule_all_users, scheduled_day,
+)
+
+START = date(2026, 3, 2)
+
+
+def block(schedule, week, name):
+    day = schedule["weeks"][week - 1]["days"][0]
+    return next(b for b in day["workouts"] if b["name"] == name)
+
+
+@pytest.mark.parametrize("missed, rate", [
+    ([], 1.0),
+    ([False] * 9 + [True], 1.0),
+    ([False, True] * 5, 0.5),
+    ([True] * 8 + [False] * 2, 0.0),
+])
+def test_progression_follows_adherence(missed, rate):
+    assert progression_rate(adherence_rate(missed)) == rate
+
+
+def test_adherence_uses_only_the_recent_window():
+    assert adherence_rate([]) is None
+    assert adherence_rate([True] * 100 + [False] * 28) == 1.0
+
+
+def test_volume_progresses_until_the_deload_week():
+    schedule = build_schedule("u1", 5, "strength", start=START)
+
+    squats = [block(schedule, week, "Goblet Squats") for week in range(1, DELOAD_EVERY + 1)]
+    assert [s["reps"] for s in squats[:-1]] == [12, 14, 16]
+    assert [s["sets"] for s in squats[:-1]] == [4, 4, 5]
+    assert squats[-1]["deload"] and squats[-1]["sets"] < squats[0]["sets"]
+    assert [week["deload"] for week in schedule["weeks"]] == [False, False, False, True]
+    assert block(schedule, 3, "Plank Hold")["duration_sec"] > block(schedule, 1, "Plank Hold")["duration_sec"]
+
+
+def test_low_adherence_holds_the_template_on_fewer_days():
+    schedule = build_schedule("u1", 5, "strength", missed_flags=[True] * 10, start=START)
+
+    assert schedule["adherence"] == 0.0
+    assert [block(schedule, week, "Goblet Squats")["reps"] for week in (1, 2, 3)] == [12, 12, 12]
+    assert len(schedule["weeks"][0]["days"]) == len(REDUCED_TRAINING_DAYS)
+
+
+def test_days_and_scheduled_day_follow_the_start_date():
+    schedule = build_schedule("u1", 2, "cardio", weeks=2, start=START)
+
+    dates = [day["date"] for week in schedule["weeks"] for day in week["days"]]
+    assert len(dates) == 2 * len(TRAINING_DAYS) and dates[0] == START.isoformat()
+    assert scheduled_day(schedule, on=date(2026, 3, 3))["date"] == "2026-03-04"
+    assert scheduled_day(schedule, on=date(2026, 4, 1)) is None
+
+
+def test_batch_run_matches_in_process_and_pool():
+    profiles = [{"user_id": f"u{i}", "level": i % 10 + 1} for i in range(6)]
+    logs = [{"user_id": "u1", "date": f"2026-02-{day:02d}", "missed_workout": day % 2 == 0} for day in range(1, 21)]
+
+    def strip(result):
+        return {user: {p: dict(s, generated_at=None) for p, s in programs.items()} for user, programs in result.items()}
+
+    inline = schedule_all_users(profiles, logs, ("strength", "yoga"), workers=1, start=START)
+    pooled = schedule_all_users(profiles, logs, ("strength", "yoga"), workers=2, start=START)
+
+    assert strip(inline) == strip(pooled)
+    assert set(inline) == {profile["user_id"] for profile in profiles}
+    assert inline["u1"]["strength"]["adherence"] == 0.5
+
+
+def test_saved_schedules_are_read_per_user(tmp_path):
+    directory = str(tmp_path / "schedules")
+    first = schedule_all_users([{"user_id": "u1", "level": 3}, {"user_id": "../u2", "level": 7}],
+                               [], ("hiit",), workers=1, start=START)
+    save_schedules(first, directory)
+
+    assert load_schedules(directory, "u1") == first["u1"]
+    assert load_schedules(directory, "../u2") == first["../u2"]
+    assert load_schedules(directory, "nobody") == {}
+
+    save_schedules({"u1": first["u1"]}, directory)
+    assert load_schedules(directory, "../u2") == {}
+    assert sorted(os.listdir(directory)) == ["u1.json"]
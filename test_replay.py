@@ -0,0 +1,57 @@
+"""
+Agent console replay: signal parsing, task history and the scoped stub LLM
+"""
+import threading
+
+from agents import recommendation_agent
+from agents.replay import StubLLM, build_tasks, load_signals, replay
+
+CSV = b"""user_id,date,stress,energy,sleep,missed
+u1,2026-01-01,high,low,5,true
+u1,2026-01-02,low,high,8,false
+u2,2026-01-01,medium,medium,7,yes
+u1,2026-01-03,medium,medium,6.5,0
+"""
+
+
+def test_signals_and_histories():
+    signals = load_signals(CSV, "signals.csv")
+    tasks = build_tasks(signals)
+
+    assert [s["missed_workout"] for s in signals] == [True, False, True, False]
+    assert [t["user_state"]["missed_days"] for t in tasks] == [0, 1, 0, 1]
+    assert len(tasks[3]["recent_logs"]) == 2
+    assert load_signals('{"user_id": "u9", "stress_level": "low"}\n', "x.ndjson")[0]["history"] == "u9"
+
+
+def test_threads_replay_does_not_touch_the_process_backend():
+    configured = StubLLM()
+    recommendation_agent.set_llm_backend(configured)
+    seen = []
+    stop = threading.Event()
+
+    def other_session():
+        while not stop.is_set():
+            seen.append(recommendation_agent.current_llm_backend())
+
+    watcher = threading.Thread(target=other_session)
+    watcher.start()
+    try:
+        results, _ = replay(build_tasks(load_signals(CSV, "s.csv")), workers=2, stub_latency_ms=1)
+    finally:
+        stop.set()
+        watcher.join()
+        recommendation_agent.set_llm_backend(None)
+
+    assert len(results) == 4 and not any(r["error"] for r in results)
+    assert seen and all(backend is configured for backend in seen)
+
+
+def test_scoped_backend_overrides_and_restores():
+    stub = StubLLM()
+    assert recommendation_agent.current_llm_backend() is None
+
+    with recommendation_agent.llm_backend(stub):
+        assert recommendation_agent.current_llm_backend() is stub
+
+    assert recommendation_agent.current_llm_backend() is None
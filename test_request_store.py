@@ -0,0 +1,67 @@
+"""
+Per-request unit of work: one store read and at most one write per request
+"""
+import pytest
+
+import flask_app
+from conftest import USER_A, sign_in, stored
+
+
+@pytest.fixture
+def store_calls(app_client, monkeypatch):
+    """Counts of read_data/write_data calls made while serving requests"""
+    calls = {"read": 0, "write": 0}
+    read_data, write_data = flask_app.read_data, flask_app.write_data
+
+    def counted_read(*args, **kwargs):
+        calls["read"] += 1
+        return read_data(*args, **kwargs)
+
+    def counted_write(*args, **kwargs):
+        calls["write"] += 1
+        return write_data(*args, **kwargs)
+
+    monkeypatch.setattr(flask_app, "read_data", counted_read)
+    monkeypatch.setattr(flask_app, "write_data", counted_write)
+    return calls
+
+
+def test_page_reads_the_store_once_and_does_not_write(app_client, store_calls):
+    sign_in(app_client, USER_A)
+
+    assert app_client.get("/").status_code == 200
+
+    assert store_calls == {"read": 1, "write": 0}
+
+
+def test_checkin_is_one_write(app_client, store_calls):
+    sign_in(app_client, USER_A)
+
+    response = app_client.post("/log", data={"stress": "low", "sleep_hours": "8", "energy": "high"})
+
+    assert response.status_code == 302
+    # the unlocked read the plan is made on, and the locked one the check-in is written on
+    assert store_calls == {"read": 2, "write": 1}
+    data = stored(app_client)
+    assert len(data["daily_logs"].for_user(USER_A)) == 6
+    assert sum(1 for d in data["agent_decisions"] if d["user_id"] == USER_A) == 2
+
+
+def test_rejected_write_leaves_the_store_untouched(app_client, store_calls):
+    sign_in(app_client, USER_A)
+
+    response = app_client.post("/api/delete-item", json={"type": "meal", "id": "missing"})
+
+    assert response.status_code == 404
+    assert store_calls["write"] == 0
+
+
+def test_changes_are_visible_to_the_rest_of_the_request(app_client):
+    with flask_app.app.test_request_context("/"):
+        flask_app.session["user_id"] = USER_A
+        data = flask_app.request_data()
+        data["meals"].append({"id": "m1", "user_id": USER_A, "name": "Soup"})
+        flask_app.mark_dirty("meals")
+        assert flask_app.request_data() is data
+        assert flask_app.g.store_dirty == {"meals", "data_versions"}
+        assert stored(app_client)["meals"] == []
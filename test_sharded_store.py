@@ -0,0 +1,147 @@
+"""
+Sharded store: read/write scope of requests and split/merge round trips
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+import storage
+from conftest import SETTINGS_USER, USER_A, USER_B, sample_store, sign_in, stored
+from log_columns import LogTable
+
+
+def checkin_counts(client, user_id):
+    data = stored(client)
+    logs = [log for log in data["daily_logs"] if log["user_id"] == user_id]
+    decisions = [d for d in data["agent_decisions"] if d.get("user_id") == user_id]
+    return len(logs), len(decisions)
+
+
+def test_split_and_merge_round_trip():
+    data = storage.decode_store(storage.encode_store(sample_store()))
+    data["data_versions"] = {"user_profiles": 5.0, f"user:{USER_A}": 7.0, "daily_logs": 3.0}
+    index, shards = storage.split_store(data)
+
+    assert set(shards) == {USER_A, USER_B, SETTINGS_USER}
+    assert "daily_logs" not in index
+    assert f"user:{USER_A}" not in index["data_versions"]
+    assert shards[USER_A]["data_versions"][f"user:{USER_A}"] == 7.0
+
+    merged = storage.merge_shards(index, list(shards.values()))
+    assert sorted(map(dict, merged["daily_logs"]), key=lambda r: (r["user_id"], r["date"])) == \
+        sorted(map(dict, data["daily_logs"]), key=lambda r: (r["user_id"], r["date"]))
+    assert merged["personal_goals"] == data["personal_goals"]
+    assert merged["data_versions"] == data["data_versions"]
+
+
+def test_load_sharded_reads_only_the_requested_users(tmp_path):
+    storage.dump_sharded(sample_store(), str(tmp_path))
+
+    data = storage.load_sharded(str(tmp_path), (USER_B,))
+    assert {log["user_id"] for log in data["daily_logs"]} == {USER_B}
+    assert len(data["user_profiles"]) == 2
+
+    index_only = storage.load_sharded(str(tmp_path), ())
+    assert len(index_only["daily_logs"]) == 0
+
+
+def test_version_stamp_of_an_index_write_reaches_the_shard(tmp_path):
+    storage.dump_sharded(sample_store(), str(tmp_path))
+    data = storage.load_sharded(str(tmp_path), (USER_A,))
+    data["user_profiles"][0]["name"] = "Anna"
+    data["data_versions"][f"user:{USER_A}"] = 42.0
+
+    storage.dump_sharded(data, str(tmp_path), {"user_profiles", "data_versions"}, (USER_A,))
+
+    reloaded = storage.load_sharded(str(tmp_path), (USER_A,))
+    assert reloaded["data_versions"][f"user:{USER_A}"] == 42.0
+    assert reloaded["user_profiles"][0]["name"] == "Anna"
+    assert len(reloaded["daily_logs"]) == 5
+
+
+def test_dump_sharded_empties_the_shard_of_a_loaded_user(tmp_path):
+    storage.dump_sharded(sample_store(), str(tmp_path))
+    data = storage.load_sharded(str(tmp_path), (USER_B,))
+    data["daily_logs"] = LogTable()
+
+    storage.dump_sharded(data, str(tmp_path), {"daily_logs"}, (USER_B,))
+
+    everyone = storage.load_sharded(str(tmp_path))
+    assert {log["user_id"] for log in everyone["daily_logs"]} == {USER_A, SETTINGS_USER}
+
+
+def test_signed_out_checkin_is_saved(app_client):
+    before = checkin_counts(app_client, SETTINGS_USER)
+
+    response = app_client.post("/log", data={"stress": "low", "sleep_hours": "8", "energy": "high"})
+
+    assert response.status_code == 302
+    assert checkin_counts(app_client, SETTINGS_USER) == (before[0] + 1, before[1] + 1)
+    assert checkin_counts(app_client, USER_A) == (5, 1)
+
+
+def test_signed_out_api_log_for_a_user_is_saved(app_client):
+    payload = {"user_id": USER_B, "date": "2026-02-01", "stress_level": "low", "sleep_hours": 6}
+
+    response = app_client.post("/api/logs", json=payload)
+
+    assert response.status_code == 200
+    assert checkin_counts(app_client, USER_B)[0] == 4
+    assert checkin_counts(app_client, USER_A)[0] == 5
+
+
+def test_signed_in_checkin_touches_only_that_user(app_client):
+    sign_in(app_client, USER_B)
+
+    app_client.post("/log", data={"stress": "high", "sleep_hours": "5", "energy": "low", "missed": "on"})
+
+    assert checkin_counts(app_client, USER_B) == (4, 1)
+    assert checkin_counts(app_client, USER_A) == (5, 1)
+    profile = next(p for p in stored(app_client)["user_profiles"] if p["user_id"] == USER_B)
+    assert profile["total_logs"] == 1
+
+
+def test_profile_write_changes_the_etag_of_per_user_pages(app_client):
+    sign_in(app_client, USER_A)
+    first = app_client.get("/history")
+    etag = first.headers["ETag"]
+    assert app_client.get("/history", headers={"If-None-Match": etag}).status_code == 304
+
+    assert app_client.post("/api/sync-fitness").status_code == 200
+
+    again = app_client.get("/history", headers={"If-None-Match": etag})
+    assert again.status_code == 200
+    assert again.headers["ETag"] != etag
+
+
+def test_signed_out_request_reads_the_index_once(app_client, monkeypatch):
+    app_client.get("/")  # migrates to shards on the first start
+    reads = []
+    load_store = storage.load_store
+    monkeypatch.setattr(storage, "load_store", lambda path: reads.append(path) or load_store(path))
+
+    assert app_client.get("/").status_code == 200
+
+    assert sum(1 for path in reads if path.endswith(storage.INDEX_FILE)) == (1 if app_client.sharded else 0)
+
+
+def test_workers_starting_together_migrate_once(app_client, monkeypatch):
+    import flask_app
+
+    if not app_client.sharded:
+        pytest.skip("migration is for the sharded layout")
+    migrations = []
+    dump_sharded = storage.dump_sharded
+
+    def slow_dump(data, directory, *args, **kwargs):
+        migrations.append(directory)
+        time.sleep(0.2)
+        return dump_sharded(data, directory, *args, **kwargs)
+
+    monkeypatch.setattr(storage, "dump_sharded", slow_dump)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda _: flask_app.migrate_store(), range(3)))
+
+    assert migrations == [flask_app.SHARD_DIR]
+    assert checkin_counts(app_client, USER_A) == (5, 1)
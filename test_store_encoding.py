@@ -0,0 +1,87 @@
+"""
+Compact store encoding: every log reads back exactly as it was written
+"""
+import json
+
+import pytest
+
+import storage
+from conftest import sample_store
+
+# Values that do not fit their column and must survive through extras
+AWKWARD_LOGS = [
+    {"user_id": "u1", "date": "2026-01-05", "sleep_hours": 8, "stress_level": "low", "missed_workout": False},
+    {"user_id": "u1", "date": "2026-1-6", "mood": "ecstatic", "energy_level": "HIGH", "missed_workout": 1},
+    {"user_id": "u2", "date": "2026-01-06", "sleep_hours": None, "mood": None, "notes": "café ☕", "steps": 12000},
+    {"user_id": None, "date": None, "water_intake": "3", "custom": {"nested": [1, 2]}},
+    {"user_id": 42, "date": "2026-01-07", "heart_rate": 2 ** 70, "distance": 5.5, "workout_type": "run"},
+    {"user_id": "u1", "date": "2026-01-08"},
+    {"user_id": "u2", "id": 7, "missed_workout": True, "calories": -1, "weight": 70.25},
+]
+
+
+def round_trip(data):
+    return storage.decode_store(json.loads(json.dumps(storage.encode_store(data))))
+
+
+def test_logs_round_trip_exactly_and_in_write_order():
+    decoded = round_trip({"daily_logs": AWKWARD_LOGS, "settings": {}})
+
+    assert [dict(log) for log in decoded["daily_logs"]] == AWKWARD_LOGS
+    for log, original in zip(decoded["daily_logs"], AWKWARD_LOGS):
+        for key, value in original.items():
+            assert type(log[key]) is type(value), key
+
+
+def test_store_round_trips_through_both_file_formats(tmp_path):
+    data = sample_store()
+    data["daily_logs"] = data["daily_logs"] + AWKWARD_LOGS
+
+    for compact in (True, False):
+        path = str(tmp_path / f"store_{compact}.json")
+        storage.dump_store(data, path, compact=compact)
+        loaded = storage.load_store(path)
+        assert storage.ENCODING_KEY not in loaded
+        assert loaded["daily_logs"].to_records() == data["daily_logs"]
+        assert {k: v for k, v in loaded.items() if k != "daily_logs"} == \
+            {k: v for k, v in data.items() if k != "daily_logs"}
+
+
+def test_compact_file_is_smaller(tmp_path):
+    data = sample_store()
+    data["daily_logs"] = data["daily_logs"] * 50
+    compact, plain = tmp_path / "compact.json", tmp_path / "plain.json"
+
+    storage.dump_store(data, str(compact), compact=True)
+    storage.dump_store(data, str(plain), compact=False)
+
+    assert compact.stat().st_size < plain.stat().st_size / 2
+
+
+def test_version_1_records_are_decoded():
+    raw = {
+        "daily_logs": [{"user_id": "u1", "date": "2026-01-01", "stress_level": 2, "missed_workout": True}],
+        storage.ENCODING_KEY: {
+            "version": 1,
+            "enums": {"daily_logs": {"stress_level": ["low", "medium", "high"]}},
+            "nullable": {"daily_logs": ["mood"]},
+        },
+    }
+
+    decoded = storage.decode_store(raw)
+
+    assert dict(decoded["daily_logs"][0]) == {
+        "user_id": "u1", "date": "2026-01-01", "stress_level": "high", "missed_workout": True, "mood": None,
+    }
+
+
+def test_newer_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        storage.decode_store({storage.ENCODING_KEY: {"version": storage.ENCODING_VERSION + 1}})
+
+
+def test_store_without_daily_logs_is_accepted():
+    decoded = round_trip({"user_profiles": [{"user_id": "u1"}]})
+
+    assert "daily_logs" not in decoded
+    assert decoded["user_profiles"] == [{"user_id": "u1"}]
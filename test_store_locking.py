@@ -0,0 +1,142 @@
+"""
+Store locks and atomic writes: concurrent writers do not lose updates
+"""
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import storage
+from conftest import USER_A, USER_B, sign_in, stored
+
+
+def test_exclusive_lock_excludes_and_times_out(tmp_path):
+    path = str(tmp_path / "data.json")
+    held = storage.FileLock(path).acquire()
+
+    with pytest.raises(storage.StoreLockTimeout):
+        storage.FileLock(path).acquire(timeout=0.05)
+
+    held.release()
+    with storage.FileLock(path) as lock:
+        assert lock.locked
+    assert not lock.locked
+
+
+def test_shared_locks_coexist_but_exclude_writers(tmp_path):
+    path = str(tmp_path / "users")
+    first = storage.FileLock(path, shared=True).acquire()
+    second = storage.FileLock(path, shared=True).acquire(timeout=0.05)
+
+    with pytest.raises(storage.StoreLockTimeout):
+        storage.FileLock(path).acquire(timeout=0.05)
+
+    first.release()
+    second.release()
+    storage.FileLock(path).acquire(timeout=0.05).release()
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    storage.dump_store({"settings": {"n": 1}}, path)
+
+    with pytest.raises(TypeError):
+        storage.dump_store({"settings": {"n": object()}}, path)
+
+    assert storage.load_store(path)["settings"] == {"n": 1}
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def _add_to_counter(path, times):
+    for _ in range(times):
+        with storage.FileLock(path):
+            data = storage.load_store(path)
+            data["settings"]["count"] += 1
+            storage.dump_store(data, path)
+
+
+def test_locked_read_modify_write_from_several_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv("STORE_FSYNC", "false")
+    path = str(tmp_path / "data.json")
+    storage.dump_store({"settings": {"count": 0}}, path)
+
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_add_to_counter, args=(path, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert storage.load_store(path)["settings"]["count"] == 100
+
+
+def test_concurrent_requests_keep_every_write(app_client):
+    def log_meals(user_id):
+        client = app_client.application.test_client()
+        sign_in(client, user_id)
+        for i in range(10):
+            assert client.post("/nutrition", data={"name": f"Meal {i}", "calories": "100"}).status_code == 302
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(log_meals, [USER_A, USER_A, USER_B, USER_B]))
+
+    meals = stored(app_client)["meals"]
+    assert sum(1 for meal in meals if meal["user_id"] == USER_A) == 20
+    assert sum(1 for meal in meals if meal["user_id"] == USER_B) == 20
+
+
+def test_checkins_do_not_hold_the_lock_while_the_agent_plans(app_client, monkeypatch):
+    import flask_app
+
+    decide_plan = flask_app.decide_plan
+
+    def slow_plan(*args, **kwargs):
+        time.sleep(0.5)  # a blocking LLM call
+        return decide_plan(*args, **kwargs)
+
+    monkeypatch.setattr(flask_app, "decide_plan", slow_plan)
+    monkeypatch.setattr(storage, "STORE_LOCK_TIMEOUT", 0.3)
+    app_client.get("/")  # creates the store files
+
+    def post(user_id, path, form, delay=0):
+        time.sleep(delay)
+        client = app_client.application.test_client()
+        sign_in(client, user_id)
+        return client.post(path, data=form).status_code
+
+    checkin = {"stress": "low", "sleep_hours": "8", "energy": "high"}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(post, user_id, "/log", checkin) for user_id in (USER_A, USER_B, USER_A)]
+        # written while the check-ins of the same user are planning
+        futures.append(pool.submit(post, USER_A, "/nutrition", {"name": "Oats", "calories": "300"}, delay=0.1))
+        assert [future.result() for future in futures] == [302] * 4
+
+    data = stored(app_client)
+    assert len(data["daily_logs"].for_user(USER_A)) == 7
+    assert len(data["daily_logs"].for_user(USER_B)) == 4
+    assert sum(1 for d in data["agent_decisions"] if d["user_id"] == USER_A) == 3
+    assert [meal["name"] for meal in data["meals"]] == ["Oats"]
+    profile = next(p for p in data["user_profiles"] if p["user_id"] == USER_A)
+    assert profile["total_logs"] == 2
+
+
+def test_busy_store_answers_503(app_client, monkeypatch):
+    import flask_app
+
+    sign_in(app_client, USER_A)
+    app_client.get("/")  # creates the store files
+    monkeypatch.setattr(storage, "STORE_LOCK_TIMEOUT", 0.05)
+    if app_client.sharded:
+        held = storage.FileLock(storage.shard_path(flask_app.SHARD_DIR, USER_A), kind="shard")
+    else:
+        held = storage.FileLock(flask_app.DATA_FILE)
+
+    with held:
+        response = app_client.post("/nutrition", data={"name": "Oats", "calories": "300"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert not any(meal["user_id"] == USER_A for meal in stored(app_client)["meals"])
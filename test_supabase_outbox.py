@@ -0,0 +1,134 @@
+"""
+Supabase outbox: batching, claims, backoff, row-by-row retry and parking
+"""
+import sqlite3
+import time
+
+import pytest
+
+import supabase_outbox
+from supabase_outbox import MAX_ATTEMPTS, SupabaseOutbox
+
+
+class FakeClient:
+    """Records insert calls; rows with "bad" set (or every row while `down`) are rejected"""
+
+    def __init__(self):
+        self.calls = []
+        self.down = False
+
+    def table(self, name):
+        client = self
+
+        class Query:
+            def insert(self, rows):
+                self.rows = rows
+                return self
+
+            def execute(self):
+                client.calls.append((name, [row["n"] for row in self.rows]))
+                if client.down:
+                    raise ConnectionError("Supabase is down")
+                if any(row.get("bad") for row in self.rows):
+                    raise ValueError("invalid input syntax")
+
+        return Query()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = SupabaseOutbox(FakeClient(), path=str(tmp_path / "outbox.db"), batch_size=10, start=False)
+    yield box
+    box.stop()
+
+
+def queued(box):
+    return box._conn.execute("SELECT payload, status, attempts FROM outbox ORDER BY id").fetchall()
+
+
+def make_due(box):
+    box._conn.execute("UPDATE outbox SET next_attempt = 0")
+
+
+def test_rows_are_inserted_in_batches_per_table(outbox):
+    flushed = []
+    outbox.on_flush = lambda table, users: flushed.append((table, users))
+    for n in range(12):
+        outbox.enqueue("daily_logs", {"n": n, "user_id": f"u{n % 2}"})
+    outbox.enqueue("agent_decisions", {"n": 99, "user_id": "u1"})
+
+    assert outbox.drain() == 13
+
+    assert outbox.client.calls == [
+        ("daily_logs", list(range(10))), ("daily_logs", [10, 11]), ("agent_decisions", [99]),
+    ]
+    assert flushed[0] == ("daily_logs", {"u0", "u1"})
+    assert queued(outbox) == []
+
+
+def test_a_bad_row_is_parked_without_the_rest_of_its_batch(outbox):
+    for n in range(5):
+        outbox.enqueue("daily_logs", {"n": n, "user_id": "u1", "bad": n == 2})
+
+    assert outbox.drain() == 4
+    assert [status for _, status, _ in queued(outbox)] == ["pending"]
+    assert outbox.last_error == "invalid input syntax"
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        make_due(outbox)
+        outbox.drain()
+
+    (payload, status, attempts), = queued(outbox)
+    assert '"n": 2' in payload
+    assert (status, attempts) == ("failed", MAX_ATTEMPTS)
+    assert outbox.counts() == {"pending": 0, "failed": 1}
+
+    assert outbox.retry_failed() == 1
+    assert outbox.counts() == {"pending": 1, "failed": 0}
+
+
+def test_failed_rows_back_off_until_due(outbox, monkeypatch):
+    monkeypatch.setattr(supabase_outbox, "backoff_delay", lambda attempts: 2.0 ** attempts)
+    outbox.client.down = True
+    outbox.enqueue("daily_logs", {"n": 1, "user_id": "u1"})
+    outbox.enqueue("daily_logs", {"n": 2, "user_id": "u1"})
+
+    assert outbox.drain() == 0
+    calls = len(outbox.client.calls)
+    assert [attempts for _, _, attempts in queued(outbox)] == [1, 1]
+    assert outbox.drain() == 0
+    assert len(outbox.client.calls) == calls  # not due yet
+    next_attempt = outbox._conn.execute("SELECT MIN(next_attempt) FROM outbox").fetchone()[0]
+    assert next_attempt == pytest.approx(time.time() + 2, abs=1)
+
+    outbox.client.down = False
+    make_due(outbox)
+    assert outbox.drain() == 2
+    assert queued(outbox) == []
+
+
+def test_claimed_rows_are_hidden_from_another_writer(outbox, tmp_path):
+    other = SupabaseOutbox(FakeClient(), path=outbox.path, start=False)
+    outbox.enqueue("daily_logs", {"n": 1, "user_id": "u1"})
+
+    table, rows = outbox._claim(time.time())
+
+    assert table == "daily_logs" and len(rows) == 1
+    assert other._claim(time.time()) == (None, [])
+    assert other.pending_rows("daily_logs", "u1") == [{"n": 1, "user_id": "u1"}]
+
+
+def test_cached_reads_are_dropped_before_rows_leave_the_outbox(outbox):
+    still_queued = []
+
+    def on_flush(table, users):
+        with sqlite3.connect(outbox.path) as conn:
+            still_queued.append(conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0])
+
+    outbox.on_flush = on_flush
+    outbox.enqueue("daily_logs", {"n": 1, "user_id": "u1"})
+
+    outbox.drain()
+
+    assert still_queued == [1]
+    assert queued(outbox) == []
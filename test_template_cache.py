@@ -0,0 +1,72 @@
+"""
+Template bytecode cache: precompiling fills it and a new worker renders the same output from it
+"""
+from flask import Flask, render_template
+import pytest
+
+import template_cache
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    folder = tmp_path / "templates"
+    folder.mkdir()
+    (folder / "base.html").write_text("<h1>{% block title %}{% endblock %}</h1>")
+    (folder / "page.html").write_text(
+        '{% extends "base.html" %}{% block title %}Hi {{ name|title }}{% endblock %}'
+    )
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(template_cache, "TEMPLATE_CACHE_DIR", str(cache))
+    monkeypatch.setattr(template_cache, "TEMPLATES_AUTO_RELOAD", None)
+    return folder, cache
+
+
+def make_app(folder, precompile=True):
+    """A new app, as a freshly started worker would build it"""
+    app = Flask(__name__, template_folder=str(folder))
+    template_cache.init_app(app, precompile_templates=precompile)
+    return app
+
+
+def render(app, name="page.html"):
+    with app.test_request_context():
+        return render_template(name, name="ada lovelace")
+
+
+def test_precompile_fills_the_bytecode_cache(templates):
+    folder, cache = templates
+    (folder / "broken.html").write_text("{% if %}")
+
+    app = make_app(folder, precompile=False)
+    assert list(cache.iterdir()) == []
+
+    compiled, failed = template_cache.precompile(app)
+
+    assert compiled == 2
+    assert list(failed) == ["broken.html"]
+    assert len(list(cache.iterdir())) == 2
+
+
+def test_a_new_worker_renders_the_same_output_from_the_cache(templates, monkeypatch):
+    folder, cache = templates
+    expected = render(make_app(folder))
+    assert expected == "<h1>Hi Ada Lovelace</h1>"
+    cached = {path.name: path.read_bytes() for path in cache.iterdir()}
+
+    app = make_app(folder, precompile=False)
+
+    def no_compile(*args, **kwargs):
+        raise AssertionError("template compiled instead of loaded from the bytecode cache")
+
+    monkeypatch.setattr(app.jinja_env, "compile", no_compile)
+    assert render(app) == expected
+    assert {path.name: path.read_bytes() for path in cache.iterdir()} == cached
+
+
+def test_edited_template_is_recompiled(templates):
+    folder, cache = templates
+    render(make_app(folder))
+
+    (folder / "base.html").write_text("<h2>{% block title %}{% endblock %}</h2>")
+
+    assert render(make_app(folder)) == "<h2>Hi Ada Lovelace</h2>"
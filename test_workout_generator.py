@@ -0,0 +1,61 @@
+"""
+Time-budget session composer
+"""
+import json
+
+import pytest
+
+from agents.workout_generator import compose_session, compose_sessions, get_workouts_for_program
+
+
+def roles(plan):
+    return [block.get("role", "main") for block in plan["workouts"]]
+
+
+@pytest.mark.parametrize("program, level", [("strength", 5), ("cardio", 2), ("hiit", 8), ("beginner", 1)])
+@pytest.mark.parametrize("minutes", [20, 30, 45, 90])
+def test_session_fits_the_budget(program, level, minutes):
+    plan = compose_session(program, level, minutes, "high")
+
+    assert plan["total_duration"] <= minutes
+    assert plan["total_duration"] == sum(block["duration"] for block in plan["workouts"])
+    assert len({block["name"] for block in plan["workouts"]}) == len(plan["workouts"])
+
+
+def test_warm_up_is_kept_when_it_fits():
+    plan = compose_session("strength", 5, 30, "high")
+
+    assert roles(plan)[0] == "warmup"
+    assert roles(plan)[-1] == "cooldown"
+    assert "main" in roles(plan)
+
+
+def test_budget_below_the_warm_up_gives_an_empty_session():
+    plan = compose_session("strength", 5, 5)
+
+    assert plan["workouts"] == []
+    assert plan["total_duration"] == 0
+
+
+def test_numeric_and_named_intensities():
+    assert compose_session("cardio", 4, 40, 4)["workouts"] == compose_session("cardio", 4, 40, "high")["workouts"]
+    assert compose_session("cardio", 4, 40, "High")["workouts"] == compose_session("cardio", 4, 40, "high")["workouts"]
+
+
+@pytest.mark.parametrize("intensity", ["extreme", "", None, 0, 9])
+def test_unknown_intensity_is_rejected(intensity):
+    with pytest.raises(ValueError, match="intensity"):
+        compose_session("strength", 5, 30, intensity)
+
+
+def test_plans_serialise_as_json():
+    json.dumps(compose_session("strength", 5, 45))
+    json.dumps(get_workouts_for_program("yoga", 7))
+    json.dumps(compose_sessions([{"program_type": "hiit", "user_level": 3, "minutes": 25}]))
+
+
+def test_returned_blocks_do_not_alias_the_catalog():
+    plan = compose_session("strength", 5, 45)
+    plan["workouts"][0]["duration"] = 999
+
+    assert compose_session("strength", 5, 45)["workouts"][0]["duration"] != 999
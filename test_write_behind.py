@@ -0,0 +1,193 @@
+"""
+Write-behind buffer: replay of pending taps, commit ordering and group commit
+"""
+import threading
+
+import pytest
+
+import write_behind
+from conftest import USER_A, USER_B, sign_in, stored
+from write_behind import WriteBehindBuffer
+
+
+def increment(data):
+    data["n"] += 1
+
+
+def test_load_replays_pending_writes_of_the_requested_users():
+    buffer = WriteBehindBuffer(commit=None, start=False)
+    buffer.add("u1", ("x",), increment)
+    buffer.add("u2", ("x",), increment)
+    buffer.add("u1", ("x",), increment)
+
+    data, ops = buffer.load(lambda: {"n": 0}, ("u1",))
+
+    assert data == {"n": 2}
+    assert [op.user_id for op in ops] == ["u1", "u1"]
+    assert buffer.load(lambda: {"n": 0})[0] == {"n": 3}
+
+
+def test_committed_forgets_only_the_written_ops():
+    buffer = WriteBehindBuffer(commit=None, start=False)
+    first = buffer.add("u1", ("x",), increment)
+    ops = buffer.pending()
+    later = buffer.add("u1", ("x",), increment)
+
+    buffer.committed(ops, lambda: None)
+
+    assert buffer.pending() == [later]
+    assert first not in buffer.pending()
+
+
+def test_load_during_a_commit_sees_each_write_exactly_once():
+    store = {"n": 0}
+    buffer = WriteBehindBuffer(commit=None, start=False)
+    buffer.add("u1", ("x",), increment)
+    writing, release = threading.Event(), threading.Event()
+
+    def write():
+        writing.set()
+        release.wait(5)
+        store["n"] = 1
+
+    committer = threading.Thread(target=buffer.committed, args=(buffer.pending(), write))
+    committer.start()
+    writing.wait(5)
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(data=buffer.load(lambda: dict(store))[0]))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive()  # waits for the commit instead of reading a store it may double-count
+
+    release.set()
+    committer.join(5)
+    reader.join(5)
+    assert result["data"] == {"n": 1}
+
+
+def test_failed_commit_keeps_the_writes_queued():
+    def commit(users):
+        raise OSError("disk full")
+
+    buffer = WriteBehindBuffer(commit=commit, start=False)
+    buffer.add("u1", ("x",), increment)
+
+    assert buffer.flush() == 0
+    assert len(buffer) == 1
+    assert buffer.stats()["last_error"] == "disk full"
+
+
+def test_full_buffer_commits_before_the_interval():
+    committed = threading.Event()
+
+    def commit(users):
+        buffer.committed(buffer.pending(users), committed.set)
+        return 1
+
+    buffer = WriteBehindBuffer(commit=commit, interval=60, max_ops=3)
+    try:
+        for _ in range(3):
+            buffer.add("u1", ("x",), increment)
+        assert committed.wait(5)
+    finally:
+        buffer.stop()
+    assert len(buffer) == 0
+
+
+def test_stop_commits_what_is_pending():
+    seen = []
+
+    def commit(users):
+        ops = buffer.pending(users)
+        buffer.committed(ops, lambda: seen.extend(op.user_id for op in ops))
+        return len(ops)
+
+    buffer = WriteBehindBuffer(commit=commit, interval=60)
+    buffer.add("u1", ("x",), increment)
+    buffer.add("u2", ("x",), increment)
+
+    buffer.stop()
+
+    assert sorted(seen) == ["u1", "u2"]
+    assert len(buffer) == 0
+
+
+@pytest.fixture
+def buffered_client(app_client, monkeypatch):
+    """app_client with a write-behind buffer that commits only when flushed"""
+    import flask_app
+
+    buffer = WriteBehindBuffer(commit=flask_app.commit_pending_writes, start=False)
+    monkeypatch.setattr(write_behind, "_buffer", buffer)
+    app_client.buffer = buffer
+    return app_client
+
+
+def goal_progress(client):
+    goal = next(g for g in stored(client)["personal_goals"] if g["id"] == "goal-a")
+    return goal["progress"]
+
+
+def tap_goal(client, increment=5):
+    response = client.post("/api/update-goal-progress", json={"id": "goal-a", "increment": increment})
+    assert response.status_code == 200
+    return response.get_json()["new_progress"]
+
+
+def test_taps_are_seen_by_later_requests_before_they_are_committed(buffered_client):
+    sign_in(buffered_client, USER_A)
+
+    counts = [buffered_client.post("/api/log-water").get_json()["count"] for _ in range(3)]
+    progress = [tap_goal(buffered_client) for _ in range(2)]
+
+    assert counts == [1, 2, 3]
+    assert progress == [5, 10]
+    assert stored(buffered_client)["hydration_logs"] == []
+    assert len(buffered_client.buffer) == 5
+
+    assert buffered_client.buffer.flush() == 5
+    assert len(stored(buffered_client)["hydration_logs"]) == 3
+    assert goal_progress(buffered_client) == 10
+
+
+def test_mood_tap_updates_todays_log(buffered_client):
+    sign_in(buffered_client, USER_B)
+
+    buffered_client.post("/api/log-mood", json={"mood": "calm"})
+    buffered_client.post("/api/log-mood", json={"mood": "Great"})
+    buffered_client.buffer.flush()
+
+    logs = stored(buffered_client)["daily_logs"].for_user(USER_B).rows()
+    assert len(logs) == 4
+    assert logs[-1]["mood"] == "Great"
+
+
+@pytest.mark.parametrize("writer, kwargs", [
+    ("/nutrition", {"data": {"name": "Oats", "calories": "300"}}),
+    ("/api/sync-fitness", {}),
+])
+def test_taps_committed_by_a_regular_write_are_not_applied_twice(buffered_client, writer, kwargs):
+    sign_in(buffered_client, USER_A)
+
+    tap_goal(buffered_client)
+    tap_goal(buffered_client)
+    assert buffered_client.post(writer, **kwargs).status_code in (200, 302)
+    assert goal_progress(buffered_client) == 10
+    tap_goal(buffered_client)
+    buffered_client.buffer.flush()
+
+    assert goal_progress(buffered_client) == 15
+    assert len(buffered_client.buffer) == 0
+
+
+def test_other_users_taps_stay_queued_across_a_sharded_write(buffered_client):
+    sign_in(buffered_client, USER_B)
+    buffered_client.post("/api/log-water")
+    sign_in(buffered_client, USER_A)
+
+    buffered_client.post("/nutrition", data={"name": "Oats", "calories": "300"})
+
+    waiting = [op.user_id for op in buffered_client.buffer.pending()]
+    assert waiting == ([USER_B] if buffered_client.sharded else [])
+    buffered_client.buffer.flush()
+    assert [h["user_id"] for h in stored(buffered_client)["hydration_logs"]] == [USER_B]
@@ -0,0 +1,168 @@
+"""
+Structured JSON-lines trace log for flask_app and the agents
+Every request gets a request id (taken from X-Request-ID or generated) that
+is attached to all log records written while it is handled, including those
+from decide_plan, the ML predictor and the LLM call. Requests slower than
+TRACE_SLOW_MS, and failed requests, are logged with their span breakdown.
+The log file is size-rotated. Tracing is a diagnostic mode and is off unless
+TRACE_ENABLED=true.
+"""
+from contextlib import ExitStack
+import contextvars
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import time
+import uuid
+
+from dotenv import load_dotenv
+from flask import g, request
+
+from agents.telemetry import collect
+from metrics import instrument_templates
+
+load_dotenv()
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "false").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.path.dirname(__file__), "logs", "trace.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+
+# Loggers whose records go to the trace file
+TRACED_LOGGERS = ("trace", "agents")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_handler = None
+
+logger = logging.getLogger("trace")
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the id of the request being handled"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(path=TRACE_FILE, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+    """Attach the rotating JSON handler to the traced loggers (once per process)"""
+    global _handler
+    if _handler is not None:
+        return _handler
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+    _handler.setFormatter(JsonFormatter())
+    _handler.addFilter(RequestIdFilter())
+    for name in TRACED_LOGGERS:
+        traced = logging.getLogger(name)
+        traced.addHandler(_handler)
+        if traced.level == logging.NOTSET:
+            traced.setLevel(logging.INFO)
+    return _handler
+
+
+def span_breakdown(spans):
+    """{stage: {"ms": total, "count": n}} from collected (name, seconds) pairs"""
+    stages = {}
+    for name, seconds in spans:
+        stage = stages.setdefault(name, {"ms": 0.0, "count": 0})
+        stage["ms"] += seconds * 1000
+        stage["count"] += 1
+    for stage in stages.values():
+        stage["ms"] = round(stage["ms"], 3)
+    return stages
+
+
+def _start_trace():
+    g._trace_start = time.perf_counter()
+    g._trace_token = _request_id.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex)
+    g._trace_stack = ExitStack()
+    g._trace_spans = g._trace_stack.enter_context(collect())
+
+
+def _tag_response(response):
+    request_id = _request_id.get()
+    if request_id:
+        response.headers["X-Request-ID"] = request_id
+    g._trace_status = response.status_code
+    return response
+
+
+def _finish_trace(exc=None):
+    start = g.pop("_trace_start", None)
+    if start is None:
+        return
+    duration_ms = (time.perf_counter() - start) * 1000
+    stack = g.pop("_trace_stack")
+    spans = g.pop("_trace_spans")
+    stack.close()
+    status = g.pop("_trace_status", 500 if exc else None)
+
+    try:
+        if exc is not None or duration_ms >= TRACE_SLOW_MS:
+            logger.log(
+                logging.ERROR if exc is not None else logging.WARNING,
+                "request_error" if exc is not None else "slow_request",
+                exc_info=(type(exc), exc, exc.__traceback__) if exc is not None else None,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "endpoint": request.endpoint,
+                    "status": status,
+                    "duration_ms": round(duration_ms, 3),
+                    "spans": span_breakdown(spans),
+                },
+            )
+    finally:
+        _request_id.reset(g.pop("_trace_token"))
+
+
+def init_app(app, enabled=None):
+    """
+    Register request-id propagation and slow-request logging
+
+    Args:
+        app: Flask application
+        enabled: Override TRACE_ENABLED
+
+    Returns:
+        True when tracing was enabled
+    """
+    if not (TRACE_ENABLED if enabled is None else enabled):
+        return False
+    configure()
+    instrument_templates(app)
+    app.before_request(_start_trace)
+    app.after_request(_tag_response)
+    app.teardown_request(_finish_trace)
+    return True
@@ -0,0 +1,212 @@
+"""
+Write-behind buffer with group commit for tap-style updates
+Small updates (a glass of water, a goal increment, a mood) are acknowledged
+as soon as they are queued. A daemon thread commits everything queued every
+WRITE_BEHIND_INTERVAL_MS, or sooner once WRITE_BEHIND_MAX_OPS are waiting,
+with one locked read and one write of the store. Each queued update is an
+apply(data) callable, so it can be replayed on whatever the store holds at
+commit time and on every store this process loads before then. Pending
+updates are committed at interpreter exit, so a graceful shutdown does not
+lose them.
+"""
+import atexit
+from collections import namedtuple
+import itertools
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "250"))
+WRITE_BEHIND_MAX_OPS = int(os.getenv("WRITE_BEHIND_MAX_OPS", "100"))
+
+logger = logging.getLogger(__name__)
+
+PendingWrite = namedtuple("PendingWrite", "seq user_id collections apply")
+
+
+class WriteBehindBuffer:
+    """Queued updates and the daemon thread that group-commits them"""
+
+    def __init__(self, commit, interval=WRITE_BEHIND_INTERVAL_MS / 1000, max_ops=WRITE_BEHIND_MAX_OPS, start=True):
+        """
+        Args:
+            commit: Called as commit(users) to persist the pending writes of
+                those users; it takes them with pending(users) once it holds
+                the store locks, writes them through committed() and returns
+                how many it wrote
+            interval: Seconds between group commits
+            max_ops: Pending writes that trigger a commit before the interval ends
+            start: Start the background thread
+        """
+        self.commit = commit
+        self.interval = interval
+        self.max_ops = max_ops
+        self.last_error = ""
+        self.commits = 0
+        self.committed_ops = 0
+        self._ops = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._committing = False
+        self._generation = 0
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if start:
+            self.start()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the thread and commit whatever is still pending"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def add(self, user_id, collections, apply):
+        """Queue apply(data) for the store; returns immediately"""
+        with self._lock:
+            op = PendingWrite(next(self._seq), user_id, tuple(collections), apply)
+            self._ops.append(op)
+            full = len(self._ops) >= self.max_ops
+        if not self._stop.is_set() and self._thread is not None and not self._thread.is_alive():
+            self.start()  # threads do not survive fork, e.g. workers of a preloaded app
+        if full:
+            self._wake.set()
+        return op
+
+    def _select(self, users):
+        if users is None:
+            return list(self._ops)
+        users = set(users)
+        return [op for op in self._ops if op.user_id in users]
+
+    def pending(self, users=None):
+        """Pending writes of `users` (None: everyone), oldest first"""
+        with self._lock:
+            return self._select(users)
+
+    def load(self, load, users=None):
+        """
+        Load the store and replay the pending writes of `users` on it
+
+        A load that overlaps a commit from this process is retried, since the
+        store it read may or may not hold the writes being committed.
+
+        Args:
+            load: Called with no arguments; returns the store
+            users: Users whose writes to replay (None: everyone)
+
+        Returns:
+            (store, replayed writes)
+        """
+        while True:
+            with self._changed:
+                while self._committing:
+                    self._changed.wait()
+                generation = self._generation
+                ops = self._select(users)
+            data = load()
+            with self._changed:
+                if not self._committing and self._generation == generation:
+                    break
+        for op in ops:
+            op.apply(data)
+        return data, ops
+
+    def committed(self, ops, write):
+        """Call write(), which stores `ops`, then forget them; loads wait meanwhile"""
+        with self._changed:
+            self._committing = True
+        try:
+            write()
+            seqs = {op.seq for op in ops}
+            with self._lock:
+                self._ops = [op for op in self._ops if op.seq not in seqs]
+        finally:
+            with self._changed:
+                self._committing = False
+                self._generation += 1
+                self._changed.notify_all()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ops)
+
+    def flush(self):
+        """
+        Commit every pending write now
+
+        Returns:
+            Number of writes committed
+        """
+        with self._flush_lock:
+            users = {op.user_id for op in self.pending()}
+            if not users:
+                return 0
+            try:
+                done = self.commit(users)
+            except Exception as e:
+                # the writes stay queued and are retried on the next commit
+                self.last_error = str(e)
+                logger.warning("Write-behind commit failed: %s", e)
+                return 0
+            self.commits += 1
+            self.committed_ops += done
+            return done
+
+    def stats(self):
+        return {
+            "pending": len(self),
+            "commits": self.commits,
+            "committed_ops": self.committed_ops,
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+_buffer = None
+
+
+def get_buffer():
+    """The buffer created by init_app(), or None when write-behind is off"""
+    return _buffer
+
+
+def init_app(app, commit, enabled=None):
+    """
+    Create the buffer and commit it at interpreter exit
+
+    Args:
+        app: Flask application
+        commit: See WriteBehindBuffer
+        enabled: Override WRITE_BEHIND_ENABLED
+
+    Returns:
+        The buffer, or None when disabled
+    """
+    global _buffer
+    if not (WRITE_BEHIND_ENABLED if enabled is None else enabled):
+        return None
+    _buffer = WriteBehindBuffer(commit)
+    app.extensions["write_behind"] = _buffer
+    atexit.register(_buffer.stop)
+    return _buffer